@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import math
+import time
+
+from loop_scheduler import FixedRateScheduler, SKIP
+
+
+# Rate-bounded sensor acquisition for the experiment scripts.
+# Polling a sensor in a tight loop hammers the brick link and a CPU core and
+# gives uneven sample spacing. A Sampler reads a set of channels at a fixed
+# rate on a deadline grid (loop_scheduler.py), sleeping between samples, and
+# keeps streaming statistics of every channel.
+#
+#     sampler = Sampler({'light': light.get_lightness, 'fan': motor_fan.get_position}, rate_hz=50)
+#     sampler.record(2.0)
+#     print(sampler.stats['light'].mean, sampler.stats['light'].stderr)
+#
+# Each sample is timestamped at the middle of its reads, so it lines up with
+# the sensor values however long the link round trips take.
+
+SAMPLE_RATE_HZ = 50
+
+
+class RunningStats:
+    """Streaming count, mean and variance (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.count += 1
+        d = x - self.mean
+        self.mean += d / self.count
+        self._m2 += d * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1 denominator); 0 with fewer than two samples."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def stderr(self):
+        """Standard error of the mean, assuming independent samples."""
+        return math.sqrt(self.variance / self.count) if self.count else math.inf
+
+
+class Sampler:
+    def __init__(self, channels, rate_hz=SAMPLE_RATE_HZ, keep=True, clock=None, sleep=None):
+        """channels maps a name to a function returning the current value."""
+        if not channels:
+            raise ValueError("Sampler needs at least one channel")
+        self.channels = dict(channels)
+        self.rate_hz = rate_hz
+        self.keep = keep
+        self._clock = clock
+        self._sleep = sleep
+        self.reset()
+
+    def _now(self):
+        return self._clock() if self._clock else time.perf_counter()
+
+    def reset(self):
+        """Forget the samples and statistics collected so far."""
+        self.times = []
+        self.data = {name: [] for name in self.channels}
+        self.stats = {name: RunningStats() for name in self.channels}
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def __len__(self):
+        return self.stats[next(iter(self.channels))].count
+
+    def sample(self):
+        """Read every channel once. Returns (timestamp, {name: value})."""
+        before = self._now()
+        values = {name: read() for name, read in self.channels.items()}
+        t = (before + self._now()) / 2
+        if self.keep:
+            self.times.append(t)
+            for name, value in values.items():
+                self.data[name].append(value)
+        for name, value in values.items():
+            self.stats[name].add(value)
+        return t, values
+
+    def run(self, duration=None):
+        """Sample at rate_hz for duration seconds (or until the caller stops), yielding each sample."""
+        scheduler = FixedRateScheduler(self.rate_hz, policy=SKIP, clock=self._clock, sleep=self._sleep)
+        end = None if duration is None else scheduler.start + duration
+        while end is None or self._now() < end:
+            yield self.sample()
+            scheduler.wait()
+
+    def record(self, duration):
+        """Sample for duration seconds. Returns self, for the samples and stats."""
+        for _ in self.run(duration):
+            pass
+        return self
+
+    def slope(self, name):
+        """Rate of change of a kept channel, end to end (e.g. fan speed from its position)."""
+        times, values = self.times, self.data[name]
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (values[-1] - values[0]) / (times[-1] - times[0])
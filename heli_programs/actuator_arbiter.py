@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+
+# Single-writer actuator thread for a motor position command.
+# Every part of the program that wants to move the motor posts a target
+# position to a mailbox instead of calling turn_to itself. There is one slot
+# per priority and a newer command overwrites an older one in its slot
+# (latest wins), so a burst of commands becomes one brick round trip. The
+# actuator thread sends the highest priority command waiting and discards
+# lower ones, which were computed before it:
+#     ESTOP > MANUAL > CONTROLLER
+# An e-stop latches: once sent, manual and controller commands are ignored.
+# A command within DEADBAND motor degrees of the last one sent is dropped.
+#
+# Callers never wait for the brick, so a slow round trip no longer freezes
+# the GUI, and only one thread ever talks to the motor.
+#
+# Given a LatencyProfiler (latency_histogram.py), each turn_to round trip is
+# recorded under the stage name.
+
+CONTROLLER = 0
+MANUAL = 1
+ESTOP = 2
+PRIORITY_NAMES = {CONTROLLER: 'controller', MANUAL: 'manual', ESTOP: 'estop'}
+DEADBAND = 2  # motor degrees
+
+
+class ActuatorArbiter:
+    def __init__(self, motor, deadband=DEADBAND, name='actuator', profiler=None, stage='actuate'):
+        self.motor = motor
+        self.deadband = deadband
+        self.name = name
+        self.profiler = profiler
+        self.stage = stage
+        self._slots = [None] * len(PRIORITY_NAMES)  # (position, action) per priority
+        self._condition = threading.Condition()
+        self._closing = False
+        self.estopped = False
+        self.last_sent = None
+        self.sent = 0
+        self.deduplicated = 0
+        self.superseded = 0  # overwritten or outranked before they were sent
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, position, priority=CONTROLLER):
+        """Post a target position. Never blocks on the brick."""
+        self._post(priority, position, None)
+
+    def estop(self, position=0, action=None):
+        """Latch an emergency stop: move to position, after running action (e.g. idling the rotor)."""
+        self._post(ESTOP, position, action)
+
+    def _post(self, priority, position, action):
+        with self._condition:
+            if self._closing or (self.estopped and priority != ESTOP):
+                return
+            if self._slots[priority] is not None:
+                self.superseded += 1
+            self._slots[priority] = (position, action)
+            self._condition.notify()
+
+    def _take(self):
+        # Highest priority command waiting; the ones below it are stale
+        with self._condition:
+            while not any(slot is not None for slot in self._slots):
+                if self._closing:
+                    return None
+                self._condition.wait()
+            for priority in reversed(range(len(self._slots))):
+                if self._slots[priority] is not None:
+                    break
+            position, action = self._slots[priority]
+            self._slots[priority] = None
+            for lower in range(priority):
+                if self._slots[lower] is not None:
+                    self.superseded += 1
+                    self._slots[lower] = None
+            if priority == ESTOP:
+                self.estopped = True
+            return priority, position, action
+
+    def _run(self):
+        while True:
+            command = self._take()
+            if command is None:
+                break
+            priority, position, action = command
+            try:
+                if action is not None:
+                    action()
+                if priority != ESTOP and self.last_sent is not None \
+                        and abs(position - self.last_sent) < self.deadband:
+                    self.deduplicated += 1
+                    continue
+                start = time.perf_counter_ns()
+                self.motor.turn_to(round(position))
+                if self.profiler is not None:
+                    self.profiler.lap(self.stage, start)
+                self.last_sent = position
+                self.sent += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"{self.name}: {PRIORITY_NAMES[priority]} command to {position} failed: {e}")
+
+    def close(self):
+        """Send whatever is still waiting, then stop the thread."""
+        with self._condition:
+            self._closing = True
+            self._condition.notify()
+        self._thread.join()
+
+    def stats(self):
+        return {'sent': self.sent, 'deduplicated': self.deduplicated, 'superseded': self.superseded,
+                'errors': self.errors, 'estopped': self.estopped}
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+import csv
+import math
+import sys
+
+import numpy as np
+
+
+# Kalman filter for the rotor height (light sensor reading) and vertical speed.
+# State is [height, vertical speed, vertical acceleration] in light units, with
+# a constant-acceleration model driven by white jerk. The commanded blade
+# pitch is a control input: a change of pitch changes the acceleration by
+# control_gain per motor degree (negative, since more pitch means a lower
+# light reading). Measurements are the raw light readings.
+#
+# Compared with the 0.65 moving average plus a finite difference, the filter
+# does not lag behind a moving rotor (the model predicts where it is going),
+# and the speed estimate comes with its own variance.
+#
+# process_noise (jerk spectral density), measurement_noise (reading variance)
+# and control_gain can be fitted to a recorded session:
+#     python altitude_kalman.py session.csv
+# with columns 'time', 'raw_light' (or 'light') and optionally 'target_pitch'.
+
+PROCESS_NOISE = 10000.0   # (light units / s^3)^2 per Hz
+MEASUREMENT_NOISE = 4.0   # light units^2
+# light units / s^2 per motor degree of pitch. Zero switches the control
+# input off, and the filter tracks the rotor on the constant-acceleration
+# model alone. It stays off until the gain has been identified on the rig: a
+# guessed gain with the wrong size (or sign) pushes the speed estimate the
+# wrong way on every pitch change, and the PID acts on that speed. To turn it
+# on, fit it to a flight's CSV export (which has target_pitch) with the
+# command above and pass it as kalman_params={'control_gain': ...}.
+CONTROL_GAIN = 0.0
+
+
+class AltitudeKalman:
+    def __init__(self, process_noise=PROCESS_NOISE, measurement_noise=MEASUREMENT_NOISE,
+                 control_gain=CONTROL_GAIN):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.control_gain = control_gain
+        self.x = np.zeros(3)
+        self.P = np.eye(3)
+        self._F = np.eye(3)
+        self._Q = np.zeros((3, 3))
+        self.reset()
+
+    def reset(self):
+        self.initialised = False
+        self.t = None
+        self.u = None
+        self.innovation = 0.0
+        self.innovation_var = 0.0
+        self.log_likelihood = 0.0
+
+    @property
+    def height(self):
+        return self.x[0]
+
+    @property
+    def velocity(self):
+        return self.x[1]
+
+    @property
+    def acceleration(self):
+        return self.x[2]
+
+    @property
+    def height_var(self):
+        return self.P[0, 0]
+
+    @property
+    def velocity_var(self):
+        return self.P[1, 1]
+
+    def _predict(self, dt, u):
+        F, Q = self._F, self._Q
+        F[0, 1] = dt
+        F[0, 2] = 0.5 * dt * dt
+        F[1, 2] = dt
+        q = self.process_noise
+        dt2, dt3, dt4, dt5 = dt * dt, dt ** 3, dt ** 4, dt ** 5
+        Q[:] = ((dt5 / 20, dt4 / 8, dt3 / 6),
+                (dt4 / 8, dt3 / 3, dt2 / 2),
+                (dt3 / 6, dt2 / 2, dt))
+        Q *= q
+        self.x = F @ self.x
+        if u is not None and self.u is not None and self.control_gain:
+            self.x[2] += self.control_gain * (u - self.u)
+        self.P = F @ self.P @ F.T + Q
+
+    def update(self, t, reading, u=None):
+        """Add a light reading taken at time t, with the pitch command u in force.
+
+        Returns the filtered height.
+        """
+        if not self.initialised:
+            self.x[:] = (reading, 0.0, 0.0)
+            self.P[:] = np.diag((self.measurement_noise, 100.0 ** 2, 1000.0 ** 2))
+            self.t, self.u = t, u
+            self.initialised = True
+            return self.x[0]
+
+        dt = t - self.t
+        if dt > 0:
+            self._predict(dt, u)
+
+        # Scalar measurement of height: H = [1, 0, 0]
+        P = self.P
+        s = P[0, 0] + self.measurement_noise
+        gain = P[:, 0] / s
+        innovation = reading - self.x[0]
+        self.x += gain * innovation
+        self.P = P - np.outer(gain, P[0, :])
+
+        self.innovation = innovation
+        self.innovation_var = s
+        self.log_likelihood += -0.5 * (math.log(2 * math.pi * s) + innovation * innovation / s)
+        self.t, self.u = t, u
+        return self.x[0]
+
+
+def tune_from_session(times, readings, pitches=None):
+    """Fit process noise, measurement noise and control gain to a recorded session.
+
+    The measurement noise comes from the second differences of the readings
+    (for white noise var(d2y) = 6 * sigma^2, and the rotor barely moves in
+    one tick). Process noise and control gain are then picked by maximising
+    the likelihood of the filter's innovations over the session.
+    """
+    readings = np.asarray(readings, dtype=float)
+    second_diff = np.diff(readings, 2)
+    mad = np.median(np.abs(second_diff - np.median(second_diff)))
+    measurement_noise = max(0.25, (1.4826 * mad) ** 2 / 6)
+
+    gains = [0.0]
+    if pitches is not None:
+        gains = [0.0, -1.0, -3.0, -10.0, -30.0]
+    best = None
+    for control_gain in gains:
+        for process_noise in np.logspace(1, 5, 17):
+            kf = AltitudeKalman(process_noise, measurement_noise, control_gain)
+            for i, (t, y) in enumerate(zip(times, readings)):
+                kf.update(t, y, pitches[i] if pitches is not None else None)
+            if best is None or kf.log_likelihood > best[0]:
+                best = (kf.log_likelihood, process_noise, control_gain)
+    _, process_noise, control_gain = best
+    return {'process_noise': float(process_noise),
+            'measurement_noise': float(measurement_noise),
+            'control_gain': float(control_gain)}
+
+
+def load_session_csv(path):
+    times, readings, pitches = [], [], []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            times.append(float(row['time']))
+            readings.append(float(row['raw_light'] if 'raw_light' in row else row['light']))
+            if 'target_pitch' in row:
+                pitches.append(float(row['target_pitch']))
+    return times, readings, (pitches or None)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('Usage: python altitude_kalman.py session.csv')
+        sys.exit(1)
+    params = tune_from_session(*load_session_csv(sys.argv[1]))
+    print('Fitted filter parameters:')
+    for name, value in params.items():
+        print(f'    {name} = {value:.4g}')
@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 
 import pickle
-import time
-import statistics
 import numpy as np
 import matplotlib.pyplot as plt
-from cued_ia_lego import *
+from lego_backend import *
+from acquisition import Sampler
+from experiment_queue import ExperimentQueue, restart_requested
 
 
 # You need to add a range of masses to the counterweight side of the
@@ -32,6 +32,7 @@ average_readings = []  # results list, initially empty
 masses = []            # mass list
 initial_mass = 0       # initial mass
 reading_duration = 1   # light sensor recording duration (seconds)
+sample_rate = 50       # light sensor sampling rate (Hz)
 
 # Try to find connected brick
 try:
@@ -48,10 +49,25 @@ plt.clf()
 plt.xlim(0, 1000)
 plt.ylim(-5, 40)
 
-# Main loop over test masses
+# Work out each test mass by summing increments. Each reading is checkpointed
+# to lift_calibration_checkpoint.jsonl, so after a crash the script carries on
+# from the first mass not measured yet (run with --restart to start again).
+# The checkpoint is archived once the calibration is saved
+test_masses = []
 for mass_change in mass_changes:
-    # Work out current test mass by summing increments
-    masses.append(masses[-1] + mass_change if masses else initial_mass)
+    test_masses.append(test_masses[-1] + mass_change if test_masses else initial_mass)
+queue = ExperimentQueue('lift_calibration', [
+    {'step': i, 'mass_change': mass_change, 'mass': mass}
+    for i, (mass_change, mass) in enumerate(zip(mass_changes, test_masses))], restart=restart_requested())
+masses = [point['mass'] for point in queue.points if queue.is_done(point)]
+average_readings = queue.results()
+if masses:
+    print(f'Resuming with {masses[-1]} grams on the see-saw')
+
+# Main loop over test masses
+for point in queue.pending():
+    mass_change = point['mass_change']
+    masses.append(point['mass'])
 
     # Display instructions and wait for the user to press enter
     print(f'Apply a {mass_change} gram increment '
@@ -61,11 +77,12 @@ for mass_change in mass_changes:
     print('')
 
     # Record the light sensor readings for the specified duration
-    light_readings = []
-    t_start = time.perf_counter()
-    while time.perf_counter() < t_start + reading_duration:
-        light_readings.append(light.get_lightness())
-    average_readings.append(statistics.mean(light_readings))
+    light_stats = Sampler({'light': light.get_lightness}, rate_hz=sample_rate,
+                          keep=False).record(reading_duration).stats['light']
+    average_readings.append(light_stats.mean)
+    queue.complete(point, light_stats.mean)
+    print(f'Mean reading {light_stats.mean:.1f} '
+          f'(std {light_stats.std:.1f}, {light_stats.count} samples)')
 
     # Plot the recorded data
     plt.clf()
@@ -86,6 +103,7 @@ force_conversion = np.polyfit(average_readings, masses, 2)
 # Save the coefficients to a file in the current working directory
 with open('force_conversion.pickle', 'wb') as f:
     pickle.dump(force_conversion, f)
+queue.finish()
 
 # Plot the fitted quadratic
 x = np.linspace(0, 1000, 100)
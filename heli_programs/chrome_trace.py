@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+
+
+# Opt-in timeline tracing in the Chrome trace-event format.
+# Latency histograms (latency_histogram.py) say how long each stage takes,
+# but not how the control thread, the sensor and actuator threads and the
+# Kivy callbacks interleave when the GUI stalls. With HELI_TRACE set to a
+# file name, open_trace() returns a TraceRecorder that keeps spans (begin
+# time + duration) and counters from every thread in a preallocated ring
+# buffer, and writes them out on exit as a JSON file that opens in Perfetto
+# (https://ui.perfetto.dev) or chrome://tracing:
+#
+#     HELI_TRACE=flight.trace.json python v2.9-actualkIattempt.py
+#
+# Recording one event is a next() on a shared counter and a few list stores,
+# safe from any thread under the GIL. When the buffer fills up the oldest
+# events are overwritten. Without HELI_TRACE, open_trace() returns NULL_TRACE,
+# whose methods do nothing.
+
+TRACE_ENV = 'HELI_TRACE'
+CAPACITY = 1 << 18  # events kept - a minute at 20 Hz needs well under 10000 per stage
+
+SPAN = 'X'      # complete event: start and duration
+COUNTER = 'C'
+INSTANT = 'i'
+
+
+class TraceRecorder:
+    def __init__(self, path, capacity=CAPACITY, process_name='hover'):
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.path = path
+        self.capacity = capacity
+        self.process_name = process_name
+        self._phase = [None] * capacity
+        self._name = [None] * capacity
+        self._tid = [0] * capacity
+        self._ts = [0] * capacity
+        self._value = [0] * capacity  # duration (ns) for spans, value for counters
+        self._counter = itertools.count()
+        self._thread_names = {}
+        self._t0 = time.perf_counter_ns()
+        self._saved = False
+
+    def _add(self, phase, name, ts, value):
+        i = next(self._counter) % self.capacity
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self._phase[i] = phase
+        self._name[i] = name
+        self._tid[i] = tid
+        self._ts[i] = ts
+        self._value[i] = value
+
+    def span(self, name, start_ns, end_ns):
+        """A span on the calling thread, from perf_counter_ns() times."""
+        self._add(SPAN, name, start_ns, end_ns - start_ns)
+
+    def counter(self, name, value):
+        self._add(COUNTER, name, time.perf_counter_ns(), value)
+
+    def instant(self, name):
+        self._add(INSTANT, name, time.perf_counter_ns(), 0)
+
+    def wrap(self, function, name=None):
+        """Wrap a callback (Kivy Clock callback, button handler) so each call is a span."""
+        name = name or function.__name__
+
+        def traced(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.span(name, start, time.perf_counter_ns())
+        return traced
+
+    def events(self, total):
+        """The buffered events as trace-event dicts, oldest first, given the number recorded."""
+        first = max(0, total - self.capacity)
+        pid = os.getpid()
+        events = [{'ph': 'M', 'name': 'process_name', 'pid': pid, 'tid': 0,
+                   'args': {'name': self.process_name}}]
+        for tid, name in self._thread_names.items():
+            events.append({'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        for n in range(first, total):
+            i = n % self.capacity
+            phase = self._phase[i]
+            if phase is None:
+                continue  # slot claimed but not filled in yet
+            event = {'ph': phase, 'name': self._name[i], 'pid': pid, 'tid': self._tid[i],
+                     'ts': (self._ts[i] - self._t0) / 1000}
+            if phase == SPAN:
+                event['dur'] = self._value[i] / 1000
+            elif phase == COUNTER:
+                event['args'] = {self._name[i]: self._value[i]}
+            else:
+                event['s'] = 't'
+            events.append(event)
+        return events
+
+    def save(self):
+        """Write the trace file. Only the first call writes; call it once the traced threads are done."""
+        if self._saved:
+            return
+        self._saved = True
+        total = next(self._counter)  # events recorded so far (this index is never used)
+        dropped = max(0, total - self.capacity)
+        trace = {'traceEvents': self.events(total), 'displayTimeUnit': 'ms',
+                 'otherData': {'dropped_events': dropped}}
+        with open(self.path, 'w') as f:
+            json.dump(trace, f)
+        print(f"Trace written to {self.path} ({total - dropped} events, {dropped} overwritten) - open it in Perfetto")
+
+    close = save
+
+
+class NullTrace:
+    """Stands in for a TraceRecorder when tracing is off."""
+    path = None
+
+    def span(self, name, start_ns, end_ns):
+        pass
+
+    def counter(self, name, value):
+        pass
+
+    def instant(self, name):
+        pass
+
+    def wrap(self, function, name=None):
+        return function
+
+    def save(self):
+        pass
+
+    close = save
+
+    def __bool__(self):
+        return False
+
+
+NULL_TRACE = NullTrace()
+
+
+def open_trace(path=None, capacity=CAPACITY):
+    """TraceRecorder writing to path (default: $HELI_TRACE), saved at exit; NULL_TRACE if neither is set."""
+    path = path or os.environ.get(TRACE_ENV)
+    if not path:
+        return NULL_TRACE
+    recorder = TraceRecorder(path, capacity)
+    atexit.register(recorder.save)
+    return recorder
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from hover_control import HoverController
+from loop_scheduler import FixedRateScheduler
+from sim_lego import SimClock, SimRig, NXTBrick, Motor, Light, PORT_A, PORT_B, PORT_1
+
+
+# Closed-loop benchmark for the hover controller.
+# Each scenario flies the controller against the simulated rig on a virtual
+# clock through a setpoint step or a load disturbance, and reports
+#   rise time (10% -> 90% of the step), overshoot, settling time,
+#   steady-state error, actuator travel (total pitch motor degrees commanded)
+#   and loop throughput (achieved loop Hz, and how fast the control law itself
+#   could run, from the wall clock time spent in update()).
+# Results are saved as JSON. With --baseline the run is compared against an
+# earlier results file and the script exits with status 1 if control quality
+# or throughput got worse by more than the tolerances below.
+#
+# Example:
+#     python controller_benchmark.py --save-baseline
+#     python controller_benchmark.py --baseline benchmark_results/baseline.json
+
+LOOP_RATE_HZ = 20
+RESULTS_DIR = 'benchmark_results'
+SETTLING_BAND = 8        # light units either side of the target
+METRIC_SMOOTHING = 0.25  # seconds of moving average on the light reading for the metrics
+
+# Standard scenarios. setpoints: [(time, target light reading)],
+# disturbances: [(start, end, extra grams of load)], evaluated from 'evaluate_from'
+SCENARIOS = [
+    {'name': 'takeoff', 'duration': 30, 'evaluate_from': 0,
+     'setpoints': [(0, 410)], 'disturbances': []},
+    {'name': 'step_up', 'duration': 50, 'evaluate_from': 25,
+     'setpoints': [(0, 410), (25, 370)], 'disturbances': []},
+    {'name': 'step_down', 'duration': 50, 'evaluate_from': 25,
+     'setpoints': [(0, 410), (25, 450)], 'disturbances': []},
+    {'name': 'gust', 'duration': 50, 'evaluate_from': 25,
+     'setpoints': [(0, 410)], 'disturbances': [(25, 27, 1.5)]},
+    {'name': 'payload', 'duration': 50, 'evaluate_from': 25,
+     'setpoints': [(0, 410)], 'disturbances': [(25, 1e9, 1.0)]},
+]
+
+# Allowed regressions vs. a baseline before the run counts as failed
+TOLERANCES = {
+    'settling_time': 1.25,      # ratio
+    'rise_time': 1.25,          # ratio
+    'overshoot_pct': 5.0,       # percentage points
+    'steady_state_error': 2.0,  # light units
+    'actuator_travel': 1.25,    # ratio
+    'achieved_hz': 0.95,        # ratio (lower is worse)
+    'max_loop_hz': 0.7,         # ratio (lower is worse), wall clock so allow noise
+}
+
+
+def target_at(scenario, t):
+    target = scenario['setpoints'][0][1]
+    for t_change, value in scenario['setpoints']:
+        if t >= t_change:
+            target = value
+    return target
+
+
+def disturbance_for(scenario):
+    disturbances = scenario['disturbances']
+    if not disturbances:
+        return None
+    return lambda t: sum(grams for start, end, grams in disturbances if start <= t < end)
+
+
+def run_episode(scenario, controller_factory=HoverController, plant_params=None,
+                rate_hz=LOOP_RATE_HZ, seed=0):
+    """Fly one scenario and return the recorded trace."""
+    clock = SimClock(realtime=False)
+    rig = SimRig(clock=clock, seed=seed, disturbance=disturbance_for(scenario),
+                 **(plant_params or {}))
+    brick = NXTBrick(rig)
+    motor_rotor = Motor(brick, PORT_A, power=100, speedreg=False, smoothstart=True, brake=False)
+    motor_pitch = Motor(brick, PORT_B, power=35, speedreg=True, smoothstart=True, brake=True)
+    light = Light(brick, PORT_1, illuminated=True)
+
+    controller = controller_factory()
+    motor_rotor.reset_position()
+    motor_pitch.reset_position()
+    motor_rotor.run()
+    motor_pitch.turn_to(-controller.pitch)
+
+    trace = {'time': [], 'light': [], 'target': [], 'pitch': []}
+    compute_time = 0.0
+    scheduler = FixedRateScheduler(rate_hz, clock=clock.now, sleep=clock.sleep)
+    t_start = clock.now()
+    while True:
+        t = clock.now() - t_start
+        if t >= scenario['duration']:
+            break
+        target = target_at(scenario, t)
+        reading = light.get_lightness()
+
+        w0 = time.perf_counter()
+        pitch = controller.update(t, reading, target)
+        compute_time += time.perf_counter() - w0
+
+        motor_pitch.turn_to(-pitch)
+        trace['time'].append(t)
+        trace['light'].append(reading)
+        trace['target'].append(target)
+        trace['pitch'].append(pitch)
+        scheduler.wait()
+
+    motor_rotor.idle()
+    ticks = len(trace['time'])
+    trace['achieved_hz'] = scheduler.achieved_rate
+    trace['overruns'] = scheduler.overruns
+    trace['max_loop_hz'] = ticks / compute_time if compute_time > 0 else float('inf')
+    return trace
+
+
+def moving_average(values, times, window):
+    smoothed = []
+    start = 0
+    total = 0.0
+    for i, v in enumerate(values):
+        total += v
+        while times[i] - times[start] > window:
+            total -= values[start]
+            start += 1
+        smoothed.append(total / (i - start + 1))
+    return smoothed
+
+
+def evaluate(scenario, trace):
+    """Step response metrics from the evaluate_from time onwards."""
+    times = trace['time']
+    light = moving_average(trace['light'], times, METRIC_SMOOTHING)
+    t0 = scenario['evaluate_from']
+    i0 = next(i for i, t in enumerate(times) if t >= t0)
+    target = trace['target'][-1]
+    initial = light[i0 - 1] if i0 > 0 else light[0]
+    if t0 == 0:
+        initial = SimRig().light_bottom  # takeoff from the bottom stop
+    step = target - initial
+
+    seg_t = [t - t0 for t in times[i0:]]
+    seg_y = light[i0:]
+    errors = [y - target for y in seg_y]
+
+    rise_time = None
+    overshoot = None
+    if abs(step) > SETTLING_BAND:
+        t10 = t90 = None
+        for t, y in zip(seg_t, seg_y):
+            progress = (y - initial) / step
+            if t10 is None and progress >= 0.1:
+                t10 = t
+            if t90 is None and progress >= 0.9:
+                t90 = t
+                break
+        rise_time = t90 - t10 if t10 is not None and t90 is not None else None
+        overshoot = max(0.0, max((y - target) / step for y in seg_y)) * 100
+
+    settling_time = 0.0
+    for t, e in zip(seg_t, errors):
+        if abs(e) > SETTLING_BAND:
+            settling_time = t
+    if abs(errors[-1]) > SETTLING_BAND:
+        settling_time = None  # never settled
+
+    tail = errors[int(len(errors) * 0.8):]
+    pitch = trace['pitch']
+    return {
+        'rise_time': rise_time,
+        'overshoot_pct': overshoot,
+        'peak_error': max(abs(e) for e in errors),
+        'settling_time': settling_time,
+        'steady_state_error': sum(abs(e) for e in tail) / len(tail),
+        'actuator_travel': sum(abs(b - a) for a, b in zip(pitch[i0:-1], pitch[i0 + 1:])),
+        'achieved_hz': trace['achieved_hz'],
+        'max_loop_hz': trace['max_loop_hz'],
+        'overruns': trace['overruns'],
+    }
+
+
+def run_suite(controller_factory=HoverController, plant_params=None, scenarios=SCENARIOS,
+              rate_hz=LOOP_RATE_HZ, seed=0):
+    results = {}
+    for scenario in scenarios:
+        trace = run_episode(scenario, controller_factory, plant_params, rate_hz, seed)
+        results[scenario['name']] = evaluate(scenario, trace)
+    return results
+
+
+def compare(results, baseline):
+    """Return a list of regressions vs. a baseline results dict."""
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, tolerance in TOLERANCES.items():
+            new, old = metrics.get(metric), base.get(metric)
+            if old is None:
+                continue
+            if new is None:
+                regressions.append(f"{name}.{metric}: {old} -> never reached")
+            elif metric in ('achieved_hz', 'max_loop_hz'):
+                if new < old * tolerance:
+                    regressions.append(f"{name}.{metric}: {old:.1f} -> {new:.1f}")
+            elif metric in ('overshoot_pct', 'steady_state_error'):
+                if new > old + tolerance:
+                    regressions.append(f"{name}.{metric}: {old:.2f} -> {new:.2f}")
+            elif new > old * tolerance and new - old > 0.1:
+                regressions.append(f"{name}.{metric}: {old:.2f} -> {new:.2f}")
+    return regressions
+
+
+def format_table(results):
+    columns = ['rise_time', 'overshoot_pct', 'settling_time', 'steady_state_error',
+               'actuator_travel', 'achieved_hz', 'max_loop_hz']
+    lines = ['scenario    ' + ''.join(f'{c:>20}' for c in columns)]
+    for name, metrics in results.items():
+        cells = ''.join(f'{"-" if metrics[c] is None else f"{metrics[c]:.2f}":>20}' for c in columns)
+        lines.append(f'{name:<12}{cells}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hover controller against the simulated rig')
+    parser.add_argument('--kp', type=float, default=None)
+    parser.add_argument('--ki', type=float, default=None)
+    parser.add_argument('--kd', type=float, default=None)
+    parser.add_argument('--plant', help='JSON file of SimRig parameters (e.g. fitted to a recorded session)')
+    parser.add_argument('--rate', type=float, default=LOOP_RATE_HZ, help='control loop rate (Hz)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='also save the results as the baseline')
+    parser.add_argument('--output', help='results file (default: timestamped file in benchmark_results/)')
+    args = parser.parse_args()
+
+    gains = {name: getattr(args, name) for name in ('kp', 'ki', 'kd') if getattr(args, name) is not None}
+    plant_params = None
+    if args.plant:
+        with open(args.plant) as f:
+            plant_params = json.load(f)
+
+    results = run_suite(lambda: HoverController(**gains), plant_params, rate_hz=args.rate, seed=args.seed)
+    print(format_table(results))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('benchmark-%Y%m%d-%H%M%S.json'))
+    record = {'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'controller': HoverController(**gains).params(),
+              'plant': plant_params or {}, 'rate_hz': args.rate, 'seed': args.seed,
+              'results': results}
+    with open(output, 'w') as f:
+        json.dump(record, f, indent=2)
+    print(f'Results saved to {output}')
+    if args.save_baseline:
+        with open(os.path.join(RESULTS_DIR, 'baseline.json'), 'w') as f:
+            json.dump(record, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline)
+        if regressions:
+            print('Regressions vs. baseline:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('No regressions vs. baseline')
+
+
+if __name__ == '__main__':
+    main()
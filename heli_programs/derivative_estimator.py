@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+from collections import deque
+
+
+# Streaming derivative estimator for noisy, unevenly spaced samples.
+# Fits a polynomial (a line, or a quadratic for a Savitzky-Golay style fit)
+# to the samples of the last `window` seconds by least squares, and returns
+# its slope at the newest sample. The fit only needs running sums of t^k and
+# t^k * y, which are updated as samples enter and leave the window, so each
+# sample costs O(1) however many samples the window holds. The window is in
+# seconds, so the estimate means the same thing at any loop rate.
+#
+# Times are kept relative to a reference time that moves forward with the
+# window, and the sums are rebuilt from the stored samples every
+# REBUILD_INTERVAL samples so rounding errors from add/remove can't build up.
+
+REBUILD_INTERVAL = 1000
+
+
+class SlidingDerivative:
+    def __init__(self, window, order=1):
+        if window <= 0:
+            raise ValueError(f"window must be positive, got {window}")
+        if order not in (1, 2):
+            raise ValueError(f"order must be 1 (line) or 2 (quadratic), got {order}")
+        self.window = window
+        self.order = order
+        self.reset()
+
+    def reset(self):
+        self._samples = deque()
+        self._t_ref = None
+        # _st[k] = sum of t^k for k = 0..2*order, _sty[k] = sum of t^k * y for k = 0..order
+        self._st = [0.0] * (2 * self.order + 1)
+        self._sty = [0.0] * (self.order + 1)
+        self._since_rebuild = 0
+        self.slope = 0.0
+        self.value = None
+
+    def __len__(self):
+        return len(self._samples)
+
+    def _accumulate(self, t, y, sign):
+        st, sty = self._st, self._sty
+        tk = 1.0
+        for k in range(len(st)):
+            st[k] += sign * tk
+            if k < len(sty):
+                sty[k] += sign * tk * y
+            tk *= t
+
+    def _rebuild(self):
+        self._st = [0.0] * (2 * self.order + 1)
+        self._sty = [0.0] * (self.order + 1)
+        self._t_ref = self._samples[0][0] if self._samples else None
+        for t, y in self._samples:
+            self._accumulate(t - self._t_ref, y, 1)
+        self._since_rebuild = 0
+
+    def update(self, t, y):
+        """Add a sample and return the slope dy/dt at time t."""
+        samples = self._samples
+        if self._t_ref is None:
+            self._t_ref = t
+        samples.append((t, y))
+        self._accumulate(t - self._t_ref, y, 1)
+        while t - samples[0][0] > self.window:
+            old_t, old_y = samples.popleft()
+            self._accumulate(old_t - self._t_ref, old_y, -1)
+
+        self._since_rebuild += 1
+        if self._since_rebuild >= REBUILD_INTERVAL or samples[0][0] - self._t_ref > self.window:
+            self._rebuild()
+
+        self._fit(t - self._t_ref)
+        return self.slope
+
+    def _fit(self, t_now):
+        st, sty = self._st, self._sty
+        n = st[0]
+        if self.order == 1 or n < 3:
+            # Straight line: slope = cov(t, y) / var(t)
+            denominator = n * st[2] - st[1] * st[1]
+            if n < 2 or denominator <= 1e-12:
+                self.slope = 0.0
+                self.value = sty[0] / n
+                return
+            b = (n * sty[1] - st[1] * sty[0]) / denominator
+            a = (sty[0] - b * st[1]) / n
+            self.slope = b
+            self.value = a + b * t_now
+            return
+
+        # Quadratic y = a + b t + c t^2, normal equations solved by Cramer's rule
+        s0, s1, s2, s3, s4 = st
+        y0, y1, y2 = sty
+        det = s0 * (s2 * s4 - s3 * s3) - s1 * (s1 * s4 - s3 * s2) + s2 * (s1 * s3 - s2 * s2)
+        if abs(det) <= 1e-12:
+            self.slope = 0.0
+            self.value = y0 / s0
+            return
+        a = (y0 * (s2 * s4 - s3 * s3) - s1 * (y1 * s4 - s3 * y2) + s2 * (y1 * s3 - s2 * y2)) / det
+        b = (s0 * (y1 * s4 - y2 * s3) - y0 * (s1 * s4 - s3 * s2) + s2 * (s1 * y2 - y1 * s2)) / det
+        c = (s0 * (s2 * y2 - s3 * y1) - s1 * (s1 * y2 - s2 * y1) + y0 * (s1 * s3 - s2 * s2)) / det
+        self.slope = b + 2 * c * t_now
+        self.value = a + b * t_now + c * t_now * t_now
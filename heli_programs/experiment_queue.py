@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import sys
+import time
+
+
+# Resumable experiment queue.
+# Runs a list of parameterised test points and appends each completed point
+# to a checkpoint file (one JSON line, flushed to disk) as soon as it is done.
+# If the brick disconnects or the script crashes, running it again skips the
+# points already in the checkpoint and carries on from the first incomplete
+# one, so a long characterisation never has to start again from scratch.
+#
+#     queue = ExperimentQueue('pitch_sweep', [{'angle': a} for a in test_angles])
+#     for point in queue.pending():
+#         queue.complete(point, measure(**point))
+#     results = queue.results()
+#     ...save the results...
+#     queue.finish()
+#
+# Points are matched on their parameters, not their position, so changing a
+# parameter in the list re-runs just the points it affects. finish() archives
+# the checkpoint once every point is done and the results are saved, so the
+# next run measures afresh instead of replaying old readings. To throw away
+# an unfinished run, pass restart=True (scripts take it as --restart on the
+# command line, see restart_requested()).
+
+RESTART_FLAG = '--restart'
+
+
+def _key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def restart_requested(argv=None):
+    """True if the script was run with --restart."""
+    return RESTART_FLAG in (sys.argv[1:] if argv is None else argv)
+
+
+class ExperimentQueue:
+    def __init__(self, name, points, path=None, restart=False):
+        self.name = name
+        self.points = [dict(p) for p in points]
+        keys = [_key(p) for p in self.points]
+        if len(set(keys)) != len(keys):
+            raise ValueError(f"Experiment {name} has duplicate test points")
+        self.path = path or f'{name}_checkpoint.jsonl'
+        self._done = {}
+        if restart and os.path.exists(self.path):
+            os.remove(self.path)
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        wanted = {_key(p) for p in self.points}
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # last line cut short by a crash
+                key = _key(record['params'])
+                if key in wanted:
+                    self._done[key] = record['result']
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def completed(self):
+        return len(self._done)
+
+    def is_done(self, params):
+        return _key(params) in self._done
+
+    def pending(self):
+        """Yield the parameters of each point not completed yet, in order."""
+        if self._done:
+            print(f"{self.name}: resuming, {self.completed}/{len(self)} points already done ({self.path})")
+        for params in self.points:
+            if not self.is_done(params):
+                yield dict(params)
+
+    def complete(self, params, result):
+        """Checkpoint a finished point. result must be JSON serialisable."""
+        record = {'params': params, 'result': result, 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._done[_key(params)] = result
+
+    def run(self, measure):
+        """Call measure(**params) for every pending point and checkpoint each result."""
+        for params in self.pending():
+            self.complete(params, measure(**params))
+        return self.results()
+
+    def results(self):
+        """Results of the completed points, in point order."""
+        return [self._done[_key(p)] for p in self.points if _key(p) in self._done]
+
+    def finish(self):
+        """Archive the checkpoint of a finished run. Returns the archive path, or None if unfinished."""
+        if self.completed < len(self) or not os.path.isfile(self.path):
+            return None
+        archive = f"{os.path.splitext(self.path)[0]}_{time.strftime('%Y%m%d-%H%M%S')}.done.jsonl"
+        os.replace(self.path, archive)
+        self._done = {}
+        print(f"{self.name}: all {len(self)} points done, checkpoint archived to {archive}")
+        return archive
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import queue
+import sys
+import threading
+import time
+
+
+# Non-blocking structured logger for the hover control loop.
+# print() on a slow terminal can block the control thread for milliseconds.
+# Here the control thread only drops a fixed-schema record
+# (time, level, event, values) into a bounded in-memory queue. A background
+# thread formats the records and writes them to a file. Records below the
+# current level are rejected before anything is built, so a quiet flight pays
+# almost nothing for the log calls left in the loop.
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR', OFF: 'OFF'}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+
+class FlightLogger:
+    def __init__(self, path=None, level=INFO, schema=None, queue_size=4096,
+                 echo_level=WARNING, flush_interval=0.25):
+        if path is None:
+            path = time.strftime('flight_log_%Y%m%d-%H%M%S.log')
+        self.path = path
+        self.level = level
+        self.echo_level = echo_level  # records at or above this also go to the console
+        self.schema = dict(schema or {})  # event name -> tuple of field names
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._t0 = time.perf_counter()
+        self._file = open(path, 'w')
+        self._write_header()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._drain, name='flight-logger', daemon=True)
+        self._thread.start()
+
+    def set_level(self, level):
+        self.level = level
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, event, *values):
+        """Queue one record. Never blocks; drops the record if the queue is full."""
+        if level < self.level:
+            return
+        try:
+            self._queue.put_nowait((time.perf_counter() - self._t0, level, event, values))
+        except queue.Full:
+            self.dropped += 1
+
+    def debug(self, event, *values):
+        self.log(DEBUG, event, *values)
+
+    def info(self, event, *values):
+        self.log(INFO, event, *values)
+
+    def warning(self, event, *values):
+        self.log(WARNING, event, *values)
+
+    def error(self, event, *values):
+        self.log(ERROR, event, *values)
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+        self._write_pending()
+        if self.dropped:
+            self._file.write(f"# dropped {self.dropped} records (queue full)\n")
+        self._file.close()
+
+    def _write_header(self):
+        self._file.write('# time_s\tlevel\tevent\tvalues...\n')
+        for event, fields in self.schema.items():
+            self._file.write(f"# {event}: {', '.join(fields)}\n")
+
+    def _format(self, record):
+        t, level, event, values = record
+        fields = '\t'.join(str(v) for v in values)
+        return f"{t:.4f}\t{LEVEL_NAMES.get(level, level)}\t{event}\t{fields}"
+
+    def _write_pending(self):
+        lines = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            line = self._format(record)
+            lines.append(line)
+            if record[1] >= self.echo_level:
+                print(line, file=sys.stderr)
+        if lines:
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+
+    def _drain(self):
+        while not self._stopped.wait(self.flush_interval):
+            self._write_pending()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+
+# Streaming flight recorder.
+# Every channel of every control tick is appended to a chunked binary
+# columnar file, so a run keeps full fidelity however long it lasts and
+# memory stays flat. The control thread only copies one row into a
+# preallocated batch; full batches go through a bounded queue to a writer
+# thread, which appends them to the file.
+#
+# File layout (little endian):
+#     b'HFLOG1\n'
+#     uint32 header length, header JSON (channels, metadata, created)
+#     repeated chunks: b'CHNK', uint32 rows, then each channel's rows as float64
+# Each chunk stands on its own, so a file cut short by a crash is still
+# readable up to its last complete chunk.
+#
+# Convert a log with:
+#     python flight_recorder.py flight_20241015-122200.hfl --csv out.csv --npz out.npz
+
+MAGIC = b'HFLOG1\n'
+CHUNK_MAGIC = b'CHNK'
+BATCH_ROWS = 64  # rows per chunk, about 3 s at 20 Hz
+MAX_PENDING_CHUNKS = 256
+
+
+class FlightRecorder:
+    def __init__(self, channels, metadata=None, path=None, batch_rows=BATCH_ROWS,
+                 max_pending_chunks=MAX_PENDING_CHUNKS):
+        if path is None:
+            path = time.strftime('flight_%Y%m%d-%H%M%S.hfl')
+        if os.path.exists(path):
+            raise FileExistsError(f"Flight log {path} already exists")
+        self.path = path
+        self.channels = tuple(channels)
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self.dropped_chunks = 0
+        self._batch = np.empty((len(self.channels), batch_rows), dtype=np.float64)
+        self._fill = 0
+        self._queue = queue.Queue(maxsize=max_pending_chunks)
+
+        self._file = open(path, 'wb')
+        header = json.dumps({'channels': list(self.channels), 'metadata': metadata or {},
+                             'created': time.strftime('%Y-%m-%d %H:%M:%S')}).encode()
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self._file.flush()
+        self._thread = threading.Thread(target=self._write_chunks, name='flight-recorder', daemon=True)
+        self._thread.start()
+
+    def record(self, *values):
+        """Append one row, values in channel order. Never blocks."""
+        self._batch[:, self._fill] = values
+        self._fill += 1
+        self.rows += 1
+        if self._fill == self.batch_rows:
+            self._hand_off()
+
+    def _hand_off(self):
+        batch, rows = self._batch, self._fill
+        self._batch = np.empty_like(batch)
+        self._fill = 0
+        try:
+            self._queue.put_nowait((batch, rows))
+        except queue.Full:
+            self.dropped_chunks += 1
+
+    def close(self):
+        if self._fill:
+            self._hand_off()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def _write_chunks(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch, rows = item
+            self._file.write(CHUNK_MAGIC + struct.pack('<I', rows))
+            self._file.write(np.ascontiguousarray(batch[:, :rows]).tobytes())
+            self._file.flush()
+
+
+def read_flight_log(path):
+    """Return (header, {channel: array}) for a flight log."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a flight log")
+        (header_length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length))
+        n_channels = len(header['channels'])
+        chunks = []
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8 or chunk_header[:4] != CHUNK_MAGIC:
+                break
+            (rows,) = struct.unpack('<I', chunk_header[4:])
+            data = f.read(8 * rows * n_channels)
+            if len(data) < 8 * rows * n_channels:
+                break  # truncated last chunk
+            chunks.append(np.frombuffer(data, dtype=np.float64).reshape(n_channels, rows))
+    columns = np.concatenate(chunks, axis=1) if chunks else np.empty((n_channels, 0))
+    return header, {name: columns[i] for i, name in enumerate(header['channels'])}
+
+
+def export_csv(path, csv_path):
+    header, columns = read_flight_log(path)
+    names = header['channels']
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(columns[name].tolist() for name in names)))
+    return csv_path
+
+
+def export_npz(path, npz_path):
+    header, columns = read_flight_log(path)
+    np.savez(npz_path, metadata=json.dumps(header), **columns)
+    return npz_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a flight log to CSV or NumPy')
+    parser.add_argument('log')
+    parser.add_argument('--csv', help='output CSV file')
+    parser.add_argument('--npz', help='output .npz file')
+    args = parser.parse_args()
+
+    header, columns = read_flight_log(args.log)
+    rows = len(next(iter(columns.values()))) if columns else 0
+    print(f"{args.log}: {rows} rows, channels {', '.join(header['channels'])}")
+    print(f"created {header['created']}, metadata {json.dumps(header['metadata'])}")
+    if args.csv:
+        print(f"Wrote {export_csv(args.log, args.csv)}")
+    if args.npz:
+        print(f"Wrote {export_npz(args.log, args.npz)}")
+
+
+if __name__ == '__main__':
+    main()
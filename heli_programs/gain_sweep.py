@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import inspect
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from controller_benchmark import SCENARIOS, LOOP_RATE_HZ, run_suite
+from hover_control import HoverController, KP, KI, KD
+from altitude_kalman import PROCESS_NOISE
+from lift_map import GaussianProcessSurface
+from sim_lego import SimRig
+
+
+# Parallel gain sweep for the hover controller.
+# Candidates (kp, ki, kd, and process_noise - the Kalman filter's smoothing
+# knob) are flown through the controller_benchmark scenarios against the
+# simulated rig, one candidate per process on every core. Each result is
+# cached under a hash of the full controller configuration, plant
+# parameters, scenarios and loop rate, so re-running a sweep only flies the
+# new candidates, and changing a controller default re-flies everything.
+#
+# Search modes:
+#   grid      every combination of the GRID values
+#   random    uniform samples inside BOUNDS (log-uniform for process_noise)
+#   adaptive  rounds of random sampling that concentrate around the best
+#             candidates so far, with a shrinking spread (cross-entropy style)
+#   bayes     Bayesian optimisation: after a random first round, fit the
+#             Gaussian-process surface from lift_map.py to the scores so far
+#             and fly the batch of untried candidates with the lowest
+#             confidence bound (predicted score - EXPLORATION * its std)
+#
+# Output is a table ranked by score (total settling time plus a penalty on
+# actuator travel) and the Pareto front of settling time vs. actuator travel.
+#
+# Example:
+#     python gain_sweep.py --mode bayes --samples 16 --rounds 4
+
+CACHE_DIR = 'sweep_cache'
+CACHE_VERSION = 1
+UNSETTLED_PENALTY = 60.0  # seconds charged for a scenario that never settles
+TRAVEL_WEIGHT = 0.01      # seconds of score per motor degree of actuator travel
+
+GRID = {
+    'kp': [0.1, 0.2, 0.26, 0.4],
+    'ki': [0.25, 0.5, 0.75, 1.0],
+    'kd': [0.0, 0.02, 0.05],
+    'process_noise': [1000.0, 10000.0],
+}
+BOUNDS = {
+    'kp': (0.0, 0.8),
+    'ki': (0.05, 2.0),
+    'kd': (0.0, 0.15),
+    'process_noise': (100.0, 100000.0),
+}
+LOG_SCALE = {'process_noise'}
+EXPLORATION = 2.0     # bayes: standard deviations of optimism in the confidence bound
+POOL_SIZE = 2000      # bayes: random candidates the surface is evaluated on per round
+MIN_DISTANCE = 0.05   # bayes: closest two candidates in one batch may be (unit cube)
+
+
+def make_controller(candidate):
+    return HoverController(kp=candidate['kp'], ki=candidate['ki'], kd=candidate['kd'],
+                           kalman_params={'process_noise': candidate['process_noise']})
+
+
+def candidate_id(candidate):
+    return json.dumps(candidate, sort_keys=True)
+
+
+def plant_config(plant_params):
+    """The SimRig physics a sweep flies against: its defaults with plant_params on top."""
+    defaults = {name: p.default for name, p in inspect.signature(SimRig).parameters.items()
+                if name not in ('clock', 'seed', 'disturbance')}
+    return {**defaults, **(plant_params or {})}
+
+
+def cache_key(candidate, plant_params, rate_hz, seed):
+    # The whole controller configuration and plant physics, so a change to a
+    # default (smoothing, limits, estimator, the sim rig...) doesn't reuse
+    # results flown with the old one
+    config = {'candidate': candidate, 'controller': make_controller(candidate).params(),
+              'plant': plant_config(plant_params), 'scenarios': SCENARIOS,
+              'rate_hz': rate_hz, 'seed': seed, 'version': CACHE_VERSION}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:20]
+
+
+def summarise(results):
+    settling = sum(UNSETTLED_PENALTY if m['settling_time'] is None else m['settling_time']
+                   for m in results.values())
+    travel = sum(m['actuator_travel'] for m in results.values())
+    return {'settling_time': settling, 'actuator_travel': travel,
+            'steady_state_error': max(m['steady_state_error'] for m in results.values()),
+            'score': settling + TRAVEL_WEIGHT * travel}
+
+
+def evaluate_candidate(job):
+    """Worker: fly the benchmark scenarios for one candidate."""
+    candidate, plant_params, rate_hz, seed = job
+    results = run_suite(lambda: make_controller(candidate), plant_params, rate_hz=rate_hz, seed=seed)
+    return candidate, results
+
+
+def run_candidates(candidates, plant_params=None, rate_hz=LOOP_RATE_HZ, seed=0, processes=None):
+    """Evaluate candidates in parallel, reusing cached results. Returns a list of result rows."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    rows, jobs = [], []
+    for candidate in candidates:
+        path = os.path.join(CACHE_DIR, cache_key(candidate, plant_params, rate_hz, seed) + '.json')
+        if os.path.isfile(path):
+            with open(path) as f:
+                rows.append(json.load(f))
+        else:
+            jobs.append((candidate, plant_params, rate_hz, seed))
+
+    if jobs:
+        with multiprocessing.Pool(processes) as pool:
+            for candidate, results in pool.imap_unordered(evaluate_candidate, jobs):
+                row = {'candidate': candidate, 'summary': summarise(results), 'results': results}
+                path = os.path.join(CACHE_DIR, cache_key(candidate, plant_params, rate_hz, seed) + '.json')
+                with open(path, 'w') as f:
+                    json.dump(row, f)
+                rows.append(row)
+    print(f"{len(candidates)} candidates: {len(candidates) - len(jobs)} cached, {len(jobs)} flown")
+    return rows
+
+
+def grid_candidates():
+    names = list(GRID)
+    return [dict(zip(names, values)) for values in itertools.product(*(GRID[n] for n in names))]
+
+
+def sample(rng, centre=None, spread=1.0):
+    """One candidate inside BOUNDS, uniform or around a centre candidate."""
+    candidate = {}
+    for name, (low, high) in BOUNDS.items():
+        log = name in LOG_SCALE
+        lo, hi = (math.log(low), math.log(high)) if log else (low, high)
+        if centre is None:
+            value = rng.uniform(lo, hi)
+        else:
+            c = math.log(centre[name]) if log else centre[name]
+            value = min(hi, max(lo, rng.gauss(c, spread * (hi - lo))))
+        candidate[name] = round(math.exp(value) if log else value, 4)
+    return candidate
+
+
+def default_candidate():
+    return {'kp': KP, 'ki': KI, 'kd': KD, 'process_noise': PROCESS_NOISE}
+
+
+def unique(candidates, seen):
+    """Candidates not in seen (ids) and not repeated; adds the ones returned to seen."""
+    fresh = []
+    for candidate in candidates:
+        key = candidate_id(candidate)
+        if key not in seen:
+            seen.add(key)
+            fresh.append(candidate)
+    return fresh
+
+
+def adaptive_search(samples, rounds, plant_params, rate_hz, seed, processes, elite_fraction=0.25):
+    rng = random.Random(seed)
+    seen = set()
+    candidates = unique([default_candidate()] + [sample(rng) for _ in range(samples - 1)], seen)
+    rows = []
+    spread = 0.25
+    for round_number in range(rounds):
+        print(f"Round {round_number + 1}/{rounds}")
+        rows += run_candidates(candidates, plant_params, rate_hz, seed, processes)
+        ranked = sorted(rows, key=lambda r: r['summary']['score'])
+        elite = [r['candidate'] for r in ranked[:max(1, int(len(ranked) * elite_fraction))]]
+        spread *= 0.6
+        # Rounding to 4 places can land on a candidate already flown - draw again
+        candidates = []
+        for _ in range(samples * 10):
+            if len(candidates) == samples:
+                break
+            candidates += unique([sample(rng, rng.choice(elite), spread)], seen)
+    return rows
+
+
+def to_unit(candidate):
+    """Candidate as a point in the unit cube spanned by BOUNDS (log scale where LOG_SCALE)."""
+    point = []
+    for name, (low, high) in BOUNDS.items():
+        value = candidate[name]
+        if name in LOG_SCALE:
+            value, low, high = math.log(value), math.log(low), math.log(high)
+        point.append((value - low) / (high - low))
+    return point
+
+
+def bayes_search(samples, rounds, plant_params, rate_hz, seed, processes):
+    rng = random.Random(seed)
+    seen = set()
+    candidates = unique([default_candidate()] + [sample(rng) for _ in range(samples - 1)], seen)
+    rows = []
+    for round_number in range(rounds):
+        print(f"Round {round_number + 1}/{rounds}")
+        rows += run_candidates(candidates, plant_params, rate_hz, seed, processes)
+        if round_number == rounds - 1:
+            break
+
+        surface = GaussianProcessSurface().fit([to_unit(r['candidate']) for r in rows],
+                                               [r['summary']['score'] for r in rows])
+        best = min(rows, key=lambda r: r['summary']['score'])['candidate']
+        # Random candidates over the whole space, plus some close to the best so far
+        pool = [sample(rng) for _ in range(POOL_SIZE // 2)] + \
+               [sample(rng, best, 0.05) for _ in range(POOL_SIZE // 2)]
+        pool = unique(pool, set(seen))
+        points = np.array([to_unit(c) for c in pool])
+        mean, std = surface.predict(points)
+        bound = mean - EXPLORATION * std
+
+        # Lowest bound first, skipping candidates too close to one already in the batch
+        candidates, chosen = [], []
+        for i in np.argsort(bound):
+            if len(candidates) == samples:
+                break
+            if chosen and np.min(np.linalg.norm(np.array(chosen) - points[i], axis=1)) < MIN_DISTANCE:
+                continue
+            chosen.append(points[i])
+            candidates.append(pool[i])
+        unique(candidates, seen)
+        print(f"  surface fitted to {len(rows)} candidates, length scale {surface.length_scale}")
+    return rows
+
+
+def pareto_front(rows):
+    """Rows not beaten on both settling time and actuator travel by any other row."""
+    front = []
+    for row in sorted(rows, key=lambda r: (r['summary']['settling_time'], r['summary']['actuator_travel'])):
+        if not front or row['summary']['actuator_travel'] < front[-1]['summary']['actuator_travel']:
+            front.append(row)
+    return front
+
+
+def format_rows(rows):
+    lines = [f"{'kp':>8}{'ki':>8}{'kd':>8}{'q':>10}{'settling':>10}{'travel':>10}{'sse':>8}{'score':>9}"]
+    for row in rows:
+        c, s = row['candidate'], row['summary']
+        lines.append(f"{c['kp']:>8.3f}{c['ki']:>8.3f}{c['kd']:>8.3f}{c['process_noise']:>10.0f}"
+                     f"{s['settling_time']:>10.1f}{s['actuator_travel']:>10.0f}"
+                     f"{s['steady_state_error']:>8.2f}{s['score']:>9.1f}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep hover controller gains against the simulated rig')
+    parser.add_argument('--mode', choices=['grid', 'random', 'adaptive', 'bayes'], default='bayes')
+    parser.add_argument('--samples', type=int, default=32, help='candidates (per round for adaptive/bayes)')
+    parser.add_argument('--rounds', type=int, default=4, help='refinement rounds (adaptive/bayes)')
+    parser.add_argument('--plant', help='JSON file of SimRig parameters')
+    parser.add_argument('--rate', type=float, default=LOOP_RATE_HZ)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', help='JSON file for all results')
+    args = parser.parse_args()
+
+    plant_params = None
+    if args.plant:
+        with open(args.plant) as f:
+            plant_params = json.load(f)
+
+    start = time.perf_counter()
+    if args.mode == 'grid':
+        rows = run_candidates(grid_candidates(), plant_params, args.rate, args.seed, args.processes)
+    elif args.mode == 'random':
+        rng = random.Random(args.seed)
+        rows = run_candidates([sample(rng) for _ in range(args.samples)],
+                              plant_params, args.rate, args.seed, args.processes)
+    elif args.mode == 'adaptive':
+        rows = adaptive_search(args.samples, args.rounds, plant_params, args.rate, args.seed, args.processes)
+    else:
+        rows = bayes_search(args.samples, args.rounds, plant_params, args.rate, args.seed, args.processes)
+    print(f"Sweep took {time.perf_counter() - start:.1f} s")
+
+    ranked = sorted(rows, key=lambda r: r['summary']['score'])
+    print(f"\nTop {args.top} by score:")
+    print(format_rows(ranked[:args.top]))
+    print("\nPareto front (settling time vs. actuator travel):")
+    print(format_rows(pareto_front(rows)))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'mode': args.mode, 'plant': plant_params or {}, 'rows': ranked}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
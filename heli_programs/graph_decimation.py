@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+from collections import deque
+
+
+# Min/max decimation for the live Kivy graphs.
+# Rebuilding every plot's point list from the whole telemetry history on each
+# frame costs more the longer the session runs. DecimatedSeries splits the
+# visible time window into one bucket per horizontal pixel and keeps only the
+# minimum and maximum value seen in each bucket, so a plot never has more
+# than two points per pixel column. New samples only touch the newest bucket,
+# and buckets that scroll off the left of the graph are dropped from the
+# front, so the work per frame depends on how many samples arrived since the
+# last frame, not on the session length.
+
+
+class DecimatedSeries:
+    def __init__(self, window, width_px=800):
+        self.window = window  # seconds of x axis shown
+        self.set_width(width_px)
+
+    def set_width(self, width_px):
+        """Change the pixel width. Clears the series - re-add the visible samples."""
+        self.width_px = max(1, int(width_px))
+        self.bucket_width = self.window / self.width_px
+        self.clear()
+
+    def clear(self):
+        # [bucket index, min, max] per bucket, oldest first
+        self._buckets = deque()
+        # Two points per bucket, (x, min) and (x, max), matching _buckets
+        self.points = []
+
+    def add(self, t, y):
+        index = int(t // self.bucket_width)
+        buckets = self._buckets
+        if buckets and buckets[-1][0] == index:
+            bucket = buckets[-1]
+            if y < bucket[1]:
+                bucket[1] = y
+                self.points[-2] = (self.points[-2][0], y)
+            elif y > bucket[2]:
+                bucket[2] = y
+                self.points[-1] = (self.points[-1][0], y)
+            return
+        buckets.append([index, y, y])
+        x = index * self.bucket_width
+        self.points.append((x, y))
+        self.points.append((x, y))
+
+    def extend(self, times, values):
+        add = self.add
+        for t, y in zip(times, values):
+            add(t, y)
+
+    def trim(self, xmin):
+        """Drop buckets that end before xmin."""
+        buckets = self._buckets
+        first_kept = int(xmin // self.bucket_width)
+        dropped = 0
+        while buckets and buckets[0][0] < first_kept:
+            buckets.popleft()
+            dropped += 1
+        if dropped:
+            del self.points[:2 * dropped]
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+from altitude_kalman import AltitudeKalman
+from derivative_estimator import SlidingDerivative
+from pid import PID, POSITION
+
+
+# The hover control law, pulled out of the Kivy GUI so the same code can be
+# flown, benchmarked and replayed.
+#   - height and vertical speed come from a Kalman filter on the raw light
+#     reading, with the pitch command as its control input (altitude_kalman.py)
+#   - or, with estimator='ema', the old pair: a one-sided moving average of
+#     the reading and the slope of a least-squares line through the last
+#     VELOCITY_WINDOW seconds of it (derivative_estimator.py)
+#   - a PID (pid.py) turns height error into the blade pitch motor angle
+#   - optionally a feed-forward (e.g. lift_feedforward.py) gives the pitch
+#     expected to hold the target, and the PID only corrects around it
+# Light readings go down as the rotor goes up, so the loop is reverse acting:
+# height - target > 0 means the rotor is too low and needs more pitch.
+#
+# v2.9 updated the pitch incrementally every 50 ms tick:
+#     pitch += (height - target) * 0.025 + vertical_speed * 0.013
+# Adding error every tick is an integral term (0.025 / 0.05 s = 0.5 per s), and
+# adding vertical speed every tick is a proportional term on the measurement
+# (0.013 / 0.05 s = 0.26). KP, KI and a setpoint weight of 0 below reproduce
+# that law, but with the measured dt, anti-windup and a real D term available.
+
+KALMAN = 'kalman'
+EMA = 'ema'
+ESTIMATOR = KALMAN
+SMOOTHING_FACTOR = 0.65
+VELOCITY_WINDOW = 0.25  # seconds
+KP = 0.26
+KI = 0.5
+KD = 0.0
+SETPOINT_WEIGHT = 0.0  # P acts on the measurement only, so setpoint steps don't kick the pitch
+INITIAL_PITCH = 100
+PITCH_MIN = 0
+PITCH_MAX = 600
+
+# Bit flags for the 'pitch_event' telemetry channel: what the hover loop did
+# to the controller's pitch on a tick, besides the PID update, so that
+# replay.py can do the same. 'event_pitch' holds the pitch for TRACK/RESET.
+PITCH_TRACK = 1   # manual pitch tracked before the update (pitch setter)
+PITCH_RESET = 2   # controller reset to the pitch a relay autotune finished on
+PITCH_TRIM = 4    # PID output replaced by the learned trim after a setpoint change
+PITCH_RELAY = 8   # the relay autotune drove the pitch; the PID did not run
+
+
+class HoverController:
+    def __init__(self, kp=KP, ki=KI, kd=KD, smoothing=SMOOTHING_FACTOR,
+                 initial_pitch=INITIAL_PITCH, pitch_min=PITCH_MIN, pitch_max=PITCH_MAX,
+                 form=POSITION, setpoint_weight=SETPOINT_WEIGHT, rate_limit=None,
+                 velocity_window=VELOCITY_WINDOW, velocity_order=1,
+                 estimator=ESTIMATOR, kalman_params=None, feedforward=None):
+        if estimator not in (KALMAN, EMA):
+            raise ValueError(f"Unknown height estimator: {estimator}")
+        self.estimator = estimator
+        self.kalman = AltitudeKalman(**(kalman_params or {}))
+        self.smoothing = smoothing
+        self.velocity_estimator = SlidingDerivative(velocity_window, velocity_order)
+        self.initial_pitch = initial_pitch
+        self.feedforward = feedforward  # f(target light reading) -> pitch, or None
+        self.pid = PID(kp, ki, kd, form=form, direction=-1,
+                       output_min=pitch_min, output_max=pitch_max, rate_limit=rate_limit,
+                       setpoint_weight=setpoint_weight, output=initial_pitch)
+        self.reset()
+
+    @classmethod
+    def from_params(cls, params, feedforward=None):
+        """Controller configured like the one whose params() gave params (e.g. a flight log header)."""
+        return cls(kp=params['kp'], ki=params['ki'], kd=params['kd'], smoothing=params['smoothing'],
+                   initial_pitch=params['initial_pitch'], pitch_min=params['pitch_min'],
+                   pitch_max=params['pitch_max'], form=params['form'],
+                   setpoint_weight=params['setpoint_weight'], rate_limit=params['rate_limit'],
+                   velocity_window=params['velocity_window'], velocity_order=params['velocity_order'],
+                   estimator=params['estimator'],
+                   kalman_params={'process_noise': params['process_noise'],
+                                  'measurement_noise': params['measurement_noise'],
+                                  'control_gain': params['control_gain']},
+                   feedforward=feedforward)
+
+    def reset(self, pitch=None):
+        self.pid.reset(self.initial_pitch if pitch is None else pitch)
+        self.samples = 0
+        self.light_reading = None  # smoothed height
+        self.vertical_speed = 0.0
+        self.velocity_estimator.reset()
+        self.kalman.reset()
+
+    @property
+    def pitch(self):
+        return self.pid.output
+
+    @pitch.setter
+    def pitch(self, value):
+        # Manual pitch change - the PID carries on from here without a jump
+        self.pid.track(value)
+
+    @property
+    def p_term(self):
+        return self.pid.p_term
+
+    @property
+    def i_term(self):
+        return self.pid.i_term
+
+    @property
+    def d_term(self):
+        return self.pid.d_term
+
+    @property
+    def ff_term(self):
+        return self.pid.ff_term
+
+    def params(self):
+        pid = self.pid
+        kalman = self.kalman
+        return {'estimator': self.estimator, 'process_noise': kalman.process_noise,
+                'measurement_noise': kalman.measurement_noise, 'control_gain': kalman.control_gain,
+                'kp': pid.kp, 'ki': pid.ki, 'kd': pid.kd, 'form': pid.form,
+                'setpoint_weight': pid.setpoint_weight, 'rate_limit': pid.rate_limit,
+                'smoothing': self.smoothing, 'velocity_window': self.velocity_estimator.window,
+                'velocity_order': self.velocity_estimator.order, 'initial_pitch': self.initial_pitch,
+                'pitch_min': pid.output_min, 'pitch_max': pid.output_max,
+                'feedforward': self.feedforward is not None}
+
+    def update(self, t, raw_light_reading, target):
+        """Run one control tick and return the new target pitch (motor degrees)."""
+        self.estimate(t, raw_light_reading)
+        return self.control(t, target)
+
+    def estimate(self, t, raw_light_reading):
+        """First half of a tick: update the height and vertical speed estimates."""
+        if self.estimator == KALMAN:
+            # The pitch command in force since the last tick is the control input
+            light_reading = self.kalman.update(t, raw_light_reading, self.pid.output)
+            vertical_speed = self.kalman.velocity
+        else:
+            # One-sided moving average; the first two samples are taken as they are
+            if self.samples > 1:
+                light_reading = self.light_reading * (1 - self.smoothing) + raw_light_reading * self.smoothing
+            else:
+                light_reading = raw_light_reading
+
+            # Vertical speed over the last VELOCITY_WINDOW seconds (O(1) per sample)
+            vertical_speed = self.velocity_estimator.update(t, light_reading)
+
+        self.light_reading = light_reading
+        self.vertical_speed = vertical_speed
+        self.samples += 1
+
+    def control(self, t, target):
+        """Second half of a tick: the control law on the latest estimates. Returns the target pitch."""
+        feedforward = self.feedforward(target) if self.feedforward is not None else 0.0
+        return self.pid.update(target, self.light_reading, t, measurement_rate=self.vertical_speed,
+                               feedforward=feedforward)
+
+
+class ControlState:
+    """Live hover loop state, owned by the control thread.
+
+    A plain slotted object rather than Kivy properties: writing it costs a
+    single attribute store with no event dispatch, so the control loop never
+    touches the GUI. The GUI reads a snapshot() at frame rate. Button handlers
+    may set the setpoint fields; each is a single attribute store.
+    """
+    __slots__ = ('time', 'target_power', 'target_pitch', 'target_light_sensor_reading',
+                 'light_reading', 'vertical_speed')
+
+    def __init__(self, target_power=100, target_pitch=INITIAL_PITCH, target_light_sensor_reading=410):
+        self.time = 0.0
+        self.target_power = target_power
+        self.target_pitch = target_pitch
+        self.target_light_sensor_reading = target_light_sensor_reading
+        self.light_reading = None
+        self.vertical_speed = 0.0
+
+    def snapshot(self):
+        copy = ControlState.__new__(ControlState)
+        for name in ControlState.__slots__:
+            setattr(copy, name, getattr(self, name))
+        return copy
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import argparse
+import math
+import socketserver
+import sys
+import threading
+
+from hover_control import KP, KI, KD
+from hover_loop import HoverLoop, DATA_DURATION, TARGET_LIGHT, LOOP_RATE_HZ
+
+
+# Headless hover runner - the same flight as the Kivy GUI (hover_loop.py)
+# with no window, graphs or render clock, for unattended flights and
+# benchmarks on the rig. Setpoints come in as text commands, one per line,
+# on stdin and optionally on a TCP port:
+#
+#     python hover_headless.py --duration 120 --port 5005
+#     echo "target 380" | nc localhost 5005
+#
+# The port has no authentication and the commands move a spinning rotor, so
+# it only listens on this machine unless --host says otherwise.
+#
+# Commands:
+#     target N      hover at light reading N (lower is higher)
+#     up / down     move the target one step (like the GUI buttons)
+#     pitch N       set the pitch (motor degrees); the controller carries on from it
+#     autotune      start a relay autotune, abort it, or apply its gains
+#     log LEVEL     DEBUG, INFO, WARNING or OFF
+#     status        print the current state
+#     stop          stop the motors and end the flight
+# A bare number is taken as a target.
+
+STATUS_INTERVAL = 1.0  # seconds between status lines, 0 for none
+COMMAND_HOST = '127.0.0.1'  # interface the command port listens on
+
+
+def _number(text):
+    """float(text), but only for finite numbers - 'nan' and 'inf' would poison the controller."""
+    value = float(text)
+    if not math.isfinite(value):
+        raise ValueError(f"{text} is not a finite number")
+    return value
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def handle_command(hover, line):
+    """Run one command line. Returns a reply for the caller."""
+    words = line.split()
+    if not words:
+        return ''
+    command, args = words[0].lower(), words[1:]
+    try:
+        if command == 'target' and len(args) == 1:
+            hover.set_target(_number(args[0]))
+        elif len(words) == 1 and _is_number(command):
+            hover.set_target(_number(command))
+        elif command == 'up':
+            hover.nudge_target(+1)
+        elif command == 'down':
+            hover.nudge_target(-1)
+        elif command == 'pitch' and len(args) == 1:
+            hover.set_pitch(_number(args[0]))
+        elif command == 'autotune':
+            hover.autotune(source='the command line')
+        elif command == 'log' and len(args) == 1:
+            hover.set_log_level(args[0])
+        elif command == 'status':
+            pass
+        elif command in ('stop', 'quit', 'exit'):
+            hover.stop()
+            return 'stopping'
+        else:
+            return f"unknown command: {line.strip()}"
+    except (ValueError, KeyError) as e:
+        return f"bad command {line.strip()!r}: {e}"
+    return hover.status_text()
+
+
+def read_stdin(hover):
+    for line in sys.stdin:
+        reply = handle_command(hover, line)
+        if reply:
+            print(reply)
+        if not hover.running:
+            break
+
+
+def serve_commands(hover, port, host=COMMAND_HOST):
+    """Accept command lines on a TCP port; each gets a one-line reply."""
+
+    class CommandHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                reply = handle_command(hover, raw.decode(errors='replace'))
+                self.wfile.write((reply + '\n').encode())
+
+    class Server(socketserver.ThreadingTCPServer):
+        allow_reuse_address = True
+        daemon_threads = True
+
+    server = Server((host, port), CommandHandler)
+    threading.Thread(target=server.serve_forever, name='command-server', daemon=True).start()
+    print(f"Listening for commands on {host}:{port}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fly the hover controller without the GUI')
+    parser.add_argument('--duration', type=float, default=DATA_DURATION, help='seconds to fly')
+    parser.add_argument('--target', type=float, default=TARGET_LIGHT, help='initial light reading setpoint')
+    parser.add_argument('--kp', type=float, default=KP)
+    parser.add_argument('--ki', type=float, default=KI)
+    parser.add_argument('--kd', type=float, default=KD)
+    parser.add_argument('--rate', type=float, default=LOOP_RATE_HZ, help='control loop rate (Hz)')
+    parser.add_argument('--port', type=int, help='also take commands on this TCP port')
+    parser.add_argument('--host', default=COMMAND_HOST,
+                        help='interface for the command port (default: this machine only; 0.0.0.0 for all)')
+    parser.add_argument('--no-stdin', action='store_true', help="don't read commands from stdin")
+    parser.add_argument('--status-interval', type=float, default=STATUS_INTERVAL,
+                        help='seconds between status lines, 0 for none')
+    args = parser.parse_args()
+
+    hover = HoverLoop(script=__file__, duration=args.duration, target=args.target,
+                      kp=args.kp, ki=args.ki, kd=args.kd, loop_rate_hz=args.rate)
+    server = None
+    try:
+        hover.start()
+        if not args.no_stdin:
+            threading.Thread(target=read_stdin, args=(hover,), name='stdin-commands', daemon=True).start()
+        if args.port:
+            server = serve_commands(hover, args.port, args.host)
+        while hover.data_thread.is_alive():
+            hover.data_thread.join(args.status_interval or None)
+            if args.status_interval and hover.data_thread.is_alive():
+                print(hover.status_text())
+    except KeyboardInterrupt:
+        print("Interrupted")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        hover.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+
+import math
+import os.path
+import pickle
+import threading
+import time
+
+from lego_backend import NXTBrick, Motor, Light, PORT_A, PORT_B, PORT_1
+from loop_scheduler import FixedRateScheduler, SKIP
+from telemetry_buffer import TelemetryRingBuffer
+from flight_recorder import FlightRecorder, export_csv
+from flight_logger import FlightLogger, LEVELS, DEBUG, INFO, WARNING, OFF
+from hover_control import (HoverController, ControlState, KP, KI, KD,
+                           PITCH_TRACK, PITCH_RESET, PITCH_TRIM, PITCH_RELAY)
+from lift_feedforward import load_feedforward
+from trim_cache import TrimCache
+from sensor_acquisition import SensorAcquisition, LIGHT_STAGE, ENCODER_STAGE
+from latency_histogram import LatencyProfiler
+from chrome_trace import open_trace
+from actuator_arbiter import ActuatorArbiter, MANUAL
+from relay_autotune import RelayAutotuner, DONE
+
+
+# The hover flight itself, with no GUI: brick and motors, the sensor and
+# actuator threads, the control loop thread, the session log, trace and
+# flight recorder. The Kivy GUI (v2.9-actualkIattempt.py) and the headless
+# runner (hover_headless.py) both fly with a HoverLoop and only differ in how
+# setpoints come in and what gets shown:
+#
+#     hover = HoverLoop(script=__file__)
+#     hover.start()            # spins the rotor up and starts the control thread
+#     hover.set_target(380)    # from any thread
+#     hover.data_thread.join()
+#     hover.close()            # stops the motors, writes the logs
+#
+# Setpoint and pitch commands are single attribute stores or go through the
+# actuator thread, so they are safe to call from a GUI or input thread.
+
+SMOOTHING_FACTOR = 0.65
+DATA_DURATION = 60  # seconds to run the data collection
+LOOP_RATE_HZ = 20  # control loop rate - the gains were tuned at 20 Hz
+LOOP_OVERRUN_POLICY = SKIP  # or CATCH_UP to run missed ticks back to back
+TELEMETRY_CAPACITY = LOOP_RATE_HZ * 3600  # keep up to an hour of samples
+TARGET_LIGHT = 410  # 500 for lowest 250 for highest rotor - this is the target value for PID
+TARGET_STEP = 20  # light reading per height step
+PITCH_STEP = 100
+PITCH_LIMIT = 900  # manual pitch range is 0..PITCH_LIMIT
+SPIN_UP_TIME = 3  # seconds before the rotor starts
+LOG_LEVEL = INFO  # DEBUG also logs the D term internals, WARNING for production flights
+LOG_LEVEL_CYCLE = [DEBUG, INFO, WARNING, OFF]
+LOG_SCHEMA = {
+    'pid_terms': ('vertical_speed', 'p_term', 'i_term', 'd_term', 'ff_term'),
+    'control': ('target_pitch', 'target_height', 'current_height'),
+    'sensor_read_error': ('error',),
+    'sensor_stats': ('samples_per_second', 'errors', 'stale_ticks'),
+    'loop_stats': ('stats',),
+    'autotune': ('status', 'message'),
+    'trim': ('target_height', 'trim_pitch'),
+    'actuator_stats': ('stats',),
+    'latency': ('stage', 'count', 'p50_ms', 'p99_ms', 'max_ms'),
+}
+# Per-stage latency histograms (latency_histogram.py). The reads and turn_to
+# run on their own threads; 'tick' is the control thread's work per tick
+# and 'graph' the live graph redraw on the GUI thread, if there is one.
+LATENCY_STAGES = (ENCODER_STAGE, LIGHT_STAGE, 'estimate', 'control', 'actuate', 'log', 'tick', 'graph')
+# pitch_event/event_pitch record manual pitches, relay runs and trim jumps
+# (PITCH_* flags in hover_control.py) so replay.py can reproduce the flight
+TELEMETRY_CHANNELS = ['time', 'position', 'speed', 'raw_light', 'light', 'vertical_speed',
+                      'target_light', 'target_pitch', 'pitch_event', 'event_pitch']
+
+
+def load_calibration():
+    """Calibration coefficients for the run metadata, if the calibration scripts have been run."""
+    calibration = {}
+    for name in ('angle_conversion', 'force_conversion'):
+        if os.path.isfile(f'{name}.pickle'):
+            with open(f'{name}.pickle', 'rb') as f:
+                data = pickle.load(f)
+            calibration[name] = [list(map(float, c)) for c in data] if name == 'angle_conversion' \
+                else list(map(float, data))
+    return calibration
+
+
+class HoverLoop:
+    def __init__(self, script=None, duration=DATA_DURATION, target=TARGET_LIGHT, kp=KP, ki=KI, kd=KD,
+                 loop_rate_hz=LOOP_RATE_HZ, log_level=LOG_LEVEL):
+        self.duration = duration
+        self.loop_rate_hz = loop_rate_hz
+
+        # Controller state lives in a plain object owned by the data thread
+        self.state = ControlState(
+            target_power=100,  # Default target speed - 80% to make it more interesting
+            target_pitch=100,  # Default target pitch
+            target_light_sensor_reading=target)
+
+        # Initialize Motors and Brick
+        try:
+            self.brick = NXTBrick()
+        except Exception as e:
+            print(f"Failed to connect to NXT Brick: {e}")
+            exit()
+
+        # Set up rotor motor
+        self.motor_rotor = Motor(self.brick, PORT_A, power=self.state.target_power, speedreg=False, smoothstart=True, brake=False)
+        self.motor_rotor.reset_position()
+        self.motor_armed = False
+
+        # Light sensor connected to sensor port 1, LED active
+        self.light = Light(self.brick, PORT_1, illuminated=True)
+
+        # Session log - written from a background thread, never blocks the control loop
+        self.logger = FlightLogger(level=log_level, schema=LOG_SCHEMA)
+        # Timeline trace for Perfetto, only when HELI_TRACE=<file> is set (chrome_trace.py)
+        self.trace = open_trace()
+        self.profiler = LatencyProfiler(LATENCY_STAGES, trace=self.trace)
+
+        # Feed-forward pitch from the lift calibration (v1_helicopter.py), if it has been run
+        feedforward = load_feedforward()
+        if feedforward is not None:
+            self.state.target_pitch = round(feedforward(self.state.target_light_sensor_reading))
+            print(f"Lift feed-forward on, starting from pitch {self.state.target_pitch}")
+
+        # Trim pitches learned in past flights beat the calibration where there are any
+        self.trim_cache = TrimCache()
+        trim = self.trim_cache.trim_for(self.state.target_light_sensor_reading)
+        if trim is not None:
+            self.state.target_pitch = round(trim)
+            print(f"Warm start from learned trim, pitch {self.state.target_pitch}")
+
+        # Hover control law (shared with the benchmark and replay tools)
+        self.controller = HoverController(kp=kp, ki=ki, kd=kd, smoothing=SMOOTHING_FACTOR,
+                                          initial_pitch=self.state.target_pitch, feedforward=feedforward)
+        self.autotuner = None  # relay experiment in progress, see autotune()
+        self.pending_gains = None  # gains to hand to the controller on the next tick
+        self.pending_pitch = None  # manual pitch to hand to the controller on the next tick
+
+        # Data storage - one preallocated buffer, all channels share the write cursor
+        self.telemetry = TelemetryRingBuffer(TELEMETRY_CHANNELS, capacity=TELEMETRY_CAPACITY)
+
+        # Flight recorder - every channel of every tick, streamed to a new file for each run
+        self.recorder = FlightRecorder(TELEMETRY_CHANNELS, metadata={
+            'script': os.path.basename(script or __file__),
+            'start_time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'loop_rate_hz': loop_rate_hz,
+            'controller': self.controller.params(),
+            'calibration': load_calibration(),
+        })
+
+        self.scheduler = None  # created by the control thread
+        self.running = False
+        self.data_thread = None
+
+    def start(self):
+        """Spin the rotor up, then start the sensor, actuator and control threads."""
+        time.sleep(SPIN_UP_TIME)
+
+        self.motor_rotor.run()
+        self.motor_armed = True
+
+        # Set up pitch motor
+        self.motor_pitch = Motor(self.brick, PORT_B, power=35, speedreg=True, smoothstart=True, brake=True)
+        self.motor_pitch.reset_position()
+        # Only the actuator thread talks to the pitch motor; everything else posts to it
+        self.pitch_actuator = ActuatorArbiter(self.motor_pitch, name='pitch-actuator', profiler=self.profiler)
+        self.pitch_actuator.submit(-self.state.target_pitch, MANUAL)
+
+        # Sensor acquisition thread - polls the light sensor and rotor encoder between control ticks
+        self.sensors = SensorAcquisition(self.light, self.motor_rotor,
+                                         on_error=lambda e: self.logger.warning('sensor_read_error', e),
+                                         profiler=self.profiler)
+        self.stale_ticks = 0
+
+        # Start Data Collection Thread
+        self.running = True
+        self.start_time = time.perf_counter()
+        self.data_thread = threading.Thread(target=self.collect_data, name='control')
+        self.data_thread.start()
+
+    def collect_data(self):
+        """The control loop - runs on its own thread, once every 1/loop_rate_hz seconds."""
+        t_start = self.start_time
+        self.scheduler = FixedRateScheduler(self.loop_rate_hz, policy=LOOP_OVERRUN_POLICY)
+        state = self.state
+        trim_cache = self.trim_cache
+        last_target = state.target_light_sensor_reading
+        sensors = self.sensors
+        sensors.wait_ready(timeout=1.0)
+        last_seq = None
+        relay = None  # the relay experiment that drove the pitch on an earlier tick
+        profiler = self.profiler
+        trace = self.trace
+        while self.running and (time.perf_counter() - t_start) < self.duration:
+            tick_start = time.perf_counter_ns()
+            # Freshest oversampled reading from the acquisition thread, timed when it was taken
+            snapshot = sensors.latest
+            if snapshot is None or snapshot.seq == last_seq:
+                # Nothing new since the last tick - hold the pitch rather than reuse a reading
+                self.stale_ticks += 1
+                self.scheduler.wait()
+                continue
+            last_seq = snapshot.seq
+            current_time = snapshot.time - t_start
+            position = snapshot.position
+
+            telemetry = self.telemetry
+            n_samples = len(telemetry)
+
+            # Calculate motor speed (difference over time)
+            if n_samples > 0:
+                d_position = position - telemetry.latest('position')
+                d_time = current_time - telemetry.latest('time')
+                speed = d_position / d_time if d_time > 0 else 0
+            else:
+                speed = 0
+
+            # Apply smoothing (one-sided moving average)
+            if n_samples > 0:
+                smoothed_speed = (1 - SMOOTHING_FACTOR) * telemetry.latest('speed') + SMOOTHING_FACTOR * speed
+            else:
+                smoothed_speed = speed
+
+            current_light_reading = snapshot.light
+            controller = self.controller
+            pitch_event = 0
+            event_pitch = 0.0
+            pending_pitch = self.pending_pitch
+            if pending_pitch is not None:
+                # Manual pitch from the GUI or a command - the PID carries on from it
+                self.pending_pitch = None
+                controller.pitch = pending_pitch
+                pitch_event |= PITCH_TRACK
+                event_pitch = pending_pitch
+            if self.pending_gains is not None:
+                controller.pid.set_gains(**self.pending_gains)
+                self.pending_gains = None
+                self.logger.info('autotune', 'applied', controller.params())
+
+            autotuner = self.autotuner
+            lap = time.perf_counter_ns()
+            relay_ticked = autotuner is not None and autotuner.active
+            if relay_ticked:
+                # Relay experiment: the relay drives the pitch instead of the PID
+                relay = autotuner
+                pitch_event |= PITCH_RELAY
+                state.target_pitch = autotuner.update(current_time, current_light_reading)
+            if relay is not None and not relay.active:
+                # The relay is over - finished, failed, or aborted from the GUI or a command
+                # since the last tick. The PID picks up from the trim the relay found, with
+                # fresh timing and state rather than what it had before the experiment
+                controller.reset(relay.pitch)
+                pitch_event |= PITCH_RESET
+                event_pitch = relay.pitch
+                self.logger.warning('autotune', relay.status, relay.message)
+                relay = None
+            if relay_ticked:
+                light_reading = current_light_reading
+            else:
+                # Hover control law: Kalman height/speed estimate and the PID update
+                target = state.target_light_sensor_reading
+                controller.estimate(current_time, current_light_reading)
+                lap = profiler.lap('estimate', lap)
+                state.target_pitch = controller.control(current_time, target)
+                light_reading = controller.light_reading
+                if target != last_target:
+                    # Setpoint changed - jump to the trim learned for the new height, if known
+                    trim = trim_cache.trim_for(target)
+                    if trim is not None:
+                        controller.pitch = trim
+                        state.target_pitch = controller.pitch
+                        pitch_event |= PITCH_TRIM
+                    last_target = target
+                if trim_cache.observe(current_time, target, light_reading, state.target_pitch):
+                    self.logger.info('trim', target, trim_cache.trim_for(target))
+            lap = profiler.lap('control', lap)
+            self.logger.debug('pid_terms', controller.vertical_speed, controller.p_term, controller.i_term,
+                              controller.d_term, controller.ff_term)
+            self.logger.info('control', state.target_pitch, state.target_light_sensor_reading, light_reading)
+            self.pitch_actuator.submit(-state.target_pitch)
+
+            row = (current_time, position, smoothed_speed, current_light_reading, light_reading,
+                   controller.vertical_speed, state.target_light_sensor_reading, state.target_pitch,
+                   pitch_event, event_pitch)
+            telemetry.append(*row)
+            self.recorder.record(*row)
+
+            state.time = current_time
+            state.light_reading = light_reading
+            state.vertical_speed = controller.vertical_speed
+            if trace:
+                trace.counter('loop_period_ms', self.scheduler.last_period * 1000)
+                trace.counter('target_pitch', state.target_pitch)
+                trace.counter('light_reading', current_light_reading)
+            profiler.lap('log', lap)
+            profiler.lap('tick', tick_start)
+
+            self.scheduler.wait()  # sleep until the next tick deadline, not a fixed 50ms after the work
+
+        self.stop()
+
+    def set_target(self, light_reading):
+        """New hover height setpoint (light sensor reading - lower is higher)."""
+        if not math.isfinite(light_reading):
+            raise ValueError(f"target must be a finite light reading, got {light_reading}")
+        self.state.target_light_sensor_reading = light_reading
+        print(f"Target hover height set to {light_reading} (light sensor reading)")
+
+    def nudge_target(self, steps):
+        """Move the setpoint up (positive steps) or down by TARGET_STEP per step."""
+        self.set_target(self.state.target_light_sensor_reading - steps * TARGET_STEP)
+
+    def set_pitch(self, pitch):
+        """Manual pitch (motor degrees); the controller carries on from it."""
+        if not math.isfinite(pitch):
+            raise ValueError(f"pitch must be finite, got {pitch}")
+        self.state.target_pitch = min(max(pitch, 0), PITCH_LIMIT)
+        self.pending_pitch = self.state.target_pitch  # the control thread owns the controller
+        self.pitch_actuator.submit(-self.state.target_pitch, MANUAL)
+        print(f"Target pitch set to {self.state.target_pitch}")
+
+    def nudge_pitch(self, steps):
+        self.set_pitch(self.state.target_pitch + steps * PITCH_STEP)
+
+    def set_log_level(self, level):
+        """level is a flight_logger level or its name (e.g. 'DEBUG')."""
+        self.logger.set_level(LEVELS[level.upper()] if isinstance(level, str) else level)
+
+    def cycle_log_level(self):
+        next_index = (LOG_LEVEL_CYCLE.index(self.logger.level) + 1) % len(LOG_LEVEL_CYCLE) \
+            if self.logger.level in LOG_LEVEL_CYCLE else 0
+        self.logger.set_level(LOG_LEVEL_CYCLE[next_index])
+        return self.logger.level
+
+    def autotune(self, source='the GUI'):
+        # Start a relay experiment around the current target, abort it, or apply its gains
+        autotuner = self.autotuner
+        if autotuner is not None and autotuner.active:
+            autotuner.abort(f'aborted from {source}')
+        elif autotuner is not None and autotuner.status == DONE:
+            self.pending_gains = autotuner.gains
+            self.autotuner = None
+            print(f"Autotuned gains applied: {autotuner.message}")
+        else:
+            pid = self.controller.pid
+            self.autotuner = RelayAutotuner(self.state.target_light_sensor_reading, self.controller.pitch,
+                                            pitch_min=pid.output_min, pitch_max=pid.output_max)
+            print(f"Relay autotune started around {self.state.target_light_sensor_reading} (light sensor reading)")
+
+    def status_text(self):
+        """One-line summary of the flight for a terminal."""
+        state = self.state.snapshot()
+        light = '-' if state.light_reading is None else f'{state.light_reading:.1f}'
+        text = (f"t={state.time:5.1f}s target={state.target_light_sensor_reading} light={light} "
+                f"pitch={state.target_pitch:.0f} vs={state.vertical_speed:.1f}")
+        if self.scheduler is not None:
+            text += f" | {self.scheduler.stats_text()}"
+        autotuner = self.autotuner
+        if autotuner is not None:
+            text += f" | autotune {autotuner.status}"
+        return text
+
+    def stop(self):
+        if self.motor_armed:
+            self.motor_armed = False
+            self.state.target_pitch = 0
+            # Latches in the actuator thread: the rotor idles and later pitch commands are ignored
+            self.pitch_actuator.estop(-self.state.target_pitch, action=self.motor_rotor.idle)
+            print("Motor stopped.")
+        self.running = False
+
+    def close(self):
+        """Stop the flight, wait for the threads and write the logs and flight data."""
+        self.stop()
+        # Run summaries are printed, and logged at INFO so the logger's console echo doesn't repeat them
+        if self.data_thread is not None:
+            self.data_thread.join()
+            self.pitch_actuator.close()
+            self.sensors.close()
+            print(f"Sensor acquisition: {self.sensors.rate:.0f} samples/s, {self.sensors.errors} read errors, "
+                  f"{self.stale_ticks} control ticks without a new reading")
+            self.logger.info('sensor_stats', round(self.sensors.rate), self.sensors.errors, self.stale_ticks)
+        if self.scheduler is not None:
+            print(f"Control loop stats: {self.scheduler.stats()}")
+            print(f"Pitch actuator stats: {self.pitch_actuator.stats()}")
+            self.logger.info('loop_stats', self.scheduler.stats())
+            self.logger.info('actuator_stats', self.pitch_actuator.stats())
+        print(f"Latency p50/p99/max (ms): {self.profiler.stats_text()}")
+        for stage, s in self.profiler.stats().items():
+            self.logger.info('latency', stage, s['count'], s['p50_ms'], s['p99_ms'], s['max_ms'])
+        self.logger.close()
+        self.trace.close()
+        print(f"Session log written to {self.logger.path}")
+        if len(self.trim_cache):
+            self.trim_cache.save()
+            print(f"Learned trims saved to {self.trim_cache.path}")
+        self.export_data()
+
+    def export_data(self):
+        self.recorder.close()
+        if self.recorder.dropped_chunks:
+            print(f"Warning: flight recorder dropped {self.recorder.dropped_chunks} chunks")
+        csv_path = export_csv(self.recorder.path, os.path.splitext(self.recorder.path)[0] + '.csv')
+        print(f'Flight log written to {self.recorder.path}, data exported to {csv_path}')
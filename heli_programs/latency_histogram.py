@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import time
+
+
+# Per-stage latency histograms for the hover control loop.
+# Each stage of a tick (sensor reads, estimation, control law, actuation,
+# logging) is timed with time.perf_counter_ns() and counted in a fixed-bucket
+# log-linear histogram, like HdrHistogram: every power of two is split into
+# 2**SUB_BUCKET_BITS equal buckets, so a recorded value is off by at most
+# 1 / 2**SUB_BUCKET_BITS (about 3%) whatever its size. Recording is an
+# integer bit_length, a shift and a list increment - no allocation, no lock,
+# no sorting - so it can stay switched on in flight. Percentiles are only
+# worked out when somebody asks (the KPI row, the session log).
+#
+#     profiler = LatencyProfiler(['light_read', 'control'])
+#     t0 = time.perf_counter_ns()
+#     ...
+#     t0 = profiler.lap('light_read', t0)   # records now - t0, returns now
+#
+# Each histogram should have a single writing thread; readers may see a count
+# or two in flight, which doesn't matter for a percentile. Given a trace
+# (chrome_trace.py), every timed stage is also recorded there as a span.
+
+SUB_BUCKET_BITS = 4   # 16 buckets per power of two
+MAX_BITS = 40         # values up to 2**40 ns (about 18 minutes)
+
+
+class LatencyHistogram:
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS, max_bits=MAX_BITS):
+        if not 0 < sub_bucket_bits < max_bits:
+            raise ValueError(f"sub_bucket_bits must be between 1 and {max_bits - 1}, got {sub_bucket_bits}")
+        self.sub_bucket_bits = sub_bucket_bits
+        self.max_value = (1 << max_bits) - 1
+        self.counts = [0] * (self._index(self.max_value) + 1)
+        self.reset()
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value):
+        # Values below 2**(bits + 1) get a bucket each; above that, keep the
+        # top bits + 1 significant bits and count the octave in the index
+        shift = value.bit_length() - self.sub_bucket_bits - 1
+        if shift < 0:
+            shift = 0
+        return (shift << self.sub_bucket_bits) + (value >> shift)
+
+    def _bucket_range(self, index):
+        """(lowest, highest) value that lands in bucket index."""
+        shift = max((index >> self.sub_bucket_bits) - 1, 0)
+        lowest = (index - (shift << self.sub_bucket_bits)) << shift
+        return lowest, lowest + (1 << shift) - 1
+
+    def record(self, value):
+        """Count one latency in ns. Negative values count as 0, huge ones as max_value."""
+        if value < 0:
+            value = 0
+        elif value > self.max_value:
+            value = self.max_value
+        shift = value.bit_length() - self.sub_bucket_bits - 1
+        if shift < 0:
+            shift = 0
+        self.counts[(shift << self.sub_bucket_bits) + (value >> shift)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Value (ns) at or below which q percent of the recorded latencies fall."""
+        if not 0 <= q <= 100:
+            raise ValueError(f"q must be between 0 and 100, got {q}")
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * q // 100))  # ceil, at least the first value
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                # Middle of the bucket, but never past the largest value seen
+                lowest, highest = self._bucket_range(index)
+                return min((lowest + highest) // 2, self.max)
+        return self.max
+
+    def merge(self, other):
+        if other.sub_bucket_bits != self.sub_bucket_bits or len(other.counts) != len(self.counts):
+            raise ValueError("Can only merge histograms with the same bucket layout")
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+
+class LatencyProfiler:
+    def __init__(self, stages, trace=None):
+        """stages: names in the order they should be reported."""
+        self.stages = list(stages)
+        self.histograms = {name: LatencyHistogram() for name in self.stages}
+        self.trace = trace or None
+
+    def __getitem__(self, name):
+        return self.histograms[name]
+
+    def record(self, name, ns):
+        self.histograms[name].record(ns)
+
+    def span(self, name, start_ns, end_ns):
+        """Record a stage that ran from start_ns to end_ns (perf_counter_ns times)."""
+        self.histograms[name].record(end_ns - start_ns)
+        if self.trace is not None:
+            self.trace.span(name, start_ns, end_ns)
+
+    def lap(self, name, start_ns):
+        """Record the time since start_ns against a stage and return now, for the next stage."""
+        now = time.perf_counter_ns()
+        self.span(name, start_ns, now)
+        return now
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def stats(self):
+        """{stage: {'count', 'p50_ms', 'p99_ms', 'max_ms'}} for the stages that have samples."""
+        result = {}
+        for name in self.stages:
+            h = self.histograms[name]
+            if h.count:
+                result[name] = {'count': h.count, 'p50_ms': h.percentile(50) / 1e6,
+                                'p99_ms': h.percentile(99) / 1e6, 'max_ms': h.max / 1e6}
+        return result
+
+    def stats_text(self):
+        """Short p50/p99/max summary (ms) per stage for the KPI row."""
+        return '  '.join(f"{name} {s['p50_ms']:.2f}/{s['p99_ms']:.2f}/{s['max_ms']:.1f}"
+                         for name, s in self.stats().items())
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import os
+
+
+# Chooses the brick backend for the helicopter scripts. Use
+#     from lego_backend import *
+# instead of importing cued_ia_lego directly. With HELI_SIM unset the real
+# library is used. HELI_SIM=realtime runs the sim_lego physics model in real
+# time, HELI_SIM=virtual runs it on a virtual clock as fast as the CPU allows.
+# HELI_SIM_SEED, HELI_SIM_LATENCY (seconds per brick call) and HELI_SIM_NOISE
+# (light reading noise) tune the simulated rig.
+
+SIM_MODE = os.environ.get('HELI_SIM', '').strip().lower()
+
+if SIM_MODE:
+    if SIM_MODE not in ('realtime', 'virtual'):
+        raise ValueError(f"HELI_SIM must be 'realtime' or 'virtual', got {SIM_MODE!r}")
+    import sim_lego
+    from sim_lego import *
+
+    _params = {}
+    if 'HELI_SIM_SEED' in os.environ:
+        _params['seed'] = int(os.environ['HELI_SIM_SEED'])
+    if 'HELI_SIM_LATENCY' in os.environ:
+        _params['link_latency'] = float(os.environ['HELI_SIM_LATENCY'])
+    if 'HELI_SIM_NOISE' in os.environ:
+        _params['light_noise'] = float(os.environ['HELI_SIM_NOISE'])
+    _rig = sim_lego.configure(realtime=(SIM_MODE == 'realtime'), **_params)
+    if SIM_MODE == 'virtual':
+        sim_lego.install_virtual_clock(_rig.clock)
+    print(f"Using simulated NXT brick ({SIM_MODE} clock)")
+else:
+    from cued_ia_lego import *
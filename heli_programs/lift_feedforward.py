@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import csv
+import os.path
+import pickle
+
+import numpy as np
+
+
+# Feed-forward pitch for the hover loop, from the calibration data.
+#   - calibrate_lift.py fits force_conversion: light reading -> grams on the
+#     see-saw, so holding the rotor at a reading needs that much lift
+#   - v1_helicopter.py measures lift vs. blade pitch angle and saves it to
+#     lift_vs_pitch.csv
+#   - angle_conversion (calibrate_pitch.py) maps blade angle to pitch motor
+#     position
+# Chaining the three gives the pitch that should hold a target height on its
+# own. The PID adds its output on top, so after a setpoint change the pitch
+# jumps straight to the new trim and feedback only corrects what the
+# calibration got wrong.
+#
+# Pitches are in the hover loop's units: motor degrees with more pitch
+# positive, i.e. the negative of the pitch motor position.
+
+LIFT_CURVE_FILE = 'lift_vs_pitch.csv'
+GRAMS_PER_NEWTON = 1 / 0.00980665
+
+
+class LiftFeedForward:
+    def __init__(self, pitch_angles, lifts, force_conversion, pitch_to_rotation):
+        """pitch_angles in degrees, lifts in grams, one entry per v1_helicopter test."""
+        if len(pitch_angles) != len(lifts) or len(lifts) < 2:
+            raise ValueError("Need at least two matching pitch and lift measurements")
+        order = np.argsort(pitch_angles)
+        angles = np.asarray(pitch_angles, dtype=float)[order]
+        lifts = np.asarray(lifts, dtype=float)[order]
+        # Interpolation needs lift rising with pitch; past the stall keep the best pitch so far
+        keep = lifts >= np.maximum.accumulate(lifts)
+        self.angles = angles[keep]
+        self.lifts = lifts[keep]
+        self.force_conversion = np.asarray(force_conversion, dtype=float)
+        self.pitch_to_rotation = np.asarray(pitch_to_rotation, dtype=float)
+        self._last = (None, 0.0)
+
+    def required_lift(self, light_reading):
+        """Grams of lift that hold the see-saw at a light reading."""
+        return float(np.polyval(self.force_conversion, light_reading))
+
+    def pitch_angle(self, light_reading):
+        """Blade angle (degrees) whose lift holds the see-saw at a light reading."""
+        return float(np.interp(self.required_lift(light_reading), self.lifts, self.angles))
+
+    def __call__(self, light_reading):
+        """Feed-forward pitch (hover loop motor degrees) for a target light reading."""
+        # The target only changes on button presses, so only work it out when it does
+        last_reading, pitch = self._last
+        if light_reading != last_reading:
+            pitch = -float(np.polyval(self.pitch_to_rotation, self.pitch_angle(light_reading)))
+            self._last = (light_reading, pitch)
+        return pitch
+
+
+def read_lift_curve(path=LIFT_CURVE_FILE):
+    """(pitch angles in degrees, lifts in grams) from v1_helicopter.py's CSV."""
+    angles, lifts = [], []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            angles.append(float(row['Pitch (deg)']))
+            lifts.append(float(row['Lift (N)']) * GRAMS_PER_NEWTON)
+    return angles, lifts
+
+
+def load_feedforward(path=LIFT_CURVE_FILE):
+    """LiftFeedForward from the calibration files, or None if any is missing."""
+    if not all(os.path.isfile(f) for f in (path, 'force_conversion.pickle', 'angle_conversion.pickle')):
+        return None
+    with open('force_conversion.pickle', 'rb') as f:
+        force_conversion = pickle.load(f)
+    with open('angle_conversion.pickle', 'rb') as f:
+        pitch_to_rotation = pickle.load(f)[0]
+    return LiftFeedForward(*read_lift_curve(path), force_conversion, pitch_to_rotation)
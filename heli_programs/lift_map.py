@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import os.path
+import pickle
+import time
+
+import numpy as np
+
+from acquisition import Sampler
+
+
+# Adaptive experiment planner for the lift and rotor speed map over fan power
+# and blade pitch.
+# Instead of a full power x pitch grid, it fits a Gaussian-process surface to
+# the points measured so far and picks the next test point where the surface
+# is least certain, favouring where it is steep. It stops once the predicted
+# standard deviation is below the target everywhere on the candidate grid,
+# after scaling it by how far off the model's own leave-one-out predictions
+# are compared with the spread it claimed for them - a surface that is
+# smoother than the rig can't talk itself into stopping early.
+# The GP's noise term is measured: the scatter of the light readings at each
+# point, carried through the force calibration, or the spread of repeated
+# measurements of the same point if that is larger.
+# Every measurement is appended to a local results store (CSV) as soon as it
+# is taken, so an interrupted run resumes where it stopped, and later runs
+# start from what is already known.
+#
+#     python lift_map.py                      # run on the rig (or HELI_SIM=virtual)
+#     python lift_map.py --plan-only          # just report the model and the next point
+#
+# Lift comes from the light reading through force_conversion.pickle
+# (calibrate_lift.py), and blade angles go to pitch motor positions through
+# angle_conversion.pickle (calibrate_pitch.py).
+
+RESULTS_FILE = 'lift_map_results.csv'
+SURFACE_FILE = 'lift_map_surface.csv'
+POWERS = list(range(40, 101, 5))   # candidate fan powers
+ANGLES = list(range(0, 81, 5))     # candidate blade angles (degrees)
+TARGET_LIFT_ERROR = 0.003          # N - predicted standard deviation to stop at
+TARGET_SPEED_ERROR = 15.0          # deg/s
+GRADIENT_WEIGHT = 0.5              # how strongly steep regions attract points
+MAX_POINTS = 40
+LENGTH_SCALES = (0.15, 0.25, 0.35, 0.5, 0.75)  # in units of the candidate range
+NOISE_FRACTION = 0.01              # nugget when nothing measures the noise, as a fraction of the data variance
+JITTER = 1e-6                      # added to the nugget (fraction of the data variance) for stability
+SAMPLE_RATE_HZ = 50
+STEADY_WINDOW = 1.0                # seconds per averaging window
+STEADY_LIGHT_TOL = 1.0             # light units between consecutive window means
+MAX_SETTLE_TIME = 10.0             # seconds before a point is taken as it is
+G = 0.00980665                     # N per gram
+
+FIELDS = ['power', 'angle', 'pitch_position', 'light', 'light_std', 'samples',
+          'lift', 'speed', 'settle_time', 'timestamp']
+
+
+class GaussianProcessSurface:
+    """GP regression with a squared-exponential kernel on inputs scaled to [0, 1]."""
+
+    def __init__(self, length_scales=LENGTH_SCALES, noise_fraction=NOISE_FRACTION):
+        self.length_scales = length_scales
+        self.noise_fraction = noise_fraction
+        self.length_scale = length_scales[0]
+
+    def _kernel(self, a, b):
+        d2 = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)
+        return np.exp(-0.5 * d2 / self.length_scale ** 2)
+
+    def fit(self, X, y, noise_var=None):
+        """Fit to points X (n, 2) and values y, picking the length scale by marginal likelihood.
+
+        noise_var is the measurement noise variance of y, per point or for all of
+        them, in the units of y squared; without it the nugget is noise_fraction
+        of the variance of y.
+        """
+        self.X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean = y.mean()
+        self.y_scale = y.std() or 1.0
+        z = (y - self.y_mean) / self.y_scale
+        if noise_var is None:
+            nugget = np.full(len(z), self.noise_fraction)
+        else:
+            nugget = np.broadcast_to(np.asarray(noise_var, dtype=float) / self.y_scale ** 2, z.shape)
+        nugget = nugget + JITTER
+        best = None
+        for length_scale in self.length_scales:
+            self.length_scale = length_scale
+            K = self._kernel(self.X, self.X) + np.diag(nugget)
+            try:
+                L = np.linalg.cholesky(K)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(L.T, np.linalg.solve(L, z))
+            log_likelihood = -0.5 * z @ alpha - np.log(np.diag(L)).sum()
+            if best is None or log_likelihood > best[0]:
+                best = (log_likelihood, length_scale, L, alpha)
+        _, self.length_scale, self._L, self._alpha = best
+        return self
+
+    def predict(self, Xs):
+        """Mean and standard deviation of the underlying surface at points Xs, in the units of y."""
+        Xs = np.asarray(Xs, dtype=float)
+        k = self._kernel(Xs, self.X)
+        mean = k @ self._alpha
+        v = np.linalg.solve(self._L, k.T)
+        var = np.maximum(1.0 - (v * v).sum(axis=0), 0.0)
+        return self.y_mean + self.y_scale * mean, self.y_scale * np.sqrt(var)
+
+    def gradient_norm(self, Xs):
+        """Magnitude of the gradient of the mean at points Xs (units of y per unit input)."""
+        Xs = np.asarray(Xs, dtype=float)
+        k = self._kernel(Xs, self.X)
+        diff = Xs[:, None, :] - self.X[None, :, :]
+        grad = -(k[:, :, None] * diff * self._alpha[None, :, None]).sum(axis=1) / self.length_scale ** 2
+        return self.y_scale * np.sqrt((grad ** 2).sum(axis=1))
+
+    def _loo(self):
+        # Leave-one-out residuals and their predicted variances, in standardised units
+        K_inv_diag = np.diag(np.linalg.inv(self._L @ self._L.T))
+        return self._alpha / K_inv_diag, 1.0 / K_inv_diag
+
+    def loo_rmse(self):
+        """Leave-one-out prediction error, in the units of y."""
+        residuals, _ = self._loo()
+        return float(self.y_scale * np.sqrt(np.mean(residuals ** 2)))
+
+    def calibration(self):
+        """How much the predicted standard deviations understate the leave-one-out errors (at least 1)."""
+        residuals, variances = self._loo()
+        return max(1.0, float(np.sqrt(np.mean(residuals ** 2 / variances))))
+
+
+def scale(powers, angles):
+    """Map (power, angle) to the unit square the surfaces are fitted on."""
+    powers = np.asarray(powers, dtype=float)
+    angles = np.asarray(angles, dtype=float)
+    return np.column_stack(((powers - min(POWERS)) / (max(POWERS) - min(POWERS)),
+                            (angles - min(ANGLES)) / (max(ANGLES) - min(ANGLES))))
+
+
+def candidate_grid():
+    return [(p, a) for p in POWERS for a in ANGLES]
+
+
+def initial_design():
+    """Corners and centre of the envelope, measured before there is a model to plan with."""
+    mid_power = POWERS[len(POWERS) // 2]
+    mid_angle = ANGLES[len(ANGLES) // 2]
+    return [(min(POWERS), min(ANGLES)), (max(POWERS), min(ANGLES)), (mid_power, mid_angle),
+            (min(POWERS), max(ANGLES)), (max(POWERS), max(ANGLES))]
+
+
+def load_results(path=RESULTS_FILE):
+    if not os.path.isfile(path):
+        return []
+    with open(path, newline='') as f:
+        return [{k: (v if k == 'timestamp' else float(v)) for k, v in row.items()} for row in csv.DictReader(f)]
+
+
+def append_result(row, path=RESULTS_FILE):
+    new_file = not os.path.isfile(path)
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if new_file:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def repeat_variance(results, key):
+    """Pooled variance of key over points measured more than once, or None if none were."""
+    groups = {}
+    for r in results:
+        groups.setdefault((r['power'], r['angle']), []).append(r[key])
+    repeats = [values for values in groups.values() if len(values) > 1]
+    if not repeats:
+        return None
+    squares = sum(float(np.sum((np.array(v) - np.mean(v)) ** 2)) for v in repeats)
+    return squares / sum(len(v) - 1 for v in repeats)
+
+
+def lift_noise(results):
+    """Variance (N^2) of each lift measurement, from the scatter of its light readings."""
+    light = np.array([r['light'] for r in results])
+    lift = np.array([r['lift'] for r in results])
+    if len(set(light)) < 3:
+        return repeat_variance(results, 'lift')
+    # Lift is a quadratic in the light reading (force_conversion), so the rows give its slope back exactly
+    slope = np.polyval(np.polyder(np.polyfit(light, lift, 2)), light)
+    variance = np.array([(s * r['light_std']) ** 2 / max(r['samples'], 1) for s, r in zip(slope, results)])
+    repeats = repeat_variance(results, 'lift')
+    return variance if repeats is None else np.maximum(variance, repeats)
+
+
+def fit_surfaces(results):
+    X = scale([r['power'] for r in results], [r['angle'] for r in results])
+    lift = GaussianProcessSurface().fit(X, [r['lift'] for r in results], lift_noise(results))
+    speed = GaussianProcessSurface().fit(X, [r['speed'] for r in results], repeat_variance(results, 'speed'))
+    return lift, speed
+
+
+def plan(results, target_lift_error=TARGET_LIFT_ERROR, target_speed_error=TARGET_SPEED_ERROR,
+         gradient_weight=GRADIENT_WEIGHT):
+    """Return (next (power, angle) or None when done, worst predicted error / target).
+
+    The predicted errors are scaled by each surface's leave-one-out calibration.
+    """
+    measured = {(r['power'], r['angle']) for r in results}
+    for point in initial_design():
+        if point not in measured:
+            return point, float('inf')
+
+    lift, speed = fit_surfaces(results)
+    candidates = candidate_grid()
+    X = scale(*zip(*candidates))
+    _, lift_std = lift.predict(X)
+    _, speed_std = speed.predict(X)
+    lift_std = lift_std * lift.calibration()
+    speed_std = speed_std * speed.calibration()
+    uncertainty = np.maximum(lift_std / target_lift_error, speed_std / target_speed_error)
+    worst = float(uncertainty.max())
+    if worst < 1.0:
+        return None, worst
+    gradient = lift.gradient_norm(X)
+    score = uncertainty * (1 + gradient_weight * gradient / (gradient.max() or 1.0))
+    for i in np.argsort(-score):
+        if candidates[i] not in measured:
+            return candidates[i], worst
+    return None, worst
+
+
+def save_surface(results, path=SURFACE_FILE):
+    lift, speed = fit_surfaces(results)
+    candidates = candidate_grid()
+    X = scale(*zip(*candidates))
+    lift_mean, lift_std = lift.predict(X)
+    speed_mean, speed_std = speed.predict(X)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Power (%)', 'Pitch (deg)', 'Lift (N)', 'Lift std (N)',
+                         'Motor speed (deg/sec)', 'Motor speed std (deg/sec)'])
+        for (p, a), lm, ls, sm, ss in zip(candidates, lift_mean, lift_std, speed_mean, speed_std):
+            writer.writerow([p, a, lm, ls, sm, ss])
+    return lift, speed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Map lift and rotor speed over fan power and blade pitch')
+    parser.add_argument('--results', default=RESULTS_FILE, help='results store (CSV)')
+    parser.add_argument('--max-points', type=int, default=MAX_POINTS)
+    parser.add_argument('--plan-only', action='store_true', help="don't run the rig, just report the plan")
+    args = parser.parse_args()
+
+    results = load_results(args.results)
+    print(f'{len(results)} points in {args.results}')
+    if args.plan_only:
+        point, worst = plan(results)
+        print(f'Worst predicted error {worst:.2f}x target, next point: {point}')
+        return
+
+    if not (os.path.isfile('angle_conversion.pickle') and os.path.isfile('force_conversion.pickle')):
+        print('Please run calibrate_pitch.py and calibrate_lift.py first')
+        return
+    with open('angle_conversion.pickle', 'rb') as f:
+        pitch_to_rotation = pickle.load(f)[0]
+    with open('force_conversion.pickle', 'rb') as f:
+        force_conversion = pickle.load(f)
+
+    from lego_backend import NXTBrick, Motor, Light, PORT_A, PORT_B, PORT_1
+    try:
+        brick = NXTBrick()
+    except Exception:
+        exit()
+    light = Light(brick, PORT_1, illuminated=True)
+    motor_fan = Motor(brick, PORT_A, power=100, speedreg=True, smoothstart=True)
+    motor_pitch = Motor(brick, PORT_B, power=30, speedreg=True, smoothstart=True, brake=True)
+    motor_pitch.reset_position()
+
+    def make_sampler():
+        return Sampler({'pitch': motor_pitch.get_position, 'light': light.get_lightness,
+                        'fan': motor_fan.get_position}, rate_hz=SAMPLE_RATE_HZ)
+
+    # The fan keeps running between points - a change of power or pitch only
+    # needs the see-saw to settle, not a full spin-up from rest
+    fan_running = False
+    try:
+        while len(results) < args.max_points:
+            point, worst = plan(results)
+            if point is None:
+                print(f'Model within target everywhere, checked against leave-one-out errors ({worst:.2f}x target)')
+                break
+            power, angle = point
+            print(f'Point {len(results) + 1}: power {power}%, pitch {angle} deg '
+                  f'(worst predicted error {worst:.2f}x target)')
+            motor_pitch.turn_to(round(np.polyval(pitch_to_rotation, angle)))
+            motor_pitch.wait_for()
+            motor_fan.run(power=power)
+            fan_running = True
+
+            # Average consecutive windows until two agree
+            step_start = time.perf_counter()
+            previous = make_sampler().record(STEADY_WINDOW)
+            while True:
+                current = make_sampler().record(STEADY_WINDOW)
+                light1, light2 = previous.stats['light'], current.stats['light']
+                if abs(light2.mean - light1.mean) <= max(2 * np.hypot(light1.stderr, light2.stderr), STEADY_LIGHT_TOL) \
+                        or time.perf_counter() - step_start > MAX_SETTLE_TIME:
+                    break
+                previous = current
+
+            light_stats = current.stats['light']
+            row = {'power': power, 'angle': angle, 'pitch_position': current.stats['pitch'].mean,
+                   'light': light_stats.mean, 'light_std': light_stats.std, 'samples': light_stats.count,
+                   'lift': G * float(np.polyval(force_conversion, light_stats.mean)),
+                   'speed': current.slope('fan'), 'settle_time': time.perf_counter() - step_start,
+                   'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')}
+            append_result(row, args.results)
+            results.append(row)
+            print(f"    lift {row['lift']:.4f} N, speed {row['speed']:.0f} deg/s")
+    finally:
+        if fan_running:
+            motor_fan.idle()
+        motor_pitch.turn_to(0)
+        motor_pitch.wait_for()
+        motor_pitch.idle()
+        light.set_illuminated(False)
+
+    if len(results) >= len(initial_design()):
+        lift, speed = save_surface(results)
+        print(f'{len(results)} points, leave-one-out error: lift {lift.loo_rmse():.4f} N, '
+              f'speed {speed.loo_rmse():.1f} deg/s')
+        _, worst = plan(results)
+        if worst >= 1.0:
+            print(f'Not within target yet: worst checked error {worst:.2f}x target (raise --max-points to carry on)')
+        print(f'Surface written to {SURFACE_FILE} (a full grid would have needed {len(candidate_grid())} tests)')
+
+
+if __name__ == '__main__':
+    main()
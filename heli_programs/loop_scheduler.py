@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import math
+import time
+
+
+# Deadline-based fixed-rate scheduler for the hover control loop.
+# Calling time.sleep(0.05) after the work makes the real period 50 ms plus
+# however long the work took. Here every tick has an absolute deadline
+# (start + n * period), so the loop runs at the requested rate no matter how
+# long the sensor reads and turn_to calls take, as long as they fit.
+
+CATCH_UP = 'catch_up'  # run missed ticks back to back until on schedule again
+SKIP = 'skip'          # drop missed ticks and realign to the deadline grid
+
+
+class FixedRateScheduler:
+    def __init__(self, rate_hz, policy=SKIP, clock=None, sleep=None):
+        if rate_hz <= 0:
+            raise ValueError(f"rate_hz must be positive, got {rate_hz}")
+        if policy not in (CATCH_UP, SKIP):
+            raise ValueError(f"Unknown overrun policy: {policy}")
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.policy = policy
+        # Look the clock up at call time by default so a patched time module
+        # (e.g. the simulator's virtual clock) is picked up
+        self._clock = clock
+        self._sleep = sleep
+        self.reset()
+
+    def _now(self):
+        return self._clock() if self._clock else time.perf_counter()
+
+    def reset(self):
+        self.start = self._now()
+        self.next_deadline = self.start + self.period
+        self.last_tick = self.start
+        self.ticks = 0
+        self.overruns = 0
+        self.missed_ticks = 0
+        # Welford running stats of wake-up jitter (seconds late vs deadline)
+        self._jitter_n = 0
+        self._jitter_mean = 0.0
+        self._jitter_m2 = 0.0
+        self.jitter_max = 0.0
+        self.last_period = self.period
+
+    def wait(self):
+        """Sleep until the next deadline. Returns the number of ticks skipped."""
+        now = self._now()
+        skipped = 0
+        if now > self.next_deadline:
+            # The work overran its slot
+            self.overruns += 1
+            late_ticks = int((now - self.next_deadline) / self.period)
+            if self.policy == SKIP and late_ticks > 0:
+                skipped = late_ticks
+                self.missed_ticks += skipped
+                self.next_deadline += skipped * self.period
+        else:
+            delay = self.next_deadline - now
+            if self._sleep:
+                self._sleep(delay)
+            else:
+                time.sleep(delay)
+            now = self._now()
+
+        jitter = max(0.0, now - self.next_deadline)
+        self._record_jitter(jitter)
+
+        self.last_period = now - self.last_tick
+        self.last_tick = now
+        self.ticks += 1
+        self.next_deadline += self.period
+        return skipped
+
+    def _record_jitter(self, jitter):
+        self._jitter_n += 1
+        d = jitter - self._jitter_mean
+        self._jitter_mean += d / self._jitter_n
+        self._jitter_m2 += d * (jitter - self._jitter_mean)
+        if jitter > self.jitter_max:
+            self.jitter_max = jitter
+
+    @property
+    def jitter_mean(self):
+        return self._jitter_mean
+
+    @property
+    def jitter_std(self):
+        if self._jitter_n < 2:
+            return 0.0
+        return math.sqrt(self._jitter_m2 / (self._jitter_n - 1))
+
+    @property
+    def achieved_rate(self):
+        elapsed = self.last_tick - self.start
+        return self.ticks / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        return {
+            'rate_hz': self.rate_hz,
+            'achieved_hz': self.achieved_rate,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'missed_ticks': self.missed_ticks,
+            'jitter_mean_ms': self.jitter_mean * 1000,
+            'jitter_std_ms': self.jitter_std * 1000,
+            'jitter_max_ms': self.jitter_max * 1000,
+        }
+
+    def stats_text(self):
+        """Short summary for the KPI row."""
+        return (f"{self.achieved_rate:.1f} Hz, jitter {self.jitter_mean * 1000:.1f}"
+                f"/{self.jitter_max * 1000:.1f} ms, overruns {self.overruns}")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+
+# Discrete PID controller for the hover loop (and any other loop that needs one).
+# Every update uses the measured time since the previous update, so the gains
+# are per second and stay valid if the loop rate changes.
+#   - position form: u = P + I + D, with the integral kept as state
+#   - velocity form: u += dP + I*dt + dD, so there is no integral to wind up
+#   - P acts on (setpoint_weight * setpoint - measurement); a weight below 1
+#     softens the kick on setpoint changes, 0 makes them bumpless
+#   - D acts on the measurement only, never on the setpoint
+#   - anti-windup by clamping (stop integrating while saturated) or by
+#     back-calculation (bleed the integral by the saturation excess)
+#   - optional output rate limit (units per second)
+#   - optional feed-forward added to the output before the limits, so the
+#     integral only has to hold what the feed-forward gets wrong
+# direction=-1 is for reverse-acting loops like the hover loop, where a
+# higher light reading (lower rotor) needs more output.
+# update() is O(1) and only touches float attributes.
+
+POSITION = 'position'
+VELOCITY = 'velocity'
+CLAMPING = 'clamping'
+BACK_CALCULATION = 'back_calculation'
+
+
+class PID:
+    def __init__(self, kp, ki=0.0, kd=0.0, form=POSITION, direction=1,
+                 output_min=None, output_max=None, rate_limit=None,
+                 anti_windup=BACK_CALCULATION, tracking_gain=None,
+                 setpoint_weight=1.0, derivative_filter=0.0, output=0.0):
+        if form not in (POSITION, VELOCITY):
+            raise ValueError(f"Unknown PID form: {form}")
+        if anti_windup not in (CLAMPING, BACK_CALCULATION, None):
+            raise ValueError(f"Unknown anti-windup mode: {anti_windup}")
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.form = form
+        self.direction = direction
+        self.output_min = output_min
+        self.output_max = output_max
+        self.rate_limit = rate_limit
+        self.anti_windup = anti_windup
+        # Back-calculation gain (1/s); defaults to ki/kp, i.e. 1/Ti
+        self.tracking_gain = tracking_gain
+        self.setpoint_weight = setpoint_weight
+        self.derivative_filter = derivative_filter  # time constant (s) of the D low-pass
+        self.reset(output)
+
+    def reset(self, output=0.0):
+        self.output = output
+        self.integral = output if self.form == POSITION else 0.0
+        self.p_term = 0.0
+        self.i_term = self.integral
+        self.d_term = 0.0
+        self.ff_term = 0.0
+        self.saturated = False
+        self._t = None
+        self._measurement = None
+        self._rate = 0.0
+        self._p_drive = 0.0
+
+    def track(self, output):
+        """Bumpless transfer: continue from an externally set output (e.g. manual pitch)."""
+        output = self._clamp(output)
+        if self.form == POSITION:
+            self.integral += output - self.output
+        self.output = output
+
+    def set_gains(self, kp=None, ki=None, kd=None):
+        """Change gains without a jump in the output.
+
+        In position form the integral absorbs the step in the P and D terms
+        at the last sample (the integral already has ki folded in). The
+        velocity form only ever adds gain * change, so it needs nothing.
+        """
+        old_p, old_d = self.p_term, self.d_term
+        if kp is not None:
+            self.kp = kp
+        if ki is not None:
+            self.ki = ki
+        if kd is not None:
+            self.kd = kd
+        if self.form == POSITION and self._t is not None:
+            self.p_term = self.kp * self._p_drive
+            self.d_term = -self.kd * self.direction * self._rate
+            self.integral += (old_p - self.p_term) + (old_d - self.d_term)
+            self.i_term = self.integral
+
+    def _clamp(self, value):
+        if self.output_max is not None and value > self.output_max:
+            return self.output_max
+        if self.output_min is not None and value < self.output_min:
+            return self.output_min
+        return value
+
+    def update(self, setpoint, measurement, t, measurement_rate=None, feedforward=0.0):
+        """Return the new output. measurement_rate overrides the built-in dy/dt."""
+        direction = self.direction
+        error = direction * (setpoint - measurement)
+        p_drive = direction * (self.setpoint_weight * setpoint - measurement)
+
+        if self._t is None:
+            # First sample: no dt yet
+            dt = 0.0
+            rate = 0.0 if measurement_rate is None else measurement_rate
+        else:
+            dt = t - self._t
+            if measurement_rate is not None:
+                rate = measurement_rate
+            elif dt > 0:
+                rate = (measurement - self._measurement) / dt
+            else:
+                rate = self._rate
+            if self.derivative_filter > 0 and dt > 0:
+                alpha = dt / (self.derivative_filter + dt)
+                rate = self._rate + alpha * (rate - self._rate)
+
+        previous_output = self.output
+        if self.form == POSITION:
+            self.p_term = self.kp * p_drive
+            self.d_term = -self.kd * direction * rate
+            if self._t is None:
+                # Bumpless start: pick up from the initial output
+                self.integral = previous_output - self.p_term - self.d_term - feedforward
+            elif dt > 0:
+                self.integral += self.ki * error * dt
+            unsaturated = self.p_term + self.integral + self.d_term + feedforward
+        else:
+            if self._t is None:
+                unsaturated = previous_output
+                self.p_term = self.d_term = 0.0
+            else:
+                self.p_term = self.kp * (p_drive - self._p_drive)
+                self.d_term = -self.kd * direction * (rate - self._rate)
+                self.i_term = self.ki * error * dt
+                unsaturated = previous_output + self.p_term + self.i_term + self.d_term \
+                    + feedforward - self.ff_term
+
+        output = self._clamp(unsaturated)
+        if self.rate_limit is not None and dt > 0:
+            max_step = self.rate_limit * dt
+            if output > previous_output + max_step:
+                output = previous_output + max_step
+            elif output < previous_output - max_step:
+                output = previous_output - max_step
+        self.saturated = output != unsaturated
+
+        if self.form == POSITION and self.saturated and dt > 0:
+            if self.anti_windup == BACK_CALCULATION:
+                gain = self.tracking_gain
+                if gain is None:
+                    gain = self.ki / self.kp if self.kp else 1.0 / dt
+                self.integral += min(1.0, gain * dt) * (output - unsaturated)
+            elif self.anti_windup == CLAMPING:
+                # Undo this step's integration if it pushed further into saturation
+                if (unsaturated > output and error * self.ki > 0) or \
+                   (unsaturated < output and error * self.ki < 0):
+                    self.integral -= self.ki * error * dt
+        if self.form == POSITION:
+            self.i_term = self.integral
+
+        self.output = output
+        self.ff_term = feedforward
+        self._t = t
+        self._measurement = measurement
+        self._rate = rate
+        self._p_drive = p_drive
+        return output
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import math
+
+
+# Relay-feedback autotuner for the hover loop (Astrom-Hagglund).
+# Instead of the PID, a relay drives the blade pitch: bias + amplitude while
+# the rotor is below the target height, bias - amplitude while it is above,
+# with a little hysteresis against sensor noise. The loop then settles into
+# a limit cycle at its ultimate period Tu, and with a light reading
+# oscillation of half peak-to-peak a, the ultimate gain is
+#     Ku = 4 * amplitude / (pi * a)
+# (motor degrees of pitch per light unit). Standard rules turn Ku and Tu
+# into PID or PD gains.
+#
+# The bias follows the trim: if the rotor spends longer below the target
+# than above it, the bias was too low, and it is nudged up after each cycle
+# so the oscillation ends up centred on the target.
+#
+# The experiment is bounded: it is abandoned (and the bias pitch handed back)
+# if the reading strays more than max_deviation from the target or it has not
+# finished within max_duration seconds.
+
+RELAY_AMPLITUDE = 40    # motor degrees of pitch either side of the bias
+HYSTERESIS = 4          # light units
+CYCLES = 4              # full oscillations measured, after the first is discarded
+MAX_DURATION = 40       # seconds
+MAX_DEVIATION = 80      # light units from the target
+
+# Ziegler-Nichols style tuning rules: kp = a * Ku, Ti = b * Tu, Td = c * Tu
+RULES = {
+    'zn_pid': (0.6, 0.5, 0.125),
+    'zn_pi': (0.45, 1 / 1.2, 0.0),
+    'zn_pd': (0.8, None, 0.125),
+    'tyreus_luyben': (0.45, 2.2, 1 / 6.3),  # less overshoot, slower integral
+    'no_overshoot': (0.2, 0.5, 1 / 3),
+}
+RULE = 'no_overshoot'  # the Kalman filter and pitch motor add lag, so stay conservative
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def gains_from_ultimate(ku, tu, rule=RULE):
+    """Return {'kp', 'ki', 'kd'} (per second) for an ultimate gain and period."""
+    if rule not in RULES:
+        raise ValueError(f"Unknown tuning rule: {rule}")
+    a, b, c = RULES[rule]
+    kp = a * ku
+    ki = kp / (b * tu) if b else 0.0
+    kd = kp * c * tu
+    return {'kp': kp, 'ki': ki, 'kd': kd}
+
+
+class RelayAutotuner:
+    def __init__(self, target, bias_pitch, amplitude=RELAY_AMPLITUDE, hysteresis=HYSTERESIS,
+                 cycles=CYCLES, max_duration=MAX_DURATION, max_deviation=MAX_DEVIATION,
+                 pitch_min=0, pitch_max=600, rule=RULE):
+        if amplitude <= 0:
+            raise ValueError(f"amplitude must be positive, got {amplitude}")
+        if cycles < 1:
+            raise ValueError(f"cycles must be at least 1, got {cycles}")
+        if rule not in RULES:
+            raise ValueError(f"Unknown tuning rule: {rule}")
+        self.target = target
+        self.bias = bias_pitch
+        self.amplitude = amplitude
+        self.hysteresis = hysteresis
+        self.cycles = cycles
+        self.max_duration = max_duration
+        self.max_deviation = max_deviation
+        self.pitch_min = pitch_min
+        self.pitch_max = pitch_max
+        self.rule = rule
+
+        self.status = RUNNING
+        self.message = ''
+        self.ku = None
+        self.tu = None
+        self.gains = None
+        self._t_start = None
+        self._high = None        # relay state: True while pushing the rotor up
+        self._t_switch = None    # time of the last switch to high
+        self._time_high = 0.0
+        self._periods = []
+        self._amplitudes = []
+        self._min = self._max = None
+        self._last = None        # previous (t, error), to interpolate switch times between ticks
+
+    @property
+    def active(self):
+        return self.status == RUNNING
+
+    @property
+    def pitch(self):
+        if self.status != RUNNING or self._high is None:
+            return self._clamp(self.bias)
+        return self._clamp(self.bias + self.amplitude if self._high else self.bias - self.amplitude)
+
+    def _clamp(self, pitch):
+        return min(self.pitch_max, max(self.pitch_min, pitch))
+
+    def abort(self, message='aborted'):
+        if self.status == RUNNING:
+            self.status = FAILED
+            self.message = message
+
+    def update(self, t, light_reading):
+        """Add a light reading and return the pitch to command."""
+        if self.status != RUNNING:
+            return self.pitch
+        if self._t_start is None:
+            self._t_start = t
+        error = light_reading - self.target  # > 0: rotor below target
+        if abs(error) > self.max_deviation:
+            self.abort(f'reading {light_reading:.0f} more than {self.max_deviation} from target')
+            return self.pitch
+        if t - self._t_start > self.max_duration:
+            self.abort(f'no steady oscillation within {self.max_duration} s')
+            return self.pitch
+
+        if self._high is None:
+            self._high = error > 0
+        if self._min is None:
+            self._min = self._max = light_reading
+        else:
+            self._min = min(self._min, light_reading)
+            self._max = max(self._max, light_reading)
+
+        if not self._high and error > self.hysteresis:
+            self._high = True
+            self._switch_high(self._crossing(t, error, self.hysteresis))
+        elif self._high and error < -self.hysteresis:
+            self._high = False
+            if self._t_switch is not None:
+                self._time_high += self._crossing(t, error, -self.hysteresis) - self._t_switch
+        self._last = (t, error)
+        return self.pitch
+
+    def _crossing(self, t, error, level):
+        # When the error crossed level, between the last tick and this one
+        if self._last is None:
+            return t
+        t0, e0 = self._last
+        if error == e0:
+            return t
+        return t0 + (t - t0) * min(1.0, max(0.0, (level - e0) / (error - e0)))
+
+    def _switch_high(self, t):
+        # A full cycle ends at each switch to high
+        if self._t_switch is not None:
+            period = t - self._t_switch
+            self._periods.append(period)
+            self._amplitudes.append((self._max - self._min) / 2)
+            # Re-centre the bias on the trim: fraction of the cycle spent pushing up
+            duty = self._time_high / period
+            self.bias += self.amplitude * (duty - 0.5)
+            if len(self._periods) > self.cycles:
+                self._finish()
+        self._t_switch = t
+        self._time_high = 0.0
+        self._min = self._max = None
+
+    def _finish(self):
+        # The first cycle is still settling into the limit cycle
+        periods = self._periods[1:]
+        amplitudes = self._amplitudes[1:]
+        self.tu = sum(periods) / len(periods)
+        a = sum(amplitudes) / len(amplitudes)
+        if a <= 0:
+            self.abort('no oscillation in the light reading')
+            return
+        self.ku = 4 * self.amplitude / (math.pi * a)
+        self.gains = gains_from_ultimate(self.ku, self.tu, self.rule)
+        self.status = DONE
+        self.message = (f"Ku={self.ku:.3f} Tu={self.tu:.2f}s -> "
+                        f"kp={self.gains['kp']:.3f} ki={self.gains['ki']:.3f} kd={self.gains['kd']:.3f}")
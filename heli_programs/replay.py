@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import importlib
+import math
+import os
+
+import numpy as np
+
+from flight_recorder import read_flight_log
+from hover_control import HoverController, PITCH_TRACK, PITCH_RESET, PITCH_TRIM, PITCH_RELAY
+from lift_feedforward import load_feedforward
+
+
+# Offline replay of recorded flights through controller code.
+# Loads a session (a flight log from flight_recorder.py, or its CSV export)
+# and feeds the recorded raw light readings, timestamps and targets through a
+# controller on the recorded timeline, as fast as the CPU allows. The
+# counterfactual pitch commands are compared with what was actually flown.
+#
+# This is open loop: the recorded rotor did not respond to the new commands,
+# so the divergence shows how differently a controller reacts to the same
+# real sensor noise and disturbances, not how the flight would have gone.
+# Use controller_benchmark.py for closed-loop comparisons.
+#
+# By default the flight is replayed through a HoverController built from the
+# configuration in the log header, with the lift feed-forward loaded from the
+# calibration files in the current directory, and started from the pitch the
+# flight started from (feed-forward or learned trim). The hover loop's pitch
+# events (manual pitches, relay autotune runs and trim jumps on setpoint
+# changes) are replayed from the pitch_event channel into every controller,
+# so the default controller reproduces what was flown. Custom controllers
+# need reset(pitch), update(t, light, target) and a settable .pitch. Gains
+# applied from an autotune mid-flight are not in the log, so a flight after
+# one only replays exactly up to that point.
+#
+# Examples:
+#     python replay.py flight_20241015-122200.hfl
+#     python replay.py flight.hfl --gains 0.26,0.5,0 --gains 0.26,0.5,0.05 --output replay.csv
+#     python replay.py flight.hfl --controller my_controllers:make_controller
+
+DEADBAND = 5  # motor degrees - commands closer than this count as agreeing
+
+
+def load_session(path):
+    """Return ({channel: array}, metadata) for a flight log or its CSV export (which has no metadata)."""
+    if path.endswith('.hfl'):
+        header, columns = read_flight_log(path)
+        return columns, header.get('metadata', {})
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    return ({name: np.array([float(row[name]) for row in rows]) for name in rows[0]} if rows else {}), {}
+
+
+def flown_controller(metadata):
+    """Factory for the controller the session was flown with, as far as the metadata says."""
+    params = metadata.get('controller')
+    if not params:
+        return HoverController
+    feedforward = None
+    if params.get('feedforward'):
+        feedforward = load_feedforward()
+        if feedforward is None:
+            print("Warning: the flight used the lift feed-forward but the calibration files "
+                  "aren't here - replaying without it")
+    return lambda: HoverController.from_params(params, feedforward=feedforward)
+
+
+def replay(session, controller_factory=HoverController, initial_pitch=None):
+    """Run a controller over a recorded session and return its pitch commands.
+
+    initial_pitch is the pitch the flight started from (default: the first one flown).
+    """
+    times = session['time'].tolist()
+    readings = session['raw_light' if 'raw_light' in session else 'light'].tolist()
+    targets = session['target_light'].tolist()
+    flown = session['target_pitch'].tolist()
+    n = len(times)
+    events = session['pitch_event'].astype(int).tolist() if 'pitch_event' in session else [0] * n
+    event_pitches = session['event_pitch'].tolist() if 'event_pitch' in session else [0.0] * n
+
+    # Start from the pitch the real controller started from
+    controller = controller_factory()
+    controller.reset(flown[0] if initial_pitch is None else initial_pitch)
+    update = controller.update
+    commands = np.empty(n)
+    for i, (t, reading, target, event) in enumerate(zip(times, readings, targets, events)):
+        if not event:
+            commands[i] = update(t, reading, target)
+            continue
+        # Do to the controller what the hover loop did on this tick, in the same order
+        if event & PITCH_TRACK:
+            controller.pitch = event_pitches[i]
+        if event & PITCH_RESET:
+            controller.reset(event_pitches[i])
+        if event & PITCH_RELAY:
+            commands[i] = flown[i]  # the relay flew this tick, not the controller
+            continue
+        commands[i] = update(t, reading, target)
+        if event & PITCH_TRIM:
+            controller.pitch = flown[i]  # the learned trim the loop jumped to
+            commands[i] = controller.pitch
+    return commands
+
+
+def divergence(commands, flown):
+    flown = np.asarray(flown)
+    difference = commands - flown
+    return {
+        'rms': float(math.sqrt(np.mean(difference ** 2))),
+        'max_abs': float(np.max(np.abs(difference))),
+        'mean': float(np.mean(difference)),
+        'within_deadband': float(np.mean(np.abs(difference) <= DEADBAND)),
+        'correlation': float(np.corrcoef(commands, flown)[0, 1]) if np.std(commands) and np.std(flown) else float('nan'),
+        'command_travel': float(np.sum(np.abs(np.diff(commands)))),
+        'flown_travel': float(np.sum(np.abs(np.diff(flown)))),
+    }
+
+
+def controller_from_spec(spec):
+    """'module:callable' -> controller factory."""
+    module_name, _, attribute = spec.partition(':')
+    return getattr(importlib.import_module(module_name), attribute or 'HoverController')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded flight through controller code')
+    parser.add_argument('session', help='flight log (.hfl) or its CSV export')
+    parser.add_argument('--gains', action='append', default=[],
+                        help='kp,ki,kd for a HoverController - repeat to compare several')
+    parser.add_argument('--controller', action='append', default=[],
+                        help='module:callable returning a controller with reset(pitch), '
+                             'update(t, light, target) and a settable pitch')
+    parser.add_argument('--output', help='CSV of time, flown pitch and each replayed command')
+    args = parser.parse_args()
+
+    session, metadata = load_session(args.session)
+    initial_pitch = metadata.get('controller', {}).get('initial_pitch')
+    candidates = []
+    for gains in args.gains:
+        kp, ki, kd = (float(g) for g in gains.split(','))
+        candidates.append((f'kp={kp} ki={ki} kd={kd}',
+                           lambda kp=kp, ki=ki, kd=kd: HoverController(kp=kp, ki=ki, kd=kd)))
+    for spec in args.controller:
+        candidates.append((spec, controller_from_spec(spec)))
+    if not candidates:
+        candidates.append(('as flown' if metadata.get('controller') else 'HoverController defaults',
+                           flown_controller(metadata)))
+
+    flown = session['target_pitch']
+    duration = session['time'][-1] - session['time'][0]
+    print(f"{os.path.basename(args.session)}: {len(flown)} ticks, {duration:.1f} s")
+    print(f"{'controller':<32}{'rms':>10}{'max':>10}{'mean':>10}{'agree':>8}{'corr':>8}{'travel':>10}")
+    replayed = {}
+    for name, factory in candidates:
+        commands = replay(session, factory, initial_pitch)
+        replayed[name] = commands
+        d = divergence(commands, flown)
+        print(f"{name:<32}{d['rms']:>10.1f}{d['max_abs']:>10.1f}{d['mean']:>10.1f}"
+              f"{d['within_deadband']:>8.0%}{d['correlation']:>8.2f}{d['command_travel']:>10.0f}")
+    print(f"{'(flown)':<32}{'':>46}{np.sum(np.abs(np.diff(flown))):>10.0f}")
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['time', 'flown_pitch'] + list(replayed))
+            writer.writerows(zip(session['time'].tolist(), flown.tolist(),
+                                 *(c.tolist() for c in replayed.values())))
+        print(f'Replayed commands written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
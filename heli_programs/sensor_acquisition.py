@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from collections import deque
+
+from loop_scheduler import FixedRateScheduler, SKIP
+
+
+# Sensor acquisition thread for the hover loop.
+# Polls the light sensor and the rotor encoder as fast as the brick link
+# allows (up to MAX_RATE_HZ) and publishes the average of the light readings
+# from the last WINDOW seconds, with the mean time they were taken. The
+# controller picks up the freshest average whenever it ticks, so it sees
+# several readings' worth less noise, and the filter knows exactly how old
+# the value is.
+#
+# Publishing is lock-free: the acquisition thread is the only writer, and it
+# builds a new immutable snapshot every sample and swaps it in with a single
+# attribute store, which readers pick up whole. Nothing ever waits on a lock.
+#
+# Given a LatencyProfiler (latency_histogram.py), each read's round trip is
+# recorded under LIGHT_STAGE and ENCODER_STAGE.
+
+WINDOW = 0.025      # seconds of light readings averaged, half a control period
+MAX_RATE_HZ = 500   # upper bound on the polling rate
+LIGHT_STAGE = 'light'
+ENCODER_STAGE = 'encoder'
+
+
+class SensorSnapshot:
+    """One published sample. Never modified after it is published."""
+    __slots__ = ('seq', 'time', 'light', 'light_raw', 'light_count', 'position', 'position_time')
+
+    def __init__(self, seq, time, light, light_raw, light_count, position, position_time):
+        self.seq = seq                      # increases by one per published sample
+        self.time = time                    # mean time of the averaged light readings
+        self.light = light                  # mean light reading over the window
+        self.light_raw = light_raw          # newest light reading
+        self.light_count = light_count      # readings in the average
+        self.position = position            # newest rotor encoder position
+        self.position_time = position_time  # when it was read
+
+
+class SensorAcquisition:
+    def __init__(self, light, motor, window=WINDOW, max_rate_hz=MAX_RATE_HZ, on_error=None, name='sensors',
+                 profiler=None):
+        if window <= 0:
+            raise ValueError(f"window must be positive, got {window}")
+        self.light = light
+        self.motor = motor
+        self.window = window
+        self.max_rate_hz = max_rate_hz
+        self.on_error = on_error  # called from the acquisition thread with the exception
+        self.profiler = profiler
+        self.latest = None        # most recent SensorSnapshot
+        self.samples = 0
+        self.errors = 0
+        self._first = threading.Event()
+        self._t_start = time.perf_counter()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout=None):
+        """Block until the first snapshot is published. Returns it, or None on timeout."""
+        self._first.wait(timeout)
+        return self.latest
+
+    def _run(self):
+        scheduler = FixedRateScheduler(self.max_rate_hz, policy=SKIP)
+        recent = deque()  # (time, light reading) within the window
+        seq = 0
+        profiler = self.profiler
+        while self._running:
+            start = time.perf_counter_ns()
+            try:
+                light = self.light.get_lightness()
+                mid = time.perf_counter_ns()
+                position = self.motor.get_position()
+            except Exception as e:
+                self.errors += 1
+                if self.on_error:
+                    self.on_error(e)
+                scheduler.wait()
+                continue
+            end = time.perf_counter_ns()
+            t = (start + end) * 0.5e-9
+            if profiler is not None:
+                profiler.span(LIGHT_STAGE, start, mid)
+                profiler.span(ENCODER_STAGE, mid, end)
+
+            recent.append((t, light))
+            while recent[0][0] < t - self.window:
+                recent.popleft()
+            n = len(recent)
+            seq += 1
+            self.latest = SensorSnapshot(seq, sum(s[0] for s in recent) / n, sum(s[1] for s in recent) / n,
+                                         light, n, position, t)
+            self.samples += 1
+            if seq == 1:
+                self._first.set()
+            scheduler.wait()
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+
+    @property
+    def rate(self):
+        """Average samples per second since the thread started."""
+        latest = self.latest
+        if latest is None or latest.position_time <= self._t_start:
+            return 0.0
+        return self.samples / (latest.position_time - self._t_start)
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+
+import math
+import random
+import threading
+import time
+from collections import deque
+
+
+# Simulated stand-in for the cued_ia_lego library, so the helicopter scripts
+# can be run, tested and benchmarked without the NXT brick. It provides the
+# same NXTBrick / Motor / Light / Touch / Sound / Ultrasonic / Lamp classes the
+# scripts use, backed by a simple physics model of the rig:
+#   - rotor motor (PORT_A): first order spin-up, slowed down by blade drag
+#   - pitch motor (PORT_B): position servo moving at a power-dependent rate,
+#     linked to the blade angle through the pitch linkage ratio
+#   - see-saw: lift vs. a spring-like restoring force (the counterweight
+#     hangs below the pivot), second order with damping and hard end stops
+#   - light sensor (PORT_1): height mapped to a reading, 500 at the bottom and
+#     250 at the top like the real rig, with sensor lag and noise
+# Every brick call costs a configurable link latency.
+#
+# Time comes from a SimClock. In real time mode it follows time.perf_counter.
+# In virtual mode time only moves when something sleeps or talks to the brick,
+# so a 60 s flight can run in well under a second. Each sleeping thread waits
+# for its own wake-up time, and the clock jumps to the earliest one once every
+# thread it has woken is asleep again, so threads sleeping side by side (the
+# hover loop's sensor, actuator and control threads) share the virtual time
+# instead of each pushing it forward by its own sleeps. A thread counts as
+# awake from when the clock wakes it, or when it reads the clock (say after
+# an event woke it), until it sleeps again; one that blocks on something else
+# instead (a queue, a condition) holds the clock up for at most VIRTUAL_GRACE
+# of real time.
+# install_virtual_clock() patches the time module so unmodified scripts use
+# the virtual clock.
+# Use lego_backend.py to select this module with the HELI_SIM variable.
+
+__all__ = ['NXTBrick', 'Motor', 'Light', 'Touch', 'Sound', 'Ultrasonic', 'Lamp',
+           'PORT_A', 'PORT_B', 'PORT_C', 'PORT_1', 'PORT_2', 'PORT_3', 'PORT_4',
+           'diff', 'smooth']
+
+PORT_A = 'A'
+PORT_B = 'B'
+PORT_C = 'C'
+PORT_1 = 1
+PORT_2 = 2
+PORT_3 = 3
+PORT_4 = 4
+
+ROTOR_PORT = PORT_A
+PITCH_PORT = PORT_B
+
+_real_perf_counter = time.perf_counter
+_real_sleep = time.sleep
+
+VIRTUAL_GRACE = 0.02   # real seconds the virtual clock waits for a woken thread to sleep again
+
+
+class SimClock:
+    def __init__(self, realtime=True, start=0.0, grace=VIRTUAL_GRACE):
+        self.realtime = realtime
+        self.grace = grace
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._virtual_now = start
+        self._offset = start - _real_perf_counter()
+        self._sleepers = {}   # thread id -> virtual wake-up time
+        self._awake = set()   # threads running since they last slept, as far as the clock knows
+
+    def now(self):
+        if self.realtime:
+            return _real_perf_counter() + self._offset
+        with self._lock:
+            # Tiny step per read so busy-wait loops on perf_counter always terminate
+            self._virtual_now += 1e-6
+            self._awake.add(threading.get_ident())
+            return self._virtual_now
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            _real_sleep(0)
+            return
+        if self.realtime:
+            _real_sleep(seconds)
+            return
+        me = threading.get_ident()
+        with self._wakeup:
+            wake = self._virtual_now + seconds
+            self._sleepers[me] = wake
+            self._awake.discard(me)
+            self._wakeup.notify_all()
+            while self._virtual_now < wake:
+                if min(self._sleepers.values()) < wake:
+                    self._wakeup.wait()  # somebody wakes up first
+                elif self._awake:
+                    # Give the threads woken earlier a moment to get back to sleep;
+                    # if they don't, they are blocked on something else
+                    if not self._wakeup.wait(self.grace):
+                        self._awake.clear()
+                else:
+                    self._virtual_now = wake
+            del self._sleepers[me]
+            self._awake.add(me)
+            self._wakeup.notify_all()
+        _real_sleep(0)  # let threads woken by something else run before the clock moves on
+
+    def advance(self, seconds):
+        """Spend time talking to the brick (link latency)."""
+        if seconds > 0:
+            self.sleep(seconds)
+
+
+class SimRig:
+    """Physics model of the rotor, pitch linkage and see-saw."""
+
+    def __init__(self, clock=None, seed=None,
+                 link_latency=0.002,         # seconds per brick call
+                 light_latency=0.02,         # sensor lag (seconds)
+                 light_noise=2.0,            # light reading noise (std dev)
+                 encoder_noise=0.0,          # rotor encoder noise (deg)
+                 rotor_max_speed=720.0,      # deg/s at 100 power, blades flat
+                 rotor_time_constant=0.8,    # spin-up time constant (s)
+                 rotor_drag=0.005,           # speed loss per degree of blade pitch
+                 pitch_rate_per_power=12.0,  # pitch motor deg/s per unit of power
+                 blade_deg_per_motor_deg=-0.08,  # linkage ratio (motor negative = blades up)
+                 lift_per_deg=0.5,           # grams of lift per blade degree at full speed
+                 stall_angle=30.0,           # blade angle where the lift stops growing
+                 rest_load=3.0,              # grams of lift needed to leave the bottom stop
+                 range_load=9.5,             # extra grams to go from bottom to top
+                 natural_freq=0.8,           # see-saw natural frequency (Hz)
+                 damping_ratio=0.25,
+                 light_bottom=500.0, light_top=250.0,
+                 disturbance=None,           # optional f(t) -> extra grams of load
+                 substep=0.001):
+        self.clock = clock or SimClock()
+        self.random = random.Random(seed)
+        self.link_latency = link_latency
+        self.light_latency = light_latency
+        self.light_noise = light_noise
+        self.encoder_noise = encoder_noise
+        self.rotor_max_speed = rotor_max_speed
+        self.rotor_time_constant = rotor_time_constant
+        self.rotor_drag = rotor_drag
+        self.pitch_rate_per_power = pitch_rate_per_power
+        self.blade_deg_per_motor_deg = blade_deg_per_motor_deg
+        self.lift_per_deg = lift_per_deg
+        self.stall_angle = stall_angle
+        self.rest_load = rest_load
+        self.range_load = range_load
+        self.omega_n = 2 * math.pi * natural_freq
+        self.damping_ratio = damping_ratio
+        self.light_bottom = light_bottom
+        self.light_top = light_top
+        self.disturbance = disturbance
+        self.substep = substep
+
+        self._lock = threading.RLock()
+        self.motors = {}
+        self.height = 0.0    # 0 = bottom stop, 1 = top stop
+        self.velocity = 0.0  # height units per second
+        self.illuminated = True
+        self.t = self.clock.now()
+        self._light_history = deque([(self.t, self.light_bottom)])
+
+    # --- physics ---
+
+    def blade_angle(self):
+        pitch = self.motors.get(PITCH_PORT)
+        return pitch.position * self.blade_deg_per_motor_deg if pitch else 0.0
+
+    def rotor_speed(self):
+        rotor = self.motors.get(ROTOR_PORT)
+        return rotor.speed if rotor else 0.0
+
+    def lift(self):
+        angle = self.blade_angle()
+        effective = min(angle, self.stall_angle) - 0.3 * max(0.0, angle - self.stall_angle)
+        ratio = self.rotor_speed() / self.rotor_max_speed
+        return self.lift_per_deg * ratio * ratio * effective
+
+    def light_value(self, height):
+        return self.light_bottom + (self.light_top - self.light_bottom) * height
+
+    def advance(self):
+        """Integrate the model up to the current clock time."""
+        with self._lock:
+            now = self.clock.now()
+            while self.t < now:
+                dt = min(self.substep, now - self.t)
+                self._step(dt)
+                self.t += dt
+                self._light_history.append((self.t, self.light_value(self.height)))
+            history = self._light_history
+            while len(history) > 1 and history[1][0] <= now - self.light_latency:
+                history.popleft()
+
+    def _step(self, dt):
+        angle = self.blade_angle()
+        for motor in self.motors.values():
+            drag = self.rotor_drag * abs(angle) if motor.port == ROTOR_PORT else 0.0
+            motor.step(dt, drag)
+
+        load = self.rest_load + self.range_load * self.height
+        if self.disturbance:
+            load += self.disturbance(self.t)
+        force = (self.lift() - load) / self.range_load  # in height units
+        accel = self.omega_n ** 2 * force - 2 * self.damping_ratio * self.omega_n * self.velocity
+        self.velocity += accel * dt
+        self.height += self.velocity * dt
+        if self.height <= 0.0:
+            self.height, self.velocity = 0.0, max(0.0, self.velocity)
+        elif self.height >= 1.0:
+            self.height, self.velocity = 1.0, min(0.0, self.velocity)
+
+    # --- brick I/O ---
+
+    def io(self):
+        """One round trip over the brick link."""
+        self.clock.advance(self.link_latency)
+        self.advance()
+
+    def read_light(self):
+        self.io()
+        with self._lock:
+            value = self._light_history[0][1]
+        if not self.illuminated:
+            value += 150
+        value += self.random.gauss(0, self.light_noise)
+        return int(round(min(1023, max(0, value))))
+
+
+class _SimMotor:
+    def __init__(self, rig, port, power, speedreg, smoothstart, brake):
+        self.rig = rig
+        self.port = port
+        self.power = power
+        self.speedreg = speedreg
+        self.smoothstart = smoothstart
+        self.brake_on_stop = brake
+        self.position = 0.0  # deg
+        self.speed = 0.0     # deg/s
+        self.offset = 0.0
+        self.mode = 'idle'   # 'idle', 'brake', 'run' or 'turn'
+        self.run_power = 0
+        self.target = 0.0
+        self.turn_power = power
+
+    def step(self, dt, drag):
+        if self.mode == 'turn':
+            rate = self.rig.pitch_rate_per_power * abs(self.turn_power)
+            error = self.target - self.position
+            move = max(-rate * dt, min(rate * dt, error))
+            self.speed = move / dt
+            self.position += move
+            if abs(self.target - self.position) < 0.5:
+                self.mode = 'brake' if self.brake_on_stop else 'idle'
+            return
+        if self.mode == 'brake':
+            self.speed = 0.0
+            return
+        if self.mode == 'run':
+            target_speed = self.rig.rotor_max_speed * self.run_power / 100 / (1 + drag)
+            time_constant = self.rig.rotor_time_constant
+        else:
+            target_speed = 0.0
+            time_constant = self.rig.rotor_time_constant * 2  # coasting
+        self.speed += (target_speed - self.speed) * dt / time_constant
+        self.position += self.speed * dt
+
+
+class NXTBrick:
+    def __init__(self, rig=None):
+        self.rig = rig or get_rig()
+
+
+class Motor:
+    def __init__(self, brick, port, power=100, speedreg=True, smoothstart=False, brake=True):
+        self.rig = brick.rig
+        self._motor = _SimMotor(self.rig, port, power, speedreg, smoothstart, brake)
+        with self.rig._lock:
+            self.rig.motors[port] = self._motor
+
+    def run(self, power=None, regulated=None):
+        self.rig.io()
+        self._motor.run_power = self._motor.power if power is None else power
+        self._motor.mode = 'run'
+
+    def set_power(self, power):
+        self._motor.power = power
+        if self._motor.mode == 'run':
+            self.run(power)
+
+    def turn(self, angle, power=None, brake=None):
+        self.turn_to(self.get_position() + angle, power, brake)
+
+    def turn_to(self, angle, power=None, brake=None):
+        self.rig.io()
+        motor = self._motor
+        motor.turn_power = motor.power if power is None else power
+        if brake is not None:
+            motor.brake_on_stop = brake
+        motor.target = angle + motor.offset
+        motor.mode = 'turn'
+
+    def idle(self):
+        self.rig.io()
+        self._motor.mode = 'idle'
+
+    def brake(self):
+        self.rig.io()
+        self._motor.mode = 'brake'
+
+    def get_position(self):
+        self.rig.io()
+        motor = self._motor
+        noise = self.rig.random.gauss(0, self.rig.encoder_noise) if self.rig.encoder_noise else 0.0
+        return int(round(motor.position - motor.offset + noise))
+
+    def reset_position(self):
+        self.rig.io()
+        self._motor.offset = self._motor.position
+        self._motor.target = self._motor.position
+
+    def is_ready(self):
+        self.rig.io()
+        return self._motor.mode != 'turn'
+
+    def wait_for(self):
+        while not self.is_ready():
+            self.rig.clock.sleep(0.01)
+
+
+class Light:
+    def __init__(self, brick, port, illuminated=True):
+        self.rig = brick.rig
+        self.set_illuminated(illuminated)
+
+    def set_illuminated(self, illuminated):
+        self.rig.illuminated = illuminated
+
+    def get_lightness(self):
+        return self.rig.read_light()
+
+
+class Touch:
+    def __init__(self, brick, port):
+        self.rig = brick.rig
+
+    def is_pressed(self):
+        # The see-saw resting on its bottom stop presses the switch
+        self.rig.io()
+        return self.rig.height <= 0.0
+
+
+class Sound:
+    def __init__(self, brick, port, adjusted=True):
+        self.rig = brick.rig
+
+    def get_loudness(self):
+        self.rig.io()
+        level = 5 + 80 * self.rig.rotor_speed() / self.rig.rotor_max_speed
+        return int(max(0, min(100, level + self.rig.random.gauss(0, 2))))
+
+
+class Ultrasonic:
+    def __init__(self, brick, port):
+        self.rig = brick.rig
+
+    def get_distance(self):
+        # Sensor looking up at the rotor from below the bottom stop
+        self.rig.io()
+        return int(round(10 + 20 * self.rig.height))
+
+
+class Lamp:
+    def __init__(self, brick, port):
+        self.rig = brick.rig
+        self.on = False
+
+    def switch(self, on=True):
+        self.rig.io()
+        self.on = on
+
+
+def diff(values):
+    return [b - a for a, b in zip(values[:-1], values[1:])]
+
+
+def smooth(values, factor):
+    """One-sided exponential moving average."""
+    smoothed = []
+    for v in values:
+        smoothed.append(v if not smoothed else smoothed[-1] + factor * (v - smoothed[-1]))
+    return smoothed
+
+
+_rig = None
+
+
+def configure(realtime=True, **params):
+    """Create the rig that NXTBrick() connects to."""
+    global _rig
+    _rig = SimRig(clock=SimClock(realtime=realtime), **params)
+    return _rig
+
+
+def get_rig():
+    global _rig
+    if _rig is None:
+        _rig = SimRig()
+    return _rig
+
+
+def install_virtual_clock(clock):
+    """Route time.perf_counter/monotonic/sleep through a virtual SimClock."""
+    time.perf_counter = clock.now
+    time.monotonic = clock.now
+    time.perf_counter_ns = lambda: int(clock.now() * 1e9)
+    time.monotonic_ns = time.perf_counter_ns
+    time.sleep = clock.sleep
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+
+# Columnar ring buffer for the hover loop telemetry.
+# All channels share one preallocated float64 array and one write cursor, so
+# they can never get out of step with each other, and appending a sample does
+# not allocate any Python floats. Every sample is written twice, at i and at
+# i + capacity, so the last N samples (N <= capacity) are always one contiguous
+# slice and can be returned as a view without copying.
+
+
+class TelemetryRingBuffer:
+    def __init__(self, channels, capacity):
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.channels = tuple(channels)
+        self.capacity = capacity
+        self._index = {name: i for i, name in enumerate(self.channels)}
+        self._data = np.zeros((len(self.channels), 2 * capacity), dtype=np.float64)
+        self._head = 0   # next write position, 0 <= head < capacity
+        self._count = 0  # number of valid samples, saturates at capacity
+        self.total = 0   # samples ever appended
+
+    def __len__(self):
+        return self._count
+
+    def append(self, *values):
+        """Append one sample, values given in channel order."""
+        if len(values) != len(self.channels):
+            raise ValueError(f"Expected {len(self.channels)} values, got {len(values)}")
+        head = self._head
+        self._data[:, head] = values
+        self._data[:, head + self.capacity] = values
+        self._head = head + 1 if head + 1 < self.capacity else 0
+        if self._count < self.capacity:
+            self._count += 1
+        self.total += 1
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self.total = 0
+
+    def last(self, n=None):
+        """View of the last n samples of every channel, shape (channels, n)."""
+        count = self._count
+        n = count if n is None else min(n, count)
+        end = self._head + self.capacity
+        return self._data[:, end - n:end]
+
+    def since(self, total_seen):
+        """Samples appended after the reader had seen total_seen of them.
+
+        Returns (view of shape (channels, n), new total_seen). If more than
+        capacity samples were missed, only the last capacity are returned.
+        """
+        total = self.total
+        n = min(total - total_seen, self._count)
+        end = total % self.capacity + self.capacity
+        return self._data[:, end - n:end], total
+
+    def channel(self, name, n=None):
+        """View of the last n samples of one channel, oldest first."""
+        return self.last(n)[self._index[name]]
+
+    def latest(self, name):
+        """Most recent value of one channel."""
+        if not self._count:
+            raise IndexError("Telemetry buffer is empty")
+        return self._data[self._index[name], self._head + self.capacity - 1]
+
+    def __getitem__(self, name):
+        return self.channel(name)
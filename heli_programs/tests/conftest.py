@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The helicopter modules sit side by side in heli_programs/ and import each
+# other by name, like the scripts do when run from that directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from actuator_arbiter import ActuatorArbiter, MANUAL, CONTROLLER
+
+
+class FakeMotor:
+    """Records turn_to calls; the first one blocks until released, so commands can queue up behind it."""
+
+    def __init__(self):
+        self.sent = []
+        self.release = threading.Event()
+        self.busy = threading.Event()
+
+    def turn_to(self, position):
+        self.busy.set()
+        self.release.wait(5)
+        self.sent.append(position)
+
+
+def blocked_arbiter(deadband=2):
+    """Arbiter whose motor is stuck sending a first command to 0."""
+    motor = FakeMotor()
+    arbiter = ActuatorArbiter(motor, deadband=deadband)
+    arbiter.submit(0)
+    assert motor.busy.wait(5)
+    return arbiter, motor
+
+
+def test_highest_priority_command_wins_and_latest_in_a_slot():
+    arbiter, motor = blocked_arbiter()
+    arbiter.submit(10, CONTROLLER)
+    arbiter.submit(20, CONTROLLER)  # overwrites 10
+    arbiter.submit(-50, MANUAL)     # outranks the controller command
+    motor.release.set()
+    arbiter.close()
+    assert motor.sent == [0, -50]
+    assert arbiter.superseded == 2
+
+
+def handled(arbiter, n, timeout=5.0):
+    """Wait until the arbiter has sent or dropped n commands."""
+    deadline = time.monotonic() + timeout
+    while arbiter.sent + arbiter.deduplicated < n and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_deadband_drops_small_moves():
+    motor = FakeMotor()
+    motor.release.set()
+    arbiter = ActuatorArbiter(motor, deadband=2)
+    for n, position in enumerate((0, 1, 3, 4.5), 1):
+        arbiter.submit(position)
+        handled(arbiter, n)
+    arbiter.close()
+    assert motor.sent == [0, 3]
+    assert arbiter.deduplicated == 2
+
+
+def test_estop_latches():
+    arbiter, motor = blocked_arbiter()
+    actions = []
+    arbiter.submit(100, MANUAL)
+    arbiter.estop(0, action=lambda: actions.append('idle'))
+    arbiter.submit(200, MANUAL)      # ignored once the e-stop is posted
+    arbiter.submit(300, CONTROLLER)
+    motor.release.set()
+    arbiter.close()
+    assert motor.sent == [0, 0]
+    assert actions == ['idle']
+    assert arbiter.stats()['estopped']
+
+
+def test_close_sends_what_is_waiting():
+    arbiter, motor = blocked_arbiter()
+    arbiter.submit(40)
+    motor.release.set()
+    arbiter.close()
+    assert motor.sent == [0, 40]
+    arbiter.submit(80)  # after close: dropped
+    assert motor.sent == [0, 40]
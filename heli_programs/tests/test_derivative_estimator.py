@@ -0,0 +1,54 @@
+import math
+
+import pytest
+
+from derivative_estimator import SlidingDerivative
+
+
+@pytest.mark.parametrize('order', [1, 2])
+def test_exact_slope_on_a_noiseless_ramp(order):
+    estimator = SlidingDerivative(0.25, order=order)
+    for i in range(200):
+        t = 3.0 + 0.05 * i
+        slope = estimator.update(t, 7.0 - 4.0 * t)
+        if i > 0:
+            assert slope == pytest.approx(-4.0)
+    assert estimator.value == pytest.approx(7.0 - 4.0 * t)
+
+
+def test_uneven_spacing_and_window():
+    estimator = SlidingDerivative(0.25)
+    t = 0.0
+    for i in range(100):
+        t += 0.01 + 0.04 * (i % 3 == 0)
+        estimator.update(t, 2.5 * t + 1.0)
+    assert estimator.slope == pytest.approx(2.5)
+    assert 0 < len(estimator) <= 26  # only the last 0.25 s is kept
+
+
+def test_quadratic_gives_the_slope_at_the_newest_sample():
+    estimator = SlidingDerivative(0.5, order=2)
+    for i in range(50):
+        t = 0.02 * i
+        estimator.update(t, 3.0 * t * t)
+    assert estimator.slope == pytest.approx(6.0 * t)
+
+
+def test_no_drift_over_a_long_run():
+    estimator = SlidingDerivative(0.25)
+    for i in range(20000):  # rebuilds the running sums many times
+        t = 1e4 + 0.05 * i
+        estimator.update(t, math.sin(0.001 * i) + 0.5 * t)
+    assert estimator.slope == pytest.approx(0.5 + 0.02 * math.cos(0.001 * 19999), rel=1e-3)
+
+
+def test_first_sample_and_reset():
+    estimator = SlidingDerivative(0.25)
+    assert estimator.update(1.0, 5.0) == 0.0
+    assert estimator.value == 5.0
+    estimator.reset()
+    assert len(estimator) == 0 and estimator.value is None
+    with pytest.raises(ValueError):
+        SlidingDerivative(0)
+    with pytest.raises(ValueError):
+        SlidingDerivative(0.25, order=3)
@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from experiment_queue import ExperimentQueue, restart_requested
+
+POINTS = [{'angle': a} for a in (0, 10, 20, 30)]
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_resumes_from_the_checkpoint():
+    queue = ExperimentQueue('sweep', POINTS)
+    for point in queue.pending():
+        queue.complete(point, point['angle'] * 2)
+        if point['angle'] == 10:
+            break  # crash after two points
+
+    measured = []
+    queue = ExperimentQueue('sweep', POINTS)
+    assert queue.completed == 2
+    results = queue.run(lambda angle: measured.append(angle) or angle * 2)
+    assert measured == [20, 30]
+    assert results == [0, 20, 40, 60]
+
+
+def test_points_are_matched_on_parameters():
+    queue = ExperimentQueue('sweep', POINTS)
+    queue.run(lambda angle: angle)
+    changed = [{'angle': a} for a in (0, 15, 20, 30)]
+    queue = ExperimentQueue('sweep', changed)
+    assert [p['angle'] for p in queue.pending()] == [15]
+
+
+def test_truncated_last_line_is_ignored():
+    queue = ExperimentQueue('sweep', POINTS)
+    queue.complete({'angle': 0}, 1.5)
+    with open(queue.path, 'a') as f:
+        f.write('{"params": {"angle": 10}, "res')
+    queue = ExperimentQueue('sweep', POINTS)
+    assert queue.results() == [1.5]
+
+
+def test_restart_discards_the_checkpoint():
+    ExperimentQueue('sweep', POINTS).complete({'angle': 0}, 1.0)
+    queue = ExperimentQueue('sweep', POINTS, restart=True)
+    assert queue.completed == 0 and not os.path.exists(queue.path)
+    assert restart_requested(['--restart']) and not restart_requested([])
+
+
+def test_finish_archives_only_a_complete_run():
+    queue = ExperimentQueue('sweep', POINTS)
+    queue.complete({'angle': 0}, 1.0)
+    assert queue.finish() is None and os.path.exists(queue.path)
+    queue.run(lambda angle: angle)
+    archive = queue.finish()
+    assert archive.endswith('.done.jsonl') and not os.path.exists(queue.path)
+    with open(archive) as f:
+        assert len([json.loads(line) for line in f]) == 4
+    assert ExperimentQueue('sweep', POINTS).completed == 0
+
+
+def test_duplicate_points_are_rejected():
+    with pytest.raises(ValueError):
+        ExperimentQueue('sweep', [{'angle': 0}, {'angle': 0}])
@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+
+HELI_PROGRAMS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_virtual(tmp_path, script):
+    """Run script in a fresh interpreter on the virtual sim clock; returns the JSON it prints last."""
+    env = dict(os.environ, HELI_SIM='virtual', HELI_SIM_SEED='1', PYTHONPATH=HELI_PROGRAMS)
+    env.pop('HELI_TRACE', None)
+    result = subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+FLIGHT = '''
+import json
+from hover_loop import HoverLoop
+
+hover = HoverLoop(duration=3)
+hover.start()
+hover.data_thread.join()
+hover.close()
+print(json.dumps({'stale_ticks': hover.stale_ticks, 'loop': hover.scheduler.stats(),
+                  'sensor_rate': hover.sensors.rate}))
+'''
+
+
+def test_virtual_flight_has_no_skipped_ticks(tmp_path):
+    stats = run_virtual(tmp_path, FLIGHT)
+    assert stats['stale_ticks'] == 0
+    assert stats['loop']['missed_ticks'] == 0
+    assert stats['loop']['ticks'] == 60
+    assert stats['sensor_rate'] > 200
+
+
+COMMANDS = '''
+import json
+import time
+from hover_headless import handle_command
+from hover_loop import HoverLoop
+
+hover = HoverLoop(duration=10)
+hover.start()
+time.sleep(2)  # virtual seconds, while the loop flies
+replies = [handle_command(hover, 'target 380'), handle_command(hover, 'pitch nan')]
+time.sleep(2)
+replies.append(handle_command(hover, 'stop'))
+hover.data_thread.join()
+hover.set_pitch(300)  # after the e-stop latched, must not move the blades
+hover.close()
+pitch = hover.motor_pitch._motor
+print(json.dumps({'replies': replies, 'stale_ticks': hover.stale_ticks, 'loop': hover.scheduler.stats(),
+                  'targets': hover.telemetry.channel('target_light').tolist(),
+                  'actuator': hover.pitch_actuator.stats(), 'running': hover.running,
+                  'motor_armed': hover.motor_armed, 'rotor_mode': hover.motor_rotor._motor.mode,
+                  'pitch_target': pitch.target - pitch.offset}))
+'''
+
+
+def test_headless_commands_and_stop(tmp_path):
+    stats = run_virtual(tmp_path, COMMANDS)
+    target_reply, nan_reply, stop_reply = stats['replies']
+    assert target_reply.startswith('t=') and 'target=380' in target_reply
+    assert nan_reply.startswith('bad command')
+    assert stop_reply == 'stopping'
+
+    # Flew about 4 of the 10 seconds, every tick on a fresh reading
+    assert stats['stale_ticks'] == 0
+    assert stats['loop']['missed_ticks'] == 0
+    assert 70 <= stats['loop']['ticks'] <= 90
+    targets = stats['targets']
+    assert targets[0] != 380 and targets[-1] == 380
+
+    # Motors stopped: rotor idling, blades sent back to zero, e-stop latched
+    assert not stats['running'] and not stats['motor_armed']
+    assert stats['rotor_mode'] == 'idle'
+    assert stats['actuator']['estopped']
+    assert stats['pitch_target'] == 0
@@ -0,0 +1,34 @@
+import numpy as np
+
+from lift_map import GaussianProcessSurface, lift_noise, repeat_variance
+
+
+def grid(n=6):
+    u = np.linspace(0, 1, n)
+    return np.array([(a, b) for a in u for b in u])
+
+
+def test_calibration_near_one_for_a_smooth_surface_with_known_noise():
+    rng = np.random.default_rng(0)
+    X = grid()
+    y = np.sin(2 * X[:, 0]) + X[:, 1] ** 2 + rng.normal(0, 0.01, len(X))
+    surface = GaussianProcessSurface().fit(X, y, noise_var=0.01 ** 2)
+    assert surface.calibration() < 1.5
+
+
+def test_calibration_flags_a_surface_the_model_cannot_follow():
+    X = grid()
+    y = np.where(X[:, 0] + X[:, 1] > 1.0, 1.0, 0.0)  # a cliff, smoothed over by the kernel
+    surface = GaussianProcessSurface().fit(X, y, noise_var=1e-6)
+    assert surface.calibration() > 1.3
+
+
+def test_noise_from_repeats_and_light_scatter():
+    rows = [{'power': 40, 'angle': a, 'light': 500 - a, 'light_std': 2.0, 'samples': 50,
+             'lift': 0.03 + 1e-4 * a + 1e-7 * a * a, 'speed': 300.0} for a in (0, 20, 40, 60)]
+    assert repeat_variance(rows, 'speed') is None
+    rows.append(dict(rows[0], speed=310.0))
+    assert repeat_variance(rows, 'speed') == 50.0
+    variance = lift_noise(rows)
+    slope = -(1e-4 + 2e-7 * np.array([0, 20, 40, 60, 0]))  # dlift/dlight
+    assert np.allclose(variance, (slope * 2.0) ** 2 / 50)
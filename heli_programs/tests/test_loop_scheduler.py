@@ -0,0 +1,76 @@
+import pytest
+
+from loop_scheduler import FixedRateScheduler, CATCH_UP, SKIP
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 100.0
+        self.sleeps = []
+
+    def now(self):
+        return self.t
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.t += seconds
+
+
+def scheduler(clock, rate_hz=20, policy=SKIP):
+    return FixedRateScheduler(rate_hz, policy=policy, clock=clock.now, sleep=clock.sleep)
+
+
+def test_deadlines_do_not_drift_with_the_work_time():
+    clock = FakeClock()
+    s = scheduler(clock)
+    for i in range(1000):
+        clock.t += 0.003 + 0.01 * (i % 4)  # uneven work, always within the period
+        s.wait()
+    assert clock.t == pytest.approx(100.0 + 1000 * 0.05, abs=1e-9)
+    assert s.overruns == 0 and s.missed_ticks == 0
+    assert s.achieved_rate == pytest.approx(20.0)
+    assert s.jitter_max == pytest.approx(0.0, abs=1e-9)
+
+
+def test_skip_drops_missed_ticks_and_stays_on_the_grid():
+    clock = FakeClock()
+    s = scheduler(clock, policy=SKIP)
+    clock.t += 0.18  # deadline was 0.05: 0.13 late, two whole ticks missed
+    assert s.wait() == 2
+    assert s.overruns == 1 and s.missed_ticks == 2
+    s.wait()
+    assert clock.t == pytest.approx(100.2)  # back on the 50 ms grid, no sleep in between
+    assert clock.sleeps == [pytest.approx(0.02)]
+
+
+def test_catch_up_runs_missed_ticks_back_to_back():
+    clock = FakeClock()
+    s = scheduler(clock, policy=CATCH_UP)
+    clock.t += 0.18
+    assert s.wait() == 0
+    # The deadlines at 0.10 and 0.15 have passed too: no sleeping until 0.20
+    s.wait()
+    s.wait()
+    assert clock.sleeps == []
+    s.wait()
+    assert clock.sleeps == [pytest.approx(0.02)]
+    assert s.overruns == 3 and s.missed_ticks == 0
+    assert s.ticks == 4
+
+
+def test_jitter_stats():
+    clock = FakeClock()
+    s = scheduler(clock)
+    s.wait()
+    clock.t += 0.06  # 10 ms late for the next deadline
+    s.wait()
+    assert s.jitter_max == pytest.approx(0.01)
+    assert s.jitter_mean == pytest.approx(0.005)
+    assert s.last_period == pytest.approx(0.06)
+
+
+def test_rejects_bad_arguments():
+    with pytest.raises(ValueError):
+        FixedRateScheduler(0)
+    with pytest.raises(ValueError):
+        FixedRateScheduler(20, policy='whenever')
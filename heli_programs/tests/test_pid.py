@@ -0,0 +1,115 @@
+import pytest
+
+from pid import PID, POSITION, VELOCITY, CLAMPING, BACK_CALCULATION
+
+DT = 0.05
+
+
+def run(pid, measurements, setpoint=0.0, rates=None, start=0):
+    """Feed measurements one tick apart and return the outputs."""
+    outputs = []
+    for i, measurement in enumerate(measurements):
+        rate = None if rates is None else rates[i]
+        outputs.append(pid.update(setpoint, measurement, (start + i) * DT, measurement_rate=rate))
+    return outputs
+
+
+def position_sum(pid):
+    return pid.p_term + pid.integral + pid.d_term + pid.ff_term
+
+
+@pytest.mark.parametrize('form', [POSITION, VELOCITY])
+def test_bumpless_start_from_the_initial_output(form):
+    pid = PID(2.0, 1.0, 0.5, form=form, output=100.0)
+    assert pid.update(10.0, 0.0, 0.0) == 100.0
+
+
+def test_position_form_p_and_i():
+    pid = PID(2.0, 1.0)
+    run(pid, [0.0])  # first tick only picks up the initial output
+    outputs = run(pid, [1.0, 1.0], setpoint=2.0, start=1)
+    # error 1 per tick: P = kp * 1, I grows by ki * error * dt per tick
+    assert outputs[0] == pytest.approx(2.0 + 1.0 * DT)
+    assert outputs[1] - outputs[0] == pytest.approx(1.0 * DT)
+
+
+def test_position_and_velocity_forms_agree_when_unsaturated():
+    measurements = [0.0, 0.5, 1.2, 1.0, 0.4, -0.3, -0.1, 0.2]
+    rates = [0.0, 10.0, 14.0, -4.0, -12.0, -14.0, 4.0, 6.0]
+    outputs = {}
+    for form in (POSITION, VELOCITY):
+        pid = PID(2.0, 1.5, 0.1, form=form, direction=-1, setpoint_weight=0.5, output=50.0)
+        outputs[form] = run(pid, measurements, setpoint=1.0, rates=rates)
+    assert outputs[POSITION] == pytest.approx(outputs[VELOCITY])
+
+
+def test_d_acts_on_the_measurement_rate_not_the_setpoint():
+    pid = PID(0.0, 0.0, 2.0, output=0.0)
+    run(pid, [0.0], rates=[0.0])
+    assert pid.update(5.0, 0.0, DT, measurement_rate=0.0) == 0.0  # setpoint step: no kick
+    assert pid.update(5.0, 0.0, 2 * DT, measurement_rate=3.0) == pytest.approx(-6.0)
+
+
+def test_output_limits_and_clamping_anti_windup():
+    pid = PID(1.0, 2.0, output_max=10.0, anti_windup=CLAMPING)
+    outputs = run(pid, [-20.0] * 40)
+    assert max(outputs) == 10.0
+    integral = pid.integral
+    run(pid, [-20.0] * 40, start=40)
+    assert pid.integral == integral  # no integrating while pushed into the limit
+    # So it comes off the limit as soon as the error reverses
+    assert run(pid, [20.0], start=80)[0] < 10.0
+
+
+def test_back_calculation_bleeds_the_integral_to_the_limit():
+    pid = PID(1.0, 2.0, output_max=10.0, anti_windup=BACK_CALCULATION)
+    run(pid, [-5.0] * 200)
+    assert pid.output == 10.0
+    # Unsaturated output settles just past the limit, not wound up far beyond it
+    assert position_sum(pid) < 10.0 + 5.0 + 1.0
+
+
+def test_no_anti_windup_winds_up():
+    pid = PID(1.0, 2.0, output_max=10.0, anti_windup=None)
+    run(pid, [-5.0] * 200)
+    assert position_sum(pid) > 20.0
+
+
+def test_rate_limit():
+    pid = PID(100.0, output=0.0, rate_limit=20.0)
+    run(pid, [0.0])
+    outputs = run(pid, [-10.0] * 5, start=1)
+    steps = [b - a for a, b in zip([0.0] + outputs, outputs)]
+    assert steps == pytest.approx([20.0 * DT] * 5)
+
+
+@pytest.mark.parametrize('gains', [{'kp': 3.0}, {'ki': 4.0}, {'kd': 0.8}, {'kp': 0.5, 'ki': 0.2, 'kd': 0.0}])
+@pytest.mark.parametrize('form', [POSITION, VELOCITY])
+def test_set_gains_is_bumpless(form, gains):
+    measurements = [0.0, 0.4, 0.9, 1.3, 1.5]
+    rates = [0.0, 8.0, 10.0, 8.0, 4.0]
+    pid = PID(1.0, 1.0, 0.2, form=form, direction=-1, output=100.0)
+    run(pid, measurements, setpoint=2.0, rates=rates)
+    before = pid.output
+    pid.set_gains(**gains)
+    assert pid.output == before
+    if form == POSITION:
+        assert position_sum(pid) == pytest.approx(before)
+    # Same measurement and rate one tick later: only the new integral step moves the output
+    error = -1 * (2.0 - measurements[-1])
+    after = pid.update(2.0, measurements[-1], len(measurements) * DT, measurement_rate=rates[-1])
+    assert after - before == pytest.approx(pid.ki * error * DT)
+
+
+def test_track_continues_from_a_manual_output():
+    pid = PID(1.0, 1.0, output=100.0)
+    run(pid, [0.0, 0.0])
+    pid.track(250.0)
+    assert pid.update(0.0, 0.0, 2 * DT) == pytest.approx(250.0)
+
+
+def test_rejects_unknown_modes():
+    with pytest.raises(ValueError):
+        PID(1.0, form='sideways')
+    with pytest.raises(ValueError):
+        PID(1.0, anti_windup='hope')
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from loop_scheduler import FixedRateScheduler
+from sensor_acquisition import SensorAcquisition
+from sim_lego import SimClock, SimRig, NXTBrick, Motor, Light, PORT_A, PORT_1
+
+
+def run_threads(clock, *targets):
+    """Run targets on threads that have all read the clock (so it knows they're running) before any sleeps."""
+    ready = threading.Barrier(len(targets))
+
+    def start(target):
+        clock.now()
+        ready.wait()
+        target()
+
+    threads = [threading.Thread(target=start, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_threads_sleeping_side_by_side_share_virtual_time():
+    clock = SimClock(realtime=False)
+
+    def sleeper(period, count):
+        return lambda: [clock.sleep(period) for _ in range(count)]
+
+    run_threads(clock, sleeper(0.002, 500), sleeper(0.05, 20))
+    # Both threads slept for a second - side by side, not one after the other
+    assert abs(clock.now() - 1.0) < 0.01
+
+
+def test_sleepers_wake_at_their_own_time_in_order():
+    clock = SimClock(realtime=False)
+    wakes = []
+
+    def sleeper(period, count):
+        def run():
+            for i in range(1, count + 1):
+                clock.sleep(period)
+                wakes.append((round(period * i, 6), clock.now()))
+        return run
+
+    run_threads(clock, sleeper(0.03, 10), sleeper(0.07, 4))
+    for due, woke in wakes:
+        assert due <= woke < due + 0.001
+    assert [due for due, _ in wakes] == sorted(due for due, _ in wakes)
+
+
+def test_sensor_acquisition_keeps_up_with_the_control_loop(monkeypatch):
+    clock = SimClock(realtime=False)
+    monkeypatch.setattr(time, 'perf_counter', clock.now)
+    monkeypatch.setattr(time, 'perf_counter_ns', lambda: int(clock.now() * 1e9))
+    monkeypatch.setattr(time, 'sleep', clock.sleep)
+    brick = NXTBrick(SimRig(clock=clock, seed=1))
+    motor = Motor(brick, PORT_A, power=100, speedreg=False)
+    light = Light(brick, PORT_1, illuminated=True)
+
+    sensors = SensorAcquisition(light, motor)
+    try:
+        assert sensors.wait_ready(timeout=1.0) is not None
+        scheduler = FixedRateScheduler(20)
+        stale = 0
+        last_seq = None
+        for _ in range(40):
+            snapshot = sensors.latest
+            if snapshot.seq == last_seq:
+                stale += 1
+            last_seq = snapshot.seq
+            scheduler.wait()
+    finally:
+        sensors.close()
+
+    assert stale == 0
+    assert scheduler.missed_ticks == 0
+    # Two 2 ms brick round trips per sample, like the realtime sim
+    assert sensors.rate > 200
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from telemetry_buffer import TelemetryRingBuffer
+
+
+def filled(n, capacity=5):
+    buffer = TelemetryRingBuffer(['time', 'value'], capacity=capacity)
+    for i in range(n):
+        buffer.append(float(i), 10.0 * i)
+    return buffer
+
+
+def test_before_wrapping():
+    buffer = filled(3)
+    assert len(buffer) == 3 and buffer.total == 3
+    assert buffer.channel('time').tolist() == [0.0, 1.0, 2.0]
+    assert buffer.latest('value') == 20.0
+
+
+def test_wraparound_keeps_the_newest_samples_in_order():
+    buffer = filled(13)
+    assert len(buffer) == 5 and buffer.total == 13
+    assert buffer['time'].tolist() == [8.0, 9.0, 10.0, 11.0, 12.0]
+    assert buffer.last(2).tolist() == [[11.0, 12.0], [110.0, 120.0]]
+    assert buffer.last(50).shape == (2, 5)
+
+
+def test_last_is_a_view_not_a_copy():
+    buffer = filled(7)
+    assert np.shares_memory(buffer.last(), buffer._data)
+
+
+def test_since_returns_only_new_samples():
+    buffer = filled(3)
+    new, seen = buffer.since(0)
+    assert new[0].tolist() == [0.0, 1.0, 2.0] and seen == 3
+    for i in range(3, 6):
+        buffer.append(float(i), 10.0 * i)
+    new, seen = buffer.since(seen)
+    assert new[0].tolist() == [3.0, 4.0, 5.0] and seen == 6
+    new, seen = buffer.since(seen)
+    assert new.shape == (2, 0) and seen == 6
+
+
+def test_since_after_missing_more_than_capacity():
+    buffer = filled(20)
+    new, seen = buffer.since(2)
+    assert new[0].tolist() == [15.0, 16.0, 17.0, 18.0, 19.0] and seen == 20
+
+
+def test_clear_and_errors():
+    buffer = filled(4)
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.total == 0
+    with pytest.raises(IndexError):
+        buffer.latest('time')
+    with pytest.raises(ValueError):
+        buffer.append(1.0)
+    with pytest.raises(ValueError):
+        TelemetryRingBuffer(['time'], capacity=0)
@@ -0,0 +1,33 @@
+from trim_cache import TrimCache
+
+
+def test_empty_cache_knows_nothing():
+    assert TrimCache(path=None).trim_for(400) is None
+
+
+def test_interpolates_between_learned_bins():
+    cache = TrimCache(path=None, bin_width=20)
+    cache.add(360, 200)
+    cache.add(400, 160)
+    assert cache.trim_for(380) == 180
+    assert cache.trim_for(360) == 200
+
+
+def test_no_trim_far_outside_the_learned_bins():
+    cache = TrimCache(path=None, bin_width=20)
+    cache.add(400, 160)
+    # Within a bin width the nearest bin still stands in...
+    assert cache.trim_for(415) == 160
+    assert cache.trim_for(385) == 160
+    # ...further out the feed-forward should be used instead
+    assert cache.trim_for(421) is None
+    assert cache.trim_for(300) is None
+
+
+def test_first_observation_then_forgetting():
+    cache = TrimCache(path=None, bin_width=20, forgetting=0.5)
+    cache.add(400, 100)
+    cache.add(400, 200)  # running mean while the bin has little behind it
+    assert cache.trim_for(400) == 150
+    cache.add(400, 250)  # capped weight: blends in at the forgetting factor
+    assert cache.trim_for(400) == 200
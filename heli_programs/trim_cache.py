@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import time
+
+import numpy as np
+
+
+# Learned hover trim: the steady-state pitch the loop converged to at each
+# target height, remembered across sessions.
+# Targets are binned every BIN_WIDTH light units. Each time the rotor has sat
+# inside SETTLE_BAND of the target for SETTLE_TIME seconds, the average pitch
+# over that time is blended into the two bins either side of the target
+# (weighted by distance). Each bin keeps the weight of the observations behind
+# it: a bin only grazed by observations far from its centre, or seen once,
+# follows a new one closely, while a well established bin blends it in at
+# FORGETTING (exponential forgetting, so the cache still follows a rig that
+# drifts with battery level or a rebuilt blade linkage).
+# trim_for() interpolates between populated bins, to warm-start the pitch at
+# takeoff and after setpoint changes. More than one bin width outside the
+# learned range it knows nothing, and the loop falls back on the lift
+# feed-forward.
+
+TRIM_FILE = 'hover_trim.json'
+BIN_WIDTH = 20         # light units
+FORGETTING = 0.3       # weight of a new observation against a well established trim
+SETTLE_BAND = 5        # light units either side of the target
+SETTLE_TIME = 3.0      # seconds in the band before the pitch counts as converged
+MAX_PITCH_SPREAD = 30  # motor degrees - wider than this and the loop is still searching
+
+
+class TrimCache:
+    def __init__(self, path=TRIM_FILE, bin_width=BIN_WIDTH, forgetting=FORGETTING,
+                 settle_band=SETTLE_BAND, settle_time=SETTLE_TIME, max_pitch_spread=MAX_PITCH_SPREAD):
+        if bin_width <= 0:
+            raise ValueError(f"bin_width must be positive, got {bin_width}")
+        if not 0 < forgetting <= 1:
+            raise ValueError(f"forgetting must be in (0, 1], got {forgetting}")
+        self.path = path
+        self.bin_width = bin_width
+        self.forgetting = forgetting
+        self.settle_band = settle_band
+        self.settle_time = settle_time
+        self.max_pitch_spread = max_pitch_spread
+        self.bins = {}  # bin index -> {'pitch', 'weight', 'updated'}
+        self._reset_window(None)
+        if path is not None and os.path.isfile(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.bins)
+
+    def load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get('bin_width') != self.bin_width:
+            print(f"Ignoring {self.path}: binned every {data.get('bin_width')} light units, not {self.bin_width}")
+            return
+        self.bins = {int(k): v for k, v in data['bins'].items()}
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'bin_width': self.bin_width,
+                       'bins': {str(k): v for k, v in sorted(self.bins.items())}}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def trim_for(self, target):
+        """Interpolated trim pitch for a target light reading, or None if nothing is known near it."""
+        if not self.bins:
+            return None
+        keys = sorted(self.bins)
+        centres = [k * self.bin_width for k in keys]
+        if not centres[0] - self.bin_width <= target <= centres[-1] + self.bin_width:
+            return None
+        return float(np.interp(target, centres, [self.bins[k]['pitch'] for k in keys]))
+
+    def add(self, target, pitch):
+        """Blend a converged pitch at a target into the neighbouring bins."""
+        pitch = float(pitch)
+        position = target / self.bin_width
+        lower = int(np.floor(position))
+        fraction = position - lower
+        for index, weight in ((lower, 1 - fraction), (lower + 1, fraction)):
+            if weight <= 0:
+                continue
+            entry = self.bins.get(index)
+            if entry is None:
+                self.bins[index] = {'pitch': pitch, 'weight': weight, 'updated': time.strftime('%Y-%m-%d %H:%M:%S')}
+                continue
+            # Weighted running mean of the observations, until the bin's weight
+            # reaches the cap where a full-weight observation counts FORGETTING
+            cap = (1 - self.forgetting) / self.forgetting
+            entry['weight'] = min(entry['weight'], cap)
+            entry['pitch'] += weight / (entry['weight'] + weight) * (pitch - entry['pitch'])
+            entry['weight'] = min(entry['weight'] + weight, cap)
+            entry['updated'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _reset_window(self, t):
+        self._t_start = t
+        self._target = None
+        self._pitch_sum = 0.0
+        self._samples = 0
+        self._pitch_min = self._pitch_max = None
+
+    def observe(self, t, target, light_reading, pitch):
+        """Feed one control tick. Returns True when a converged trim was added."""
+        if target != self._target or abs(light_reading - target) > self.settle_band:
+            self._reset_window(t)
+            self._target = target
+            return False
+        self._pitch_sum += pitch
+        self._samples += 1
+        self._pitch_min = pitch if self._pitch_min is None else min(self._pitch_min, pitch)
+        self._pitch_max = pitch if self._pitch_max is None else max(self._pitch_max, pitch)
+        if self._pitch_max - self._pitch_min > self.max_pitch_spread:
+            self._reset_window(t)
+            self._target = target
+            return False
+        if t - self._t_start < self.settle_time:
+            return False
+        self.add(target, self._pitch_sum / self._samples)
+        self._reset_window(t)
+        self._target = target
+        return True
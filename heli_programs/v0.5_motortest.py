@@ -3,7 +3,7 @@
 import time
 import numpy as np
 import matplotlib.pyplot as plt
-from cued_ia_lego import *
+from lego_backend import *
 
 # Try to find connected brick
 try:
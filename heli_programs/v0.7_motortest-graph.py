@@ -2,7 +2,7 @@
 
 import time
 import matplotlib.pyplot as plt
-from cued_ia_lego import *
+from lego_backend import *
 import csv
 
 
@@ -2,7 +2,8 @@
 
 import time
 import matplotlib.pyplot as plt
-from cued_ia_lego import *
+from lego_backend import *
+from experiment_queue import ExperimentQueue, restart_requested
 import csv
 
 
@@ -42,17 +43,32 @@ t_brake = 29.7
 t_stop = t_start + 29.7
 motor_rotor.run(power=100)
 
-for x in range(0,10):
-    t_brake = x*10
-    t_stop = t_start + x*10
+# Each pitch step is checkpointed to pitch_speed_checkpoint.jsonl as it finishes,
+# so a rerun after a crash picks up at the first step not done yet (run with
+# --restart to start again). The checkpoint is archived once the data is exported
+def run_step(x):
+    # Step x runs from (x - 1) * 10 s to x * 10 s after the start
+    step_times = []
+    step_positions = []
+    step_start = time.perf_counter()
+    step_offset = max(0, x - 1) * 10
+    t_stop = step_start + (10 if x else 0)  # step 0 only sets the pitch
     while time.perf_counter() < t_stop:
-        position_readings.append(motor_rotor.get_position())
-        times.append(time.perf_counter() - t_start)
-        current_time_elapsed = time.perf_counter() - t_start
+        step_positions.append(motor_rotor.get_position())
+        step_times.append(step_offset + time.perf_counter() - step_start)
+        current_time_elapsed = step_times[-1]
         # motor_rotor.run(power=int(current_time_elapsed / 5) * 20)
         motor_pitch.turn_to(x * 90)
         print(f"Time Elapse {current_time_elapsed}, Current Power Setting {int(current_time_elapsed / 5) * 20}")
     print(f"test of motor angle pitch {x*90}")
+    return {'times': step_times, 'positions': step_positions}
+
+
+queue = ExperimentQueue('pitch_speed', [{'x': x} for x in range(0,10)], restart=restart_requested())
+steps = queue.run(run_step)
+for step in steps:
+    times += step['times']
+    position_readings += step['positions']
 # Turn off the motor
 motor_rotor.idle()
 motor_armed = False
@@ -95,4 +111,5 @@ with open('motor_test_data_small_blade.csv', mode='w', newline='') as file:
     for i in range(len(times)):
         writer.writerow([times[i], position_readings[i], motor_speed[i], motor_speed[i]])
 
-print('Data exported to motor_test_data.csv')
\ No newline at end of file
+print('Data exported to motor_test_data.csv')
+queue.finish()
\ No newline at end of file
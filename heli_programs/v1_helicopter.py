@@ -3,10 +3,11 @@
 import os.path
 import pickle
 import time
-import statistics
 import numpy as np
 import matplotlib.pyplot as plt
-from cued_ia_lego import *
+from lego_backend import *
+from acquisition import Sampler
+from experiment_queue import ExperimentQueue, restart_requested
 
 
 # This is the main script for the helicopter experiment. Edit the
@@ -27,6 +28,35 @@ inter_test_pause = 5  # (seconds)
 pitch_power = 30
 # Power of the fan (blade spinning) motor
 fan_power = 100
+# Sensor sampling rate while recording
+sample_rate = 50  # (Hz)
+# Each completed test angle is checkpointed to v1_<mode>_checkpoint.jsonl, and
+# a rerun after a crash carries on from the first angle not done yet (blades
+# horizontal again before restarting). Run with --restart to start afresh.
+# The checkpoint is archived once the results are exported.
+restart = restart_requested()
+
+# Sweep mode:
+#   'steps'    - the original discrete tests at test_angles (the default)
+# and two faster sweeps to opt into by changing sweep_mode:
+#   'ramp'     - spin up once, ramp the pitch up and back down through the
+#                range of test_angles, record every sample with its measured
+#                pitch and bin the results afterwards (the up and down ramps
+#                lag in opposite directions, so averaging them cancels the lag).
+#                Not checkpointed - a crash means starting the ramp again
+#   'adaptive' - step through test_angles with the blades spinning, moving on
+#                as soon as two consecutive windows of readings agree
+sweep_mode = 'steps'
+# Ramp mode: blade pitch ramp rate and result bin width
+ramp_rate = 2.0  # (degrees per second)
+ramp_step = 5    # (motor degrees) - pitch motor is re-targeted in steps this big
+bin_width = 5    # (degrees)
+spin_up_time = 5  # (seconds) - wait for the fan to reach speed
+# Adaptive mode: window length and how closely consecutive windows must agree
+steady_window = 1.0    # (seconds)
+steady_z = 2.0         # light means within this many standard errors...
+steady_light_tol = 1.0  # ...or this many light units
+steady_speed_tol = 0.01  # fan speed within 1%
 
 # Check if angle conversion data exists, run blade pitch calibration if not
 if os.path.isfile('angle_conversion.pickle'):
@@ -63,57 +93,172 @@ motor_fan = Motor(brick, PORT_A, power=fan_power, speedreg=True,
 motor_pitch = Motor(brick, PORT_B, power=pitch_power, speedreg=True,
                     smoothstart=True, brake=True)
 
-# Main loop over tests, start timer, reset state variables
-results = [[], [], []]
+def motor_position_for(angle):
+    """Pitch motor position (as reported, sign adjusted) for a blade angle."""
+    return (pitch_to_rotation[0] * angle ** 3 +
+            pitch_to_rotation[1] * angle ** 2 +
+            pitch_to_rotation[2] * angle +
+            pitch_to_rotation[3])
 
-num_tests = len(test_angles)
-current_test = 0
 
-motor_pitch.reset_position()
-pitch_abs_pos = 0
+def read_pitch_position():
+    pitch_pos = motor_pitch.get_position()
+    return pitch_pos if pitch_power >= 0 else -pitch_pos
 
-while current_test < num_tests:
-    # Interrupt any currently active pitch adjustment
-    motor_pitch.brake()
 
-    # Set blade pitch angle
-    target_angle = test_angles[current_test]
-    target_motor_position = (pitch_to_rotation[0] * target_angle ** 3 +
-                             pitch_to_rotation[1] * target_angle ** 2 +
-                             pitch_to_rotation[2] * target_angle +
-                             pitch_to_rotation[3])
-    motor_adjustment = target_motor_position - pitch_abs_pos
-    motor_pitch.turn(round(motor_adjustment))
-
-    # Wait for the inter-test pause, then spin up the blades
-    time.sleep(inter_test_pause)
+def make_sampler():
+    return Sampler({'pitch': read_pitch_position, 'light': light.get_lightness,
+                    'fan': motor_fan.get_position}, rate_hz=sample_rate)
+
+
+def test_points():
+    """Queue of test angles, with the settings that affect their results."""
+    return ExperimentQueue(f'v1_{sweep_mode}', [
+        {'angle': angle, 'fan_power': fan_power, 'test_duration': test_duration}
+        for angle in test_angles], restart=restart)
+
+
+def columns(point_results):
+    """[[pitch positions], [light readings], [speeds]] from per-point results."""
+    return [list(column) for column in zip(*point_results)] if point_results else [[], [], []]
+
+
+def run_steps(queue):
+    """Original sweep: one spin-up, settle and recording window per test angle."""
+    def measure(angle, **_):
+        # Interrupt any currently active pitch adjustment
+        motor_pitch.brake()
+
+        # Set blade pitch angle
+        motor_adjustment = motor_position_for(angle) - read_pitch_position()
+        motor_pitch.turn(round(motor_adjustment))
+
+        # Wait for the inter-test pause, then spin up the blades
+        time.sleep(inter_test_pause)
+        motor_fan.run()
+
+        # Sleep until the recording window, record the pitch and fan motor
+        # positions and light sensor readings, then sleep out the test
+        test_start = time.perf_counter()
+        time.sleep(recording_window[0] * test_duration)
+        sampler = make_sampler().record((recording_window[1] - recording_window[0]) * test_duration)
+        time.sleep(max(0.0, test_start + test_duration - time.perf_counter()))
+
+        # Stop the blade fan motor, record the mean pitch angle, mean light sensor
+        # reading and mean fan motor speed
+        motor_fan.idle()
+        return [sampler.stats['pitch'].mean, sampler.stats['light'].mean, sampler.slope('fan')]
+
+    return columns(queue.run(measure))
+
+
+def run_ramp():
+    """Continuous sweep: ramp the pitch up and down, keep every sample, bin afterwards."""
+    low, high = min(test_angles), max(test_angles)
+    ramp_time = (high - low) / ramp_rate
+    sign = 1 if pitch_power >= 0 else -1
+
+    motor_pitch.turn_to(round(sign * motor_position_for(low)))
+    motor_pitch.wait_for()
     motor_fan.run()
+    time.sleep(spin_up_time)
 
-    # During the recording window, record the current time, motor positions
-    # and light sensor readings
+    sampler = make_sampler()
+    commanded = None
     test_start = time.perf_counter()
-    times = []
-    pitch_positions = []
-    light_readings = []
-    fan_positions = []
-    while time.perf_counter() < test_start + test_duration:
-        if (test_start + recording_window[0] * test_duration) < time.perf_counter() < \
-           (test_start + recording_window[1] * test_duration):
-            times.append(time.perf_counter())
-            pitch_pos = motor_pitch.get_position()
-            pitch_abs_pos = pitch_pos if pitch_power >= 0 else -pitch_pos
-            pitch_positions.append(pitch_abs_pos)
-            light_readings.append(light.get_lightness())
-            fan_positions.append(motor_fan.get_position())
-
-    # Stop the blade fan motor, record the mean pitch angle, mean light sensor
-    # reading and mean fan motor speed
+    for t, _ in sampler.run(2 * ramp_time):
+        t -= test_start
+        # Triangle: up for ramp_time, then back down
+        angle = low + ramp_rate * (t if t < ramp_time else 2 * ramp_time - t)
+        position = motor_position_for(angle)
+        if commanded is None or abs(position - commanded) >= ramp_step:
+            motor_pitch.turn_to(round(sign * position))
+            commanded = position
     motor_fan.idle()
-    results[0].append(statistics.mean(pitch_positions))
-    results[1].append(statistics.mean(light_readings))
-    results[2].append((fan_positions[-1] - fan_positions[0]) /
-                      (times[-1] - times[0]))
-    current_test += 1
+
+    # Keep every sample for later analysis
+    with open('pitch_sweep_samples.csv', 'w') as f:
+        f.write('Time (s),Pitch motor position (deg),Light sensor reading,Fan motor position (deg)\n')
+        for sample in zip(sampler.times, sampler['pitch'], sampler['light'], sampler['fan']):
+            f.write(','.join(str(v) for v in sample) + '\n')
+    print(f'{len(sampler)} samples exported to pitch_sweep_samples.csv')
+
+    # Bin by measured blade angle; fan speed from consecutive samples, so a bin's
+    # mean speed is its total fan travel over its total time
+    times, positions, readings, fan = (np.array(sampler.times), np.array(sampler['pitch']),
+                                       np.array(sampler['light']), np.array(sampler['fan']))
+    angles = np.polyval(rotation_to_pitch, positions)
+    bins = np.round(angles / bin_width).astype(int)
+    d_time = np.diff(times)
+    d_fan = np.diff(fan)
+    results = [[], [], []]
+    for b in np.unique(bins):
+        in_bin = bins == b
+        pair_in_bin = in_bin[:-1] & in_bin[1:]
+        if in_bin.sum() < 2 or not pair_in_bin.any():
+            continue
+        results[0].append(float(positions[in_bin].mean()))
+        results[1].append(float(readings[in_bin].mean()))
+        results[2].append(float(d_fan[pair_in_bin].sum() / d_time[pair_in_bin].sum()))
+    return results
+
+
+def is_steady(previous, current):
+    """True if two consecutive windows agree on the light reading and fan speed."""
+    light1, light2 = previous.stats['light'], current.stats['light']
+    standard_error = (light1.stderr ** 2 + light2.stderr ** 2) ** 0.5
+    light_steady = abs(light2.mean - light1.mean) <= max(steady_z * standard_error, steady_light_tol)
+    speed1, speed2 = previous.slope('fan'), current.slope('fan')
+    speed_steady = abs(speed2 - speed1) <= steady_speed_tol * max(abs(speed1), abs(speed2), 1)
+    return light_steady and speed_steady
+
+
+def run_adaptive(queue):
+    """Stepped sweep that ends each step as soon as the readings are steady."""
+    sign = 1 if pitch_power >= 0 else -1
+    fan_running = False
+    for point in queue.pending():
+        target_angle = point['angle']
+        if not fan_running:
+            motor_fan.run()
+            time.sleep(spin_up_time)
+            fan_running = True
+        motor_pitch.turn_to(round(sign * motor_position_for(target_angle)))
+        motor_pitch.wait_for()
+
+        # Compare consecutive windows until they agree, or test_duration runs out
+        step_start = time.perf_counter()
+        previous = make_sampler().record(steady_window)
+        while True:
+            current = make_sampler().record(steady_window)
+            steady = is_steady(previous, current)
+            if steady or time.perf_counter() - step_start > test_duration:
+                break
+            previous = current
+
+        print(f'{target_angle} deg: {"steady" if steady else "not steady"} '
+              f'after {time.perf_counter() - step_start:.1f} s')
+        queue.complete(point, [current.stats['pitch'].mean, current.stats['light'].mean, current.slope('fan')])
+    if fan_running:
+        motor_fan.idle()
+    return columns(queue.results())
+
+
+motor_pitch.reset_position()
+sweep_start = time.perf_counter()
+queue = None  # the ramp sweep has no discrete points to checkpoint
+if sweep_mode == 'steps':
+    queue = test_points()
+    results = run_steps(queue)
+elif sweep_mode == 'ramp':
+    results = run_ramp()
+elif sweep_mode == 'adaptive':
+    queue = test_points()
+    results = run_adaptive(queue)
+else:
+    print(f"Unknown sweep_mode {sweep_mode!r}, use 'steps', 'ramp' or 'adaptive'")
+    exit()
+print(f'{sweep_mode} sweep took {time.perf_counter() - sweep_start:.0f} s')
 
 # Return blades to starting angle
 if not motor_pitch.is_ready():
@@ -175,4 +320,15 @@ with open('oct18-speed_vs_pitch_small_blade.csv', 'w') as f:
     for p, speed in zip(pitch, results[2]):
         f.write(f'{p},{speed}\n')
 
-print('Data exported to speed_vs_pitch.csv')
\ No newline at end of file
+print('Data exported to speed_vs_pitch.csv')
+
+# Export lift vs pitch data to CSV - lift_feedforward.py inverts this curve
+# to get the pitch that holds a given height
+with open('lift_vs_pitch.csv', 'w') as f:
+    f.write('Pitch (deg),Motor position (deg),Light sensor reading,Lift (N)\n')
+    for p, position, reading, l in zip(pitch, results[0], results[1], lift):
+        f.write(f'{p},{position},{reading},{l}\n')
+
+print('Data exported to lift_vs_pitch.csv')
+if queue is not None:
+    queue.finish()
\ No newline at end of file
@@ -14,7 +14,7 @@ from kivy.properties import NumericProperty
 
 # Assuming you still need matplotlib for other purposes
 import matplotlib.pyplot as plt
-from cued_ia_lego import *  # Ensure this library is correctly set up
+from lego_backend import *  # Ensure this library is correctly set up
 
 # Constants
 SMOOTHING_FACTOR = 0.05
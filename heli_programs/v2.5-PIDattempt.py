@@ -13,7 +13,7 @@ from kivy.clock import Clock
 from kivy.properties import NumericProperty
 
 import matplotlib.pyplot as plt  # If you still want to use matplotlib
-from cued_ia_lego import *  # Assuming this is your proprietary library
+from lego_backend import *  # Assuming this is your proprietary library
 
 #from heli_programs.calibrate_lift import light_readings
 
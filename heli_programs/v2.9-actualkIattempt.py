@@ -1,67 +1,47 @@
 #!/usr/bin/env python3
 
 import time
-import threading
-import csv
-from collections import deque
 
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy_garden.graph import Graph, MeshLinePlot
 from kivy.uix.button import Button
 from kivy.clock import Clock
-from kivy.properties import NumericProperty
 from kivy.uix.label import Label
 
-import matplotlib.pyplot as plt  # If you still want to use matplotlib
-from cued_ia_lego import *  # Assuming this is your proprietary library
-from statistics import mean
+from graph_decimation import DecimatedSeries
+from flight_logger import LEVEL_NAMES
+from relay_autotune import DONE, FAILED
+from hover_loop import HoverLoop
 #from heli_programs.calibrate_lift import light_readings
 
 # Constants
-SMOOTHING_FACTOR = 0.65
-DATA_DURATION = 60  # seconds to run the data collection
-proportional = 0.025
-derivative = 0.013
-#working gains - 0.025,0.01
+# The flight itself (brick, control loop, logs) is in hover_loop.py, shared
+# with the headless runner hover_headless.py; this file is just the GUI
+GRAPH_WINDOW = 60  # seconds of history shown on the live graphs
+LATENCY_REFRESH = 0.5  # seconds between KPI updates - percentiles are worked out on demand
+# PID gains, per second (see hover_control.py) - kp=0.26, ki=0.5 is the old
+# incremental law with proportional=0.025, derivative=0.013 per 50ms tick
+kp = 0.26
+ki = 0.5
+kd = 0.0
+#working gains - 0.025,0.01 per tick, i.e. kp=0.2, ki=0.5
 
 
 
 
 class MotorController(BoxLayout):
-    target_power = NumericProperty(100)  # Default target speed - 80% to make it more interesting
-    target_pitch = NumericProperty(100)  # Default target speed
 
-    target_light_sensor_reading = NumericProperty(410) #500 for lowest 250 for highest rotor - this is the target value for PID
 
     def __init__(self, **kwargs):
 
         super(MotorController, self).__init__(**kwargs)
         self.orientation = 'vertical'
 
-        # Initialize Motors and Brick
-        try:
-            self.brick = NXTBrick()
-        except Exception as e:
-            print(f"Failed to connect to NXT Brick: {e}")
-            exit()
-
-        # Set up rotor motor
-        self.motor_rotor = Motor(self.brick, PORT_A, power=self.target_power, speedreg=False, smoothstart=True, brake=False)
-        self.motor_rotor.reset_position()
-
-
-
-        # Light sensor connected to sensor port 1, LED active
-        self.light = Light(self.brick, PORT_1, illuminated=True)
-
-        # Data storage
-        self.times = deque(maxlen=2000)  # Store up to 2000 data points
-        self.position_readings = deque(maxlen=2000)
-        self.speed_readings = deque(maxlen=2000)
-        self.light_readings=deque(maxlen=2000)
-        self.target_light_readings = deque(maxlen=2000)
-        self.target_pitch_records = deque(maxlen=2000)
+        # The flight - brick, sensor/actuator/control threads, logs - runs in a HoverLoop
+        self.hover = HoverLoop(script=__file__, kp=kp, ki=ki, kd=kd)
+        self.state = self.hover.state
+        self.latency_shown = 0.0
 
         # Set up Graph
         self.graph = Graph(
@@ -100,14 +80,18 @@ class MotorController(BoxLayout):
 
         # KPI: Current Motor Speed
         self.lbl_motor_speed_title = Label(text='        Motor Power (%):', halign='right', valign='middle', size_hint_x=0.5,font_size=20)
-        self.lbl_motor_speed = Label(text=str(self.target_power), halign='left', valign='middle', size_hint_x=0.5, font_size=20)
+        self.lbl_motor_speed = Label(text=str(self.state.target_power), halign='left', valign='middle', size_hint_x=0.5, font_size=20)
         #lbl_motor_speed.bind(text=self.setter('self.target_power'))
 
         # KPI: Light Sensor Reading
         self.lbl_light_sensor_title = Label(text='Target Light Sensor Reading (Height):', halign='right', valign='middle', size_hint_x=0.5, font_size=20)
-        self.lbl_light_sensor = Label(text=str(self.target_light_sensor_reading), halign='left', valign='middle', size_hint_x=0.5, font_size=20)
+        self.lbl_light_sensor = Label(text=str(self.state.target_light_sensor_reading), halign='left', valign='middle', size_hint_x=0.5, font_size=20)
         #lbl_light_sensor.bind(text=self.setter('self.target_light_sensor_reading'))
 
+        # KPI: Control loop rate and jitter
+        self.lbl_loop_title = Label(text='Loop:', halign='right', valign='middle', size_hint_x=0.2, font_size=20)
+        self.lbl_loop = Label(text='-', halign='left', valign='middle', size_hint_x=0.8, font_size=20)
+
         # Add more KPIs as needed
         # Example: Temperature Sensor
         # lbl_temp_sensor_title = Label(text='Temperature:', halign='left', valign='middle', size_hint_x=0.3)
@@ -119,11 +103,21 @@ class MotorController(BoxLayout):
         kpi_layout.add_widget(self.lbl_motor_speed)
         kpi_layout.add_widget(self.lbl_light_sensor_title)
         kpi_layout.add_widget(self.lbl_light_sensor)
+        kpi_layout.add_widget(self.lbl_loop_title)
+        kpi_layout.add_widget(self.lbl_loop)
         # kpi_layout.add_widget(lbl_temp_sensor_title)
         # kpi_layout.add_widget(lbl_temp_sensor)
 
         self.add_widget(kpi_layout)
 
+        # KPI: p50/p99/max latency (ms) of each stage of the control loop
+        latency_layout = BoxLayout(orientation='horizontal', size_hint_y=0.05, padding=10, spacing=20)
+        self.lbl_latency_title = Label(text='Latency (ms):', halign='right', valign='middle', size_hint_x=0.1, font_size=16)
+        self.lbl_latency = Label(text='-', halign='left', valign='middle', size_hint_x=0.9, font_size=16)
+        latency_layout.add_widget(self.lbl_latency_title)
+        latency_layout.add_widget(self.lbl_latency)
+        self.add_widget(latency_layout)
+
         # Set up Buttons
         button_layout = BoxLayout(size_hint_y=0.2)
 
@@ -132,190 +126,134 @@ class MotorController(BoxLayout):
         self.btn_stop = Button(text='Stop Motor')
         self.btn_increasePitch = Button(text='Increase Pitch')
         self.btn_decreasePitch = Button(text='Decrease Pitch}')
+        self.btn_log_level = Button(text=f'Log: {LEVEL_NAMES[self.hover.logger.level]}')
+        self.btn_autotune = Button(text='Autotune')
 
-        self.btn_increase.bind(on_press=self.increase_speed)
-        self.btn_decrease.bind(on_press=self.decrease_speed)
-        self.btn_stop.bind(on_press=self.stop_motor)
-        self.btn_increasePitch.bind(on_press=self.increase_pitch)
-        self.btn_decreasePitch.bind(on_press=self.decrease_pitch)
+        self.btn_increase.bind(on_press=self.hover.trace.wrap(self.increase_speed))
+        self.btn_decrease.bind(on_press=self.hover.trace.wrap(self.decrease_speed))
+        self.btn_stop.bind(on_press=self.hover.trace.wrap(self.stop_motor))
+        self.btn_increasePitch.bind(on_press=self.hover.trace.wrap(self.increase_pitch))
+        self.btn_decreasePitch.bind(on_press=self.hover.trace.wrap(self.decrease_pitch))
+        self.btn_log_level.bind(on_press=self.hover.trace.wrap(self.cycle_log_level))
+        self.btn_autotune.bind(on_press=self.hover.trace.wrap(self.autotune))
 
         button_layout.add_widget(self.btn_increase)
         button_layout.add_widget(self.btn_decrease)
         button_layout.add_widget(self.btn_stop)
         button_layout.add_widget(self.btn_increasePitch)
         button_layout.add_widget(self.btn_decreasePitch)
+        button_layout.add_widget(self.btn_log_level)
+        button_layout.add_widget(self.btn_autotune)
 
         self.add_widget(button_layout)
 
-        time.sleep(3)
-
-        self.motor_rotor.run()
-        self.motor_armed = True
-
-        # Set up pitch motor
-        self.motor_pitch = Motor(self.brick, PORT_B, power=35, speedreg=True, smoothstart=True, brake=True)
-        self.motor_pitch.reset_position()
-        self.motor_pitch.turn_to(-self.target_pitch)
-
-        # Start Data Collection Thread
-        self.running = True
-        self.start_time = time.perf_counter()
-        self.data_thread = threading.Thread(target=self.collect_data)
-        self.data_thread.start()
+        self.hover.start()
 
+        # Decimated plot data - at most two points per pixel column, updated incrementally
+        self.graph_series = {name: DecimatedSeries(GRAPH_WINDOW)
+                             for name in ('target_pitch', 'light', 'target_light')}
+        self.graph_width = None
+        self.graph_seen = 0  # telemetry samples already added to the series
 
         # Schedule Graph Update
         Clock.schedule_interval(self.update_graph, 1.0 / 30.0)  # 30 FPS
-
-    def collect_data(self): #async running - once every 33ms
-        t_start = self.start_time
-        while self.running and (time.perf_counter() - t_start) < DATA_DURATION:
-            current_time = time.perf_counter() - t_start
-            try:
-                position = self.motor_rotor.get_position()
-            except Exception as e:
-                print(f"Error reading motor position: {e}")
-                position = 0
-
-            self.times.append(current_time)
-            self.position_readings.append(position)
-
-            # Calculate motor speed (difference over time)
-            if len(self.position_readings) > 1:
-                d_position = self.position_readings[-1] - self.position_readings[-2]
-                d_time = self.times[-1] - self.times[-2]
-                speed = d_position / d_time if d_time > 0 else 0
-            else:
-                speed = 0
-
-            # Apply smoothing (one-sided moving average)
-            if self.speed_readings:
-                smoothed_speed = (1 - SMOOTHING_FACTOR) * self.speed_readings[-1] + SMOOTHING_FACTOR * speed
-            else:
-                smoothed_speed = speed
-
-            self.speed_readings.append(smoothed_speed)
-
-            # Calculate one sided moving average of light reading and append, using the smoothing factor logic
-            current_light_reading = self.light.get_lightness()
-            if len(self.light_readings) > 1:
-                #d_time = self.times[-1] - self.times[-2]
-                self.light_readings.append(self.light_readings[-1]*(1- SMOOTHING_FACTOR) + current_light_reading*SMOOTHING_FACTOR)
-
-
-            else:
-                self.light_readings.append(current_light_reading)
-
-            self.target_light_readings.append(self.target_light_sensor_reading)
-
-
-            # kD implementation - first calc vertical speed
-            # calculate average vertical speeds for the past 0.25 seconds (4 sets of datapoints)
-            vertical_speeds = []
-            mean_vs=0
-            if len(self.times)>=5:
-                for vs_trials in range(0,2):
-                    # if ascending, the speed should be negative
-                    vertical_displacement = self.light_readings[-1-vs_trials] - self.light_readings[-2-vs_trials]
-                    time_between_samples = self.times[-1-vs_trials] - self.times[-2-vs_trials]
-                    vertical_speed = vertical_displacement/time_between_samples #velocity = displacement/time
-                    vertical_speeds.append(vertical_speed)
-                    print(f"vs_trial {vs_trials}, vertical_displacement {vertical_displacement}, time_between_samples={time_between_samples}, vertical_speeds {vertical_speeds}")
-                #average vertical_speed over the past 250ms
-                mean_vs=mean(vertical_speeds)
-
-
-            # Update target speed if needed
-            # For example, you can implement pitch adjustments here
-            #PID Adjustment 
-            light_sensor_to_target_delta = (self.light_readings[-1]-self.target_light_sensor_reading)
-            print(f"mean vs {mean_vs}, P {light_sensor_to_target_delta * proportional}, D{mean_vs * derivative}")
-            self.target_pitch= self.target_pitch+light_sensor_to_target_delta*proportional + mean_vs*derivative #say the actual reading is 450 and target is 300 (rotor needs to rise higher), then...
-            #guard the target pitch from a limit of 0 to 900
-            if self.target_pitch>600:
-                self.target_pitch=600
-            if self.target_pitch<0:
-                self.target_pitch=0
-            print(f"target pitch {self.target_pitch}, target height {self.target_light_sensor_reading}, current height {self.light_readings[-1]}")
-            self.motor_pitch.turn_to(-self.target_pitch)
-
-            self.target_pitch_records.append(self.target_pitch)
-            #print(f"target pitch records {self.target_pitch_records}")
-
-            self.lbl_motor_speed.text = str(self.target_power)
-            self.lbl_light_sensor.text= str(self.target_light_sensor_reading)
-            
-
-            time.sleep(0.05)  # Increased sampling rate
-
-        self.stop_motor()
+        Clock.schedule_interval(self.hover.trace.wrap(self.publish_state), 1.0 / 30.0)
+
+    def publish_state(self, dt):
+        # Copy the control thread's state into the KPI labels at frame rate
+        state = self.state.snapshot()
+        self.lbl_motor_speed.text = str(state.target_power)
+        self.lbl_light_sensor.text = str(state.target_light_sensor_reading)
+        hover = self.hover
+        if hover.scheduler is not None:
+            self.lbl_loop.text = hover.scheduler.stats_text()
+        now = time.perf_counter()
+        if now - self.latency_shown >= LATENCY_REFRESH:
+            self.lbl_latency.text = hover.profiler.stats_text()
+            self.latency_shown = now
+        autotuner = hover.autotuner
+        if autotuner is not None:
+            if autotuner.active:
+                self.btn_autotune.text = 'Autotuning... (press to abort)'
+            elif autotuner.status == DONE and hover.pending_gains is None:
+                gains = autotuner.gains
+                self.btn_autotune.text = f"Apply kp={gains['kp']:.3f} ki={gains['ki']:.3f} kd={gains['kd']:.3f}"
+            elif autotuner.status == FAILED:
+                self.btn_autotune.text = f'Autotune failed: {autotuner.message}'
 
     def update_graph(self, dt):
-        if self.times and self.speed_readings:
-            # Shift the x-axis
-            current_time = self.times[-1]
-            self.graph.xmax = max(60, current_time + 10)
-            self.graph.xmin = max(0, current_time - 60)
-
-            self.plot.points = list(zip(self.times, self.target_pitch_records))
-
-            self.plotLight.points = list(zip(self.times, self.light_readings))
-            self.plotLightTarget.points = list(zip(self.times, self.target_light_readings))
+        start = time.perf_counter_ns()
+        self.redraw_graph()
+        self.hover.profiler.lap('graph', start)
+
+    def redraw_graph(self):
+        telemetry = self.hover.telemetry
+        if not len(telemetry):
+            return
+        series = self.graph_series
+        width = int(self.graph.width)
+        if width != self.graph_width:
+            # Widget resized - re-bucket the visible window at the new pixel width
+            self.graph_width = width
+            for s in series.values():
+                s.set_width(width)
+            current_time = telemetry.latest('time')
+            times = telemetry.channel('time')
+            start = times.searchsorted(current_time - GRAPH_WINDOW)
+            new_samples = telemetry.last(len(times) - start)
+            self.graph_seen = telemetry.total
+        else:
+            new_samples, self.graph_seen = telemetry.since(self.graph_seen)
+            if not new_samples.shape[1]:
+                return
+
+        times = new_samples[telemetry.channels.index('time')].tolist()
+        for name, s in series.items():
+            s.extend(times, new_samples[telemetry.channels.index(name)].tolist())
+
+        # Shift the x-axis
+        current_time = times[-1]
+        self.graph.xmax = max(60, current_time + 10)
+        self.graph.xmin = max(0, current_time - GRAPH_WINDOW)
+        self.graphLight.xmax = self.graph.xmax
+        self.graphLight.xmin = self.graph.xmin
+        for s in series.values():
+            s.trim(self.graph.xmin)
+
+        self.plot.points = series['target_pitch'].points
+
+        self.plotLight.points = series['light'].points
+        self.plotLightTarget.points = series['target_light'].points
 
 
 
 
     def increase_speed(self, instance): #adapted to be increase target height now
-        #self.target_power += 10
-        #if self.target_power > 100: #strictly larger than
-            #self.target_power = 100  # Maximum speed limit
-        #self.motor_rotor.run(power=self.target_power)
-        self.target_light_sensor_reading-=20
-        print(f"Target hover height increased to {self.target_light_sensor_reading} (light sensor reading)")
+        self.hover.nudge_target(+1)
 
     def decrease_speed(self, instance):
-        self.target_light_sensor_reading += 20
-        #self.target_power -= 10
-        #if self.target_power < 0:
-        #    self.target_power = 0  # Minimum speed limit
-        #self.motor_rotor.run(power=self.target_power)
-        print(f"Target speed decreased to {self.target_light_sensor_reading} (light sensor reading)")
+        self.hover.nudge_target(-1)
 
     def increase_pitch(self, instance):
-        self.target_pitch += 100
-        if self.target_pitch > 900: #strictly larger than
-            self.target_pitch = 900  # Maximum speed limit
-        self.motor_pitch.turn_to(-self.target_pitch)
-        print(f"Target pitch increased to {self.target_pitch}")
+        self.hover.nudge_pitch(+1)
 
     def decrease_pitch(self, instance):
-        self.target_pitch -= 100
-        if self.target_pitch < 0:
-            self.target_pitch = 0  # Minimum speed limit
-        self.motor_pitch.turn_to(-self.target_pitch)
-        print(f"Target pitch decreased to {self.target_pitch}")
+        self.hover.nudge_pitch(-1)
+
+    def cycle_log_level(self, instance):
+        level = self.hover.cycle_log_level()
+        self.btn_log_level.text = f'Log: {LEVEL_NAMES[level]}'
+
+    def autotune(self, instance):
+        self.hover.autotune()
+        if self.hover.autotuner is None:
+            self.btn_autotune.text = 'Autotune'
 
     def stop_motor(self, instance=None):
-        if self.motor_armed:
-            self.motor_rotor.idle()
-            self.motor_armed = False
-            print("Motor stopped.")
-            self.target_pitch=0
-            self.motor_pitch.turn_to(-self.target_pitch)
-        self.running = False
+        self.hover.stop()
 
     def on_stop(self):
-        self.stop_motor()
-        self.data_thread.join()
-        self.export_data()
-
-    def export_data(self):
-        with open('motor_test_data_with_ui.csv', mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Time (s)', 'Motor Position', 'Motor Speed'])
-            for i in range(len(self.times)):
-                writer.writerow([self.times[i], self.position_readings[i], self.speed_readings[i]])
-        print('Data exported to motor_test_data_with_ui.csv')
+        self.hover.close()
 
 class MotorApp(App):
     def build(self):